@@ -0,0 +1,4 @@
+"""Performance benchmarks for GeoGuessr Dashboard.
+
+Run from the repository root, e.g. `python -m benchmarks.stats`.
+"""
@@ -0,0 +1,95 @@
+"""Synthetic game stores and scratch app instances for benchmarks.
+
+Games are generated by tests.mock_geoguessr and run through the real
+fetch-side processing, so the stored records have the same shape (and the
+same coastal reverse-geocoding fallback) as a real sync produces.
+"""
+import contextlib
+import functools
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import geodash
+from geodash.store import games_path
+from geoguessr import fetch_games
+from geoguessr.fetch_games import fetch_single_duel, fetch_single_team_duel
+from geoguessr.utils import save_json
+from tests.mock_geoguessr import synthetic_games
+
+
+def processed_history(player_id, duels=0, team_duels=0, seed=0, blank_rate=0.02,
+                      missing_rate=0.02, competitive_rate=0.5):
+    """Return (duels, team_duels) game store records for a synthetic history.
+
+    Args:
+        blank_rate: share of rounds with a blank (coastal) country code
+        missing_rate: share of guesses missing because the player timed out
+    """
+    stored = {'Duels': [], 'TeamDuels': []}
+    games = synthetic_games(player_id, duels, team_duels, seed, competitive_rate,
+                            blank_rate, missing_rate)
+
+    # Synthetic rounds reuse a few locations; geocode each blank one once
+    lookup = fetch_games.get_country_from_coords
+    fetch_games.get_country_from_coords = functools.lru_cache(maxsize=None)(lookup)
+    try:
+        for item, game in games:
+            fetch = (lambda raw: lambda session, game_id: raw)(game)
+            if item['gameMode'] == 'Duels':
+                record = fetch_single_duel(None, item['gameId'], player_id, item['competitive'],
+                                           fetch)
+            else:
+                record = fetch_single_team_duel(None, item['gameId'], player_id,
+                                                item['competitive'], fetch=fetch)
+            if record:
+                stored[item['gameMode']].append(record)
+    finally:
+        fetch_games.get_country_from_coords = lookup
+    return stored['Duels'], stored['TeamDuels']
+
+
+def create_database(path):
+    """Create an empty database from sql/schema.sql at path."""
+    root = geodash.app.config['GEODASH_ROOT']
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    db = sqlite3.connect(str(path))
+    db.executescript((root / 'sql' / 'schema.sql').read_text())
+    db.close()
+
+
+@contextlib.contextmanager
+def scratch_app(root=None):
+    """Point geodash.app at a fresh database and game store under root.
+
+    Yields the app; its configuration is restored on exit. Without root, a
+    temporary directory is used and removed afterwards.
+    """
+    with contextlib.ExitStack() as stack:
+        if root is None:
+            root = stack.enter_context(tempfile.TemporaryDirectory(prefix='geodash-bench-'))
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        create_database(root / 'geodash.sqlite3')
+
+        overrides = {
+            'DATABASE_FILENAME': root / 'geodash.sqlite3',
+            'PLAYER_DATA_DIR': root / 'players',
+            'CACHE_FILENAME': root / 'cache.sqlite3',
+            'GENERATION_DIR': root / 'generations',
+        }
+        saved = {key: geodash.app.config.get(key) for key in overrides}
+        geodash.app.config.update(overrides)
+        try:
+            yield geodash.app
+        finally:
+            geodash.app.config.update(saved)
+
+
+def write_store(player_id, duels, team_duels):
+    """Write a player's game store files in the current app's PLAYER_DATA_DIR."""
+    for game_type, games in (('duels', duels), ('team_duels', team_duels)):
+        path = games_path(game_type, player_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_json(path, games)
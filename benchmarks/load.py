@@ -0,0 +1,221 @@
+"""Load-test the dashboard read API with many concurrent clients.
+
+    python -m benchmarks.load [--games 2000] [--clients 16] [--duration 30]
+                              [--url http://host:port --player ID]
+
+Without --url, a scratch database and game store for a synthetic player
+(--games duels and --games team duels) are seeded and synced as a real sync
+would, and the app is served in-process on a local port.  Each client keeps
+one HTTP connection open and draws requests at random from a fixed mix:
+
+    stats, countries          duels and team duels, every mode
+    teammates                 team duels
+    details                   the country details of a random country
+    *?teammate                the team duel variants filtered by a teammate
+
+Throughput and p50/p95/p99 latency are reported per endpoint; --out saves
+the report as JSON.  With --revalidate, clients send If-None-Match with the
+ETag they last saw for a URL, as browsers do.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from geodash.sync import compute_and_store_all_variations
+from tests.mock_geoguessr import COUNTRIES
+from .history import processed_history, scratch_app, write_store
+
+PLAYER_ID = 'load'
+TEAMMATES = [f"player{n:03d}" for n in range(4)]
+GAME_TYPES = ('duels', 'team_duels')
+MODES = ('all', 'competitive', 'casual')
+
+
+def request_mix(player_id):
+    """Return every (endpoint name, path) the clients choose from."""
+    def path(route, **params):
+        return f"{route}?{urlencode(dict(params, player=player_id))}"
+
+    mix = []
+    for game_type in GAME_TYPES:
+        for mode in MODES:
+            mix.append(('stats', path('/api/v1/stats/', game_type=game_type, mode=mode)))
+            mix.append(('countries', path('/api/v1/countries/', game_type=game_type, mode=mode)))
+    for mode in MODES:
+        mix.append(('teammates', path('/api/v1/teammates/', mode=mode)))
+    for code, _, _ in COUNTRIES:
+        for game_type in GAME_TYPES:
+            mix.append(('details', path(f'/api/v1/countries/{code}/details/', game_type=game_type)))
+    for teammate in TEAMMATES:
+        params = {'game_type': 'team_duels', 'teammate': teammate}
+        mix.append(('stats?teammate', path('/api/v1/stats/', **params)))
+        mix.append(('countries?teammate', path('/api/v1/countries/', **params)))
+        for code, _, _ in COUNTRIES[:4]:
+            mix.append(('details?teammate', path(f'/api/v1/countries/{code}/details/', **params)))
+    return mix
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class LoadRun:
+    """Drives the request mix against base_url from concurrent clients."""
+
+    def __init__(self, base_url, mix, clients, duration=None, total=None, seed=0,
+                 revalidate=False):
+        self.base_url = base_url.rstrip('/')
+        self.mix = mix
+        self.clients = clients
+        self.duration = duration
+        self.total = total
+        self.seed = seed
+        self.revalidate = revalidate
+        self.samples = []
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def _next_slot(self, deadline):
+        with self._lock:
+            if self.total is not None and self._issued >= self.total:
+                return False
+            self._issued += 1
+        return deadline is None or time.monotonic() < deadline
+
+    def _client(self, n, deadline):
+        rng = random.Random(self.seed * 1000 + n)
+        session = requests.Session()
+        etags = {}
+        samples = []
+        while self._next_slot(deadline):
+            name, path = rng.choice(self.mix)
+            headers = {'If-None-Match': etags[path]} if path in etags else {}
+            started = time.perf_counter()
+            try:
+                resp = session.get(self.base_url + path, headers=headers, timeout=60)
+                status = resp.status_code
+            except requests.exceptions.RequestException:
+                status = None
+            samples.append((name, time.perf_counter() - started, status))
+            if self.revalidate and status == 200 and resp.headers.get('ETag'):
+                etags[path] = resp.headers['ETag']
+        with self._lock:
+            self.samples.extend(samples)
+
+    def run(self):
+        """Run the clients to completion and return the report."""
+        started = time.monotonic()
+        deadline = started + self.duration if self.duration else None
+        threads = [threading.Thread(target=self._client, args=(n, deadline))
+                   for n in range(self.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.report(time.monotonic() - started)
+
+    def report(self, elapsed):
+        by_endpoint = defaultdict(list)
+        for name, latency, status in self.samples:
+            by_endpoint[name].append((latency, status))
+        by_endpoint['all'] = [(latency, status) for _, latency, status in self.samples]
+
+        endpoints = {}
+        for name, samples in sorted(by_endpoint.items()):
+            latencies = sorted(latency for latency, _ in samples)
+            statuses = defaultdict(int)
+            for _, status in samples:
+                statuses[str(status)] += 1
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": sum(1 for _, s in samples if s is None or s >= 500),
+                "statuses": dict(statuses),
+                "throughput": round(len(samples) / elapsed, 1) if elapsed else None,
+                **{f"p{pct}_ms": round(percentile(latencies, pct) * 1000, 2)
+                   for pct in (50, 95, 99)},
+            }
+        return {
+            "clients": self.clients,
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": endpoints,
+        }
+
+
+def _print_report(report):
+    print(f"{report['clients']} clients, {report['elapsed_seconds']}s")
+    print(f"{'endpoint':<20} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, r in report['endpoints'].items():
+        print(f"{name:<20} {r['requests']:>9} {r['errors']:>7} {r['throughput']:>8} "
+              f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def _seed(app, games, seed):
+    """Sync a synthetic history into the scratch app."""
+    duels, team_duels = processed_history(PLAYER_ID, games, games, seed)
+    write_store(PLAYER_ID, duels, team_duels)
+    with app.app_context():
+        compute_and_store_all_variations(PLAYER_ID)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the dashboard read API")
+    parser.add_argument('--url', help="dashboard to test (default: seed and serve one in-process)")
+    parser.add_argument('--player', default=PLAYER_ID, help="player ID to request with --url")
+    parser.add_argument('--games', type=int, default=2000, help="games of each type to seed")
+    parser.add_argument('--data-dir', help="keep the seeded database and game store here")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run")
+    parser.add_argument('--requests', type=int, help="stop after this many requests instead")
+    parser.add_argument('--revalidate', action='store_true',
+                        help="send If-None-Match with previously seen ETags")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="save the report as JSON")
+    args = parser.parse_args(argv)
+
+    duration = None if args.requests else args.duration
+
+    def load(base_url, player_id):
+        return LoadRun(base_url, request_mix(player_id), args.clients, duration, args.requests,
+                       args.seed, args.revalidate).run()
+
+    if args.url:
+        report = load(args.url, args.player)
+    else:
+        with scratch_app(args.data_dir) as app:
+            print(f"Seeding {args.games} games of each type...", file=sys.stderr)
+            _seed(app, args.games, args.seed)
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                report = load(f"http://127.0.0.1:{server.server_port}", PLAYER_ID)
+            finally:
+                server.shutdown()
+
+    _print_report(report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    return 1 if report['endpoints']['all']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Benchmark the stats processors on synthetic game histories.
+
+    python -m benchmarks.stats [--sizes 1000 10000 100000] [--repeat 3]
+                               [--out FILE] [--compare BASELINE.json]
+
+For each size N, a history of N duels and N team duels is generated
+(deterministically from --seed, with coastal blank countries and missed
+guesses) and each stage is timed:
+
+    process_duels       geoguessr.process_stats.process_duels on every duel
+    process_games       process_games on every team duel
+    compute_and_store   geodash.sync.compute_and_store_all_variations: all
+                        six variations, the round store and the snapshots
+    country_details     the uncached country details body for the player's
+                        most played team duel country
+
+Each stage reports its best wall time over --repeat runs, the time spent in
+the reverse geocoder (rg.search calls, points and seconds) during that run,
+and peak Python memory from a separate tracemalloc run.  Results are saved
+as JSON; with --compare, stages slower than the baseline by more than
+--threshold are listed and the exit status is 1.
+"""
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import reverse_geocoder as rg
+
+import geodash
+from geodash.api.stats import _country_details
+from geodash.sync import compute_and_store_all_variations
+from geoguessr.process_stats import process_duels, process_games
+from .history import create_database, processed_history, scratch_app, write_store
+
+PLAYER_ID = 'bench'
+STAGES = ('process_duels', 'process_games', 'compute_and_store', 'country_details')
+
+# Stages faster than this in both runs are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.005
+
+
+class GeocoderMeter:
+    """Counts rg.search calls, points and time while installed."""
+
+    def __init__(self):
+        self.calls = 0
+        self.points = 0
+        self.seconds = 0.0
+
+    @contextlib.contextmanager
+    def installed(self):
+        original = rg.search
+
+        def search(coords, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(coords, *args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - started
+                self.calls += 1
+                self.points += 1 if isinstance(coords, tuple) else len(coords)
+
+        rg.search = search
+        try:
+            yield self
+        finally:
+            rg.search = original
+
+
+def measure(run, setup=None, repeat=3, memory=True):
+    """Time run() repeat times and return its best run's measurements.
+
+    setup() is called, untimed, before every run.
+    """
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        meter = GeocoderMeter()
+        with meter.installed():
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, meter)
+
+    elapsed, meter = best
+    result = {
+        "seconds": round(elapsed, 4),
+        "geocoder_seconds": round(meter.seconds, 4),
+        "geocoder_calls": meter.calls,
+        "geocoder_points": meter.points,
+    }
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def _top_country(team_duels):
+    counts = Counter(
+        r['country']
+        for game in team_duels
+        for r in game['playerStats'].get(PLAYER_ID, {}).get('rounds', [])
+        if r['country']
+    )
+    return counts.most_common(1)[0][0] if counts else 'us'
+
+
+def run_size(size, seed=0, repeat=3, memory=True):
+    """Benchmark every stage on a history of size duels and size team duels."""
+    duels, team_duels = processed_history(PLAYER_ID, size, size, seed)
+    country = _top_country(team_duels)
+    results = {}
+
+    with scratch_app() as app:
+        write_store(PLAYER_ID, duels, team_duels)
+
+        def in_app(func, *args):
+            def run():
+                with app.app_context():
+                    func(*args)
+            return run
+
+        results['process_duels'] = measure(lambda: process_duels(duels), repeat=repeat, memory=memory)
+        results['process_games'] = measure(lambda: process_games(team_duels), repeat=repeat,
+                                           memory=memory)
+        results['compute_and_store'] = measure(
+            in_app(compute_and_store_all_variations, PLAYER_ID),
+            setup=lambda: create_database(app.config['DATABASE_FILENAME']),
+            repeat=repeat, memory=memory
+        )
+        results['country_details'] = measure(
+            in_app(_country_details, PLAYER_ID, country, 'team_duels', 'all', ''),
+            repeat=repeat, memory=memory
+        )
+    return results
+
+
+def compare(baseline, results, threshold):
+    """Return (size, stage, old seconds, new seconds) for each regressed stage."""
+    regressions = []
+    for size, stages in results.items():
+        for stage, new in stages.items():
+            old = baseline.get(size, {}).get(stage)
+            if old is None or max(old['seconds'], new['seconds']) < MIN_COMPARABLE_SECONDS:
+                continue
+            if new['seconds'] > old['seconds'] * threshold:
+                regressions.append((size, stage, old['seconds'], new['seconds']))
+    return regressions
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=geodash.app.config['GEODASH_ROOT']
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_table(results):
+    print(f"{'size':>8}  {'stage':<18} {'seconds':>9} {'geocoder':>9} {'peak MB':>8}")
+    for size, stages in results.items():
+        for stage, r in stages.items():
+            peak = f"{r['peak_mb']:>8.1f}" if 'peak_mb' in r else f"{'-':>8}"
+            print(f"{size:>8}  {stage:<18} {r['seconds']:>9.4f} {r['geocoder_seconds']:>9.4f} {peak}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stats processors")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help="games of each type per run (default: 1000 10000)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs")
+    parser.add_argument('--out', help="results file (default: var/benchmarks/stats-<commit>.json)")
+    parser.add_argument('--compare', help="baseline results file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    # Load the geocoder's dataset up front so no stage is charged for it
+    rg.search((0.0, 0.0))
+
+    results = {}
+    for size in args.sizes:
+        print(f"Benchmarking {size} games of each type...", file=sys.stderr)
+        results[str(size)] = run_size(size, args.seed, args.repeat, not args.no_memory)
+
+    commit = _commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    out = Path(args.out or geodash.app.config['GEODASH_ROOT'] / 'var' / 'benchmarks'
+               / f"stats-{commit or 'unknown'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+
+    _print_table(results)
+    print(f"Results saved to {out}", file=sys.stderr)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(baseline['results'], results, args.threshold)
+        for size, stage, old, new in regressions:
+            print(f"REGRESSION {size} {stage}: {old:.4f}s -> {new:.4f}s ({new / old:.2f}x)",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,8 +7,21 @@ app.config.from_object('geodash.config')
 
 app.config.from_envvar('GEODASH_SETTINGS', silent=True)
 
+import geodash.jsonprovider  # noqa: E402
+app.json = geodash.jsonprovider.FastJSONProvider(app)
+
 import geodash.model  # noqa: E402
+import geodash.cache  # noqa: E402
+import geodash.api.metrics  # noqa: E402
+import geodash.profiling  # noqa: E402
 import geodash.views.index  # noqa: E402
+import geodash.api.players  # noqa: E402
 import geodash.api.stats  # noqa: E402
+import geodash.api.trends  # noqa: E402
+import geodash.api.sync  # noqa: E402
+import geodash.api.tiles  # noqa: E402
+import geodash.api.bundle  # noqa: E402
+import geodash.api.compression  # noqa: E402
 
 app.teardown_appcontext(geodash.model.close_db)
+app.teardown_appcontext(geodash.cache.close_cache_db)
@@ -0,0 +1,103 @@
+"""Single-roundtrip data bundles for dashboard pages."""
+import flask
+import geodash
+from geodash.api.conditional import conditional
+from geodash.api.players import request_player
+from geodash.api.stats import (
+    _countries_body, _details_body, _heatmap_params, _resolve_overall,
+    _stats_body, _teammates_body
+)
+from geodash.model import get_db
+from geodash.windows import parse_window
+
+PAGES = ('stats', 'country')
+
+# The country page only needs the heatmap as coarse weighted cells
+COUNTRY_HEATMAP_RESOLUTION = 0.1
+COUNTRY_HEATMAP_ENCODING = 'flat'
+
+
+def bundle_error(page, args, country_code=None):
+    """Return the error message for an invalid bundle request, or None."""
+    if page not in PAGES:
+        return "page must be 'stats' or 'country'"
+    if page == 'country' and not country_code:
+        return "country is required"
+    _, error = parse_window(args)
+    if not error and page == 'country':
+        _, _, error = _heatmap_params(args)
+    return error
+
+
+def build_bundle(page, args, player_id, country_code=None, cached_details_only=False):
+    """Return all data a dashboard page needs from one database snapshot.
+
+    The player's overall_stats row for the requested filters is resolved
+    once and shared by every part of the bundle. Each part has the same
+    shape as the body of its standalone endpoint. args must already pass
+    bundle_error.
+
+    With cached_details_only, returns None for a country page whose
+    details are not in the result cache yet instead of computing them.
+    """
+    db = get_db(readonly=True)
+
+    game_type = args.get('game_type', 'duels')
+    mode = args.get('mode', 'all')
+    teammate = args.get('teammate', '')
+    sort_by = args.get('sort', 'score_diff')
+    window, _ = parse_window(args)
+
+    # One read transaction so every query sees the same snapshot
+    if not db.in_transaction:
+        db.execute("BEGIN")
+    try:
+        overall = _resolve_overall(db, player_id, game_type, mode, teammate)
+        bundle = {"page": page, "player": player_id}
+
+        if game_type == 'team_duels':
+            main_overall = overall if overall is not None and mode == 'all' else None
+            bundle["teammates"] = _teammates_body(db, player_id, main_overall)["teammates"]
+
+        if page == 'stats':
+            bundle["stats"], _ = _stats_body(db, player_id, overall, game_type, mode, teammate,
+                                             window)
+        bundle["countries"], _ = _countries_body(db, player_id, overall, game_type, mode,
+                                                 teammate, sort_by, window)
+
+        if page == 'country':
+            resolution, encoding, _ = _heatmap_params(args)
+            if resolution is None and encoding is None:
+                resolution = COUNTRY_HEATMAP_RESOLUTION
+                encoding = COUNTRY_HEATMAP_ENCODING
+            bundle["details"], _ = _details_body(
+                player_id, country_code, game_type, mode, teammate, resolution, encoding, window,
+                cached_only=cached_details_only)
+            if bundle["details"] is None:
+                return None
+    finally:
+        db.commit()
+
+    return {"success": True, "data": bundle}
+
+
+@geodash.app.route('/api/v1/bundle/', methods=['GET'])
+@conditional
+def get_bundle():
+    """Return every dataset a page needs in a single response.
+
+    Query params:
+        page: 'stats' or 'country' (default: 'stats')
+        country: country code, required for the country page
+        player, game_type, mode, teammate, sort, last_n, since, until,
+            resolution, encoding: as for the standalone endpoints
+    """
+    page = flask.request.args.get('page', 'stats')
+    country_code = flask.request.args.get('country', '').lower()
+
+    error = bundle_error(page, flask.request.args, country_code)
+    if error:
+        return flask.jsonify({"success": False, "error": error}), 400
+
+    player_id, _ = request_player()
+    return flask.jsonify(build_bundle(page, flask.request.args, player_id, country_code))
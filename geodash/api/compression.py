@@ -0,0 +1,45 @@
+"""Response compression for JSON API payloads."""
+import gzip
+import zlib
+import flask
+import geodash
+
+
+def _negotiate(accept_encoding):
+    """Return the preferred supported content coding, or None."""
+    for coding in ('gzip', 'deflate'):
+        if accept_encoding[coding]:
+            return coding
+    return None
+
+
+@geodash.app.after_request
+def compress_response(response):
+    """Compress large JSON responses if the client accepts gzip or deflate."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    coding = _negotiate(flask.request.accept_encodings)
+    if coding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < geodash.app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if coding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=6))
+    else:
+        response.set_data(zlib.compress(data, 6))
+    response.headers['Content-Encoding'] = coding
+
+    # A strong ETag must identify this exact byte representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{coding}")
+    return response
@@ -0,0 +1,60 @@
+"""HTTP conditional request support for read-only API endpoints."""
+import functools
+import hashlib
+import flask
+from geodash.api.players import request_player
+from geodash.cache import dataset_fingerprint, dataset_last_modified
+
+
+def _current_etag(player_id):
+    """Return a strong ETag for this request against the player's dataset."""
+    raw = f"{player_id}|{dataset_fingerprint(player_id)}|{flask.request.full_path}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    """Return True if the client's cached copy is still current."""
+    request = flask.request
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        # Compressed representations carry a coding suffix on the same tag
+        return any(
+            request.if_none_match.contains(tag)
+            for tag in (etag, f"{etag}-gzip", f"{etag}-deflate")
+        )
+    # Without a dataset there is no modification date to compare against
+    if request.if_modified_since is not None and last_modified:
+        return int(request.if_modified_since.timestamp()) >= last_modified
+    return False
+
+
+def conditional(view):
+    """Serve a read-only view with ETag/Last-Modified validators.
+
+    The validators only depend on the requested player's dataset
+    fingerprint, so a matching If-None-Match is answered with 304 before the
+    view touches the database or encodes any JSON, and other players' syncs
+    leave them valid.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        player_id, error = request_player()
+        if error:
+            return flask.jsonify({"success": False, "error": error}), 400
+        etag = _current_etag(player_id)
+        last_modified = dataset_last_modified(player_id)
+
+        if _not_modified(etag, last_modified):
+            response = flask.Response(status=304)
+        else:
+            response = flask.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Clients may keep the payload but must revalidate before reuse
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
@@ -0,0 +1,51 @@
+"""Prometheus metrics endpoint and per-request instrumentation.
+
+The request hooks are registered before any other after_request handler,
+so Flask runs them last and the latency includes compression.
+"""
+import time
+import flask
+import geodash
+from geoguessr import metrics
+
+REQUEST_SECONDS = metrics.Histogram(
+    'geodash_http_request_seconds', "Request latency by endpoint.", ['endpoint', 'method'])
+RESPONSES = metrics.Counter(
+    'geodash_http_responses_total', "Responses by endpoint and HTTP status.",
+    ['endpoint', 'status'])
+
+
+def _endpoint():
+    rule = flask.request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+@geodash.app.before_request
+def start_timer():
+    """Note when the request started."""
+    flask.g.request_started = time.perf_counter()
+
+
+@geodash.app.after_request
+def record_request(response):
+    """Record the request's latency and status."""
+    started = flask.g.pop('request_started', None)
+    if started is not None:
+        endpoint = _endpoint()
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                endpoint=endpoint, method=flask.request.method)
+        RESPONSES.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+@geodash.app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Return this process's metrics in Prometheus text format.
+
+    Only served when METRICS_ENABLED, to clients in METRICS_ALLOWED_ADDRS.
+    """
+    config = geodash.app.config
+    if (not config['METRICS_ENABLED']
+            or flask.request.remote_addr not in config['METRICS_ALLOWED_ADDRS']):
+        flask.abort(404)
+    return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,59 @@
+"""Player selection for GeoGuessr Dashboard read APIs."""
+import flask
+import geodash
+from geodash.model import get_db
+from geodash.store import tracked_players, valid_player_id
+
+
+def resolve_player(args):
+    """Return (player_id, error message) for a read request's arguments.
+
+    An explicit ?player= wins, then DEFAULT_PLAYER_ID, then the only
+    tracked player. player_id is None while no player is tracked.
+    """
+    player_id = args.get('player')
+    if player_id:
+        if not valid_player_id(player_id):
+            return None, "player is not a valid player ID"
+        return player_id, None
+
+    default = geodash.app.config['DEFAULT_PLAYER_ID']
+    if default:
+        return default, None
+
+    players = tracked_players()
+    if len(players) > 1:
+        return None, "player is required when more than one player is tracked"
+    return (players[0] if players else None), None
+
+
+def request_player():
+    """Return resolve_player() for the current request, resolved once."""
+    if 'player' not in flask.g:
+        flask.g.player = resolve_player(flask.request.args)
+    return flask.g.player
+
+
+@geodash.app.route('/api/v1/players/', methods=['GET'])
+def get_players():
+    """Return the tracked players with usernames and last sync times."""
+    players = tracked_players()
+    cur = get_db(readonly=True).execute(
+        """SELECT p.value AS player_id, pn.username, sa.last_synced_at
+           FROM json_each(?) p
+           LEFT JOIN player_names pn ON pn.player_id = p.value
+           LEFT JOIN sync_accounts sa ON sa.player_id = p.value
+           ORDER BY p.key""",
+        (flask.json.dumps(players),)
+    )
+    return flask.jsonify({
+        "success": True,
+        "players": [
+            {
+                'player_id': row['player_id'],
+                'username': row['username'] or row['player_id'],
+                'last_synced_at': row['last_synced_at']
+            }
+            for row in cur.fetchall()
+        ]
+    })
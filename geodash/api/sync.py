@@ -0,0 +1,135 @@
+"""REST API for starting and following GeoGuessr Dashboard syncs."""
+import time
+import flask
+import geodash
+from geodash.jobs import TERMINAL_EVENTS, get_job, job_events, submit_sync
+from geodash.model import get_db
+from geodash.store import valid_player_id
+from geoguessr.utils import json_dumps
+
+# Seconds of silence before an SSE comment is sent to keep proxies attached
+KEEPALIVE_SECONDS = 15
+
+
+def _sync_params(data):
+    """Return (player_id, ncfa, error response) from request data."""
+    if not data or not data.get('playerId'):
+        return None, None, (flask.jsonify({"success": False, "error": "playerId is required"}), 400)
+    if not valid_player_id(data['playerId']):
+        return None, None, (flask.jsonify({
+            "success": False,
+            "error": "playerId is not a valid player ID",
+            "field": "playerId"
+        }), 400)
+    if not data.get('ncfa'):
+        return None, None, (flask.jsonify({"success": False, "error": "ncfa is required"}), 400)
+    return data['playerId'], data['ncfa'], None
+
+
+def _sse_event(event_type, data, event_id=None):
+    """Format a Server-Sent Event message."""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event_type}\ndata: {json_dumps(data).decode()}\n\n"
+
+
+def _event_stream(job_id, after=0):
+    """Return a streaming SSE response that follows a job's events."""
+    def generate():
+        with geodash.app.app_context():
+            last_write = time.monotonic()
+            for item in job_events(job_id, after):
+                if item is None:
+                    if time.monotonic() - last_write >= KEEPALIVE_SECONDS:
+                        last_write = time.monotonic()
+                        yield ": keepalive\n\n"
+                    continue
+                seq, event, data = item
+                last_write = time.monotonic()
+                yield _sse_event(event, data, seq)
+
+    return flask.Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@geodash.app.route('/api/v1/sync/', methods=['POST'])
+def start_sync():
+    """Start a background sync, or join the player's active one.
+
+    Body: {"playerId": ..., "ncfa": ...}
+
+    Returns 202 with the new job, or 200 with the job already in progress.
+    """
+    player_id, ncfa, error = _sync_params(flask.request.get_json(silent=True))
+    if error:
+        return error
+
+    job, created = submit_sync(player_id, ncfa)
+    return flask.jsonify({"success": True, "job": job}), 202 if created else 200
+
+
+@geodash.app.route('/api/v1/sync/<int:job_id>/', methods=['GET'])
+def get_sync(job_id):
+    """Return the status of a sync job, for polling clients."""
+    job = get_job(get_db(readonly=True), job_id)
+    if job is None:
+        return flask.jsonify({"success": False, "error": "Sync job not found"}), 404
+    return flask.jsonify({"success": True, "job": job})
+
+
+@geodash.app.route('/api/v1/sync/<int:job_id>/events/', methods=['GET'])
+def sync_events(job_id):
+    """Stream a sync job's progress as Server-Sent Events.
+
+    Reconnecting clients resume after their Last-Event-ID (or ?after=seq).
+    """
+    if get_job(get_db(readonly=True), job_id) is None:
+        return flask.jsonify({"success": False, "error": "Sync job not found"}), 404
+
+    after = flask.request.headers.get('Last-Event-ID') or flask.request.args.get('after', '0')
+    try:
+        after = int(after)
+    except ValueError:
+        after = 0
+    return _event_stream(job_id, after)
+
+
+@geodash.app.route('/api/v1/fetch-all/', methods=['POST'])
+def fetch_all():
+    """Fetch all games (both duels and team duels) and compute all stat variations.
+
+    Kept for scripts: starts (or joins) a background sync and waits for it.
+    """
+    player_id, ncfa, error = _sync_params(flask.request.get_json(silent=True))
+    if error:
+        return error
+
+    job, _ = submit_sync(player_id, ncfa)
+    for item in job_events(job['id']):
+        if item is not None and item[1] in TERMINAL_EVENTS:
+            _, event, data = item
+            if event == 'complete':
+                return flask.jsonify(data)
+            return flask.jsonify({"success": False, **data}), 500
+    return flask.jsonify({"success": False, "error": "Sync job not found"}), 500
+
+
+@geodash.app.route('/api/v1/fetch-all-stream/', methods=['GET'])
+def fetch_all_stream():
+    """Fetch all games with SSE progress updates.
+
+    Kept for old clients: starts (or joins) a background sync and streams
+    its events.
+    """
+    player_id, ncfa, error = _sync_params(flask.request.args)
+    if error:
+        return error
+
+    job, _ = submit_sync(player_id, ncfa)
+    return _event_stream(job['id'])
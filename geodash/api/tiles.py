@@ -0,0 +1,92 @@
+"""Heatmap tile API for zoomable maps."""
+import collections
+import threading
+import flask
+import geodash
+from geodash.api.conditional import conditional
+from geodash.api.players import request_player
+from geodash.cache import dataset_fingerprint
+from geodash.store import collect_rounds, load_games
+from geoguessr.heatmap import MAX_TILE_ZOOM, build_tile_index, query_tile
+
+LAYERS = ('guess', 'actual')
+
+# Tile indexes are reused by every tile of a map view, so keep the most
+# recent ones in process memory rather than decoding them per request.
+_INDEX_CACHE_SIZE = 16
+_index_cache = collections.OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _tile_index(player_id, game_type, mode, teammate, country, layer):
+    """Return the quadtree index for one player and filter combination."""
+    key = (player_id, dataset_fingerprint(player_id), game_type, mode, teammate, country, layer)
+    with _index_lock:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+
+    games = load_games(player_id, game_type, mode, teammate)
+    if games is None:
+        return None
+
+    lat_key, lng_key = ('guessLat', 'guessLng') if layer == 'guess' else ('actualLat', 'actualLng')
+    points = [
+        (r[lat_key], r[lng_key]) for r in collect_rounds(games, game_type, country)
+        if r[lat_key] is not None and r[lng_key] is not None
+    ]
+    index = build_tile_index(points)
+
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+@geodash.app.route('/api/v1/tiles/<int:z>/<int:x>/<int:y>/', methods=['GET'])
+@conditional
+def get_heatmap_tile(z, x, y):
+    """Return weighted heatmap cells for one Web Mercator tile.
+
+    Query params:
+        player: tracked player ID (default: the only tracked player)
+        layer: 'guess' or 'actual' locations (default: 'guess')
+        game_type: 'duels' or 'team_duels' (default: 'duels')
+        mode: 'all', 'competitive', or 'casual' (default: 'all')
+        teammate: optional player_id to filter team stats by teammate
+        country: optional country code of the actual location
+        detail: cells per tile side as a power of two, 0-8 (default: 5)
+    """
+    layer = flask.request.args.get('layer', 'guess')
+    game_type = flask.request.args.get('game_type', 'duels')
+    mode = flask.request.args.get('mode', 'all')
+    teammate = flask.request.args.get('teammate', '')
+    country = flask.request.args.get('country', '').lower() or None
+    detail = flask.request.args.get('detail', 5, type=int)
+
+    if layer not in LAYERS:
+        return flask.jsonify({"success": False, "error": "layer must be 'guess' or 'actual'"}), 400
+    if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return flask.jsonify({"success": False, "error": "Tile out of range"}), 400
+    if not 0 <= detail <= 8:
+        return flask.jsonify({"success": False, "error": "detail must be between 0 and 8"}), 400
+
+    player_id, _ = request_player()
+    index = _tile_index(player_id, game_type, mode, teammate, country, layer)
+    if index is None:
+        return flask.jsonify({"success": False, "error": "No games found"}), 404
+
+    cells = query_tile(index, z, x, y, detail)
+
+    return flask.jsonify({
+        "success": True,
+        "data": {
+            "z": z,
+            "x": x,
+            "y": y,
+            "layer": layer,
+            "cell_zoom": min(z + detail, MAX_TILE_ZOOM),
+            "cells": [{"lat": lat, "lng": lng, "weight": w} for lat, lng, w in cells]
+        }
+    })
@@ -0,0 +1,43 @@
+"""REST API for GeoGuessr Dashboard trends over time."""
+import flask
+import geodash
+from geodash.api.conditional import conditional
+from geodash.api.players import request_player
+from geodash.model import get_db
+from geodash.rounds import PERIODS, country_trend, trend
+
+
+@geodash.app.route('/api/v1/trends/', methods=['GET'])
+@conditional
+def get_trends():
+    """Return per-day or per-week totals from the trend rollups.
+
+    Only games synced with their start time are counted.
+
+    Query params:
+        player: tracked player ID (default: the only tracked player)
+        game_type: 'duels' or 'team_duels' (default: 'duels')
+        mode: 'all', 'competitive', or 'casual' (default: 'all')
+        period: 'day' or 'week' (default: 'week')
+        country: optional country code; adds that country's score diff per bucket
+    """
+    game_type = flask.request.args.get('game_type', 'duels')
+    mode = flask.request.args.get('mode', 'all')
+    period = flask.request.args.get('period', 'week')
+    country_code = flask.request.args.get('country', '').lower()
+    if period not in PERIODS:
+        return flask.jsonify({"success": False, "error": "period must be 'day' or 'week'"}), 400
+
+    db = get_db(readonly=True)
+    player_id, _ = request_player()
+    body = {
+        "success": True,
+        "period": period,
+        "buckets": trend(db, player_id, game_type, period, mode),
+    }
+    if country_code:
+        body["country"] = {
+            "country_code": country_code,
+            "buckets": country_trend(db, player_id, game_type, period, country_code, mode),
+        }
+    return flask.jsonify(body)
@@ -0,0 +1,227 @@
+"""Shared on-disk result cache for GeoGuessr Dashboard.
+
+Expensive payloads (teammate-filtered stats, country details) are stored in a
+small SQLite database under var/ so every worker process shares one warm
+cache that survives restarts.  Datasets are per player: entries are tagged
+with their player's dataset fingerprint, and a sync or edit of one player's
+game store retires only that player's older entries.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+import flask
+import geodash
+from geodash import profiling
+from geodash.store import games_path
+from geoguessr.metrics import Counter
+from geoguessr.utils import json_dumps, json_loads
+
+CACHE_LOOKUPS = Counter(
+    'geodash_cache_lookups_total', "Shared result cache lookups by namespace and result.",
+    ['namespace', 'result'])
+
+
+# Bumped when the layout changes; older cache files are simply rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+DROP TABLE IF EXISTS cache_entries;
+CREATE TABLE cache_entries(
+    key VARCHAR(64) PRIMARY KEY,
+    player_id VARCHAR(64) NOT NULL,
+    generation VARCHAR(64) NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_accessed_idx ON cache_entries(accessed_at);
+CREATE INDEX IF NOT EXISTS cache_entries_player_idx ON cache_entries(player_id, generation);
+"""
+
+
+def _stat_token(path):
+    """Return a cheap token that changes whenever the file at path changes."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _generation_path(player_id):
+    """Return the generation file a sync of player_id bumps."""
+    return geodash.app.config['GENERATION_DIR'] / player_id
+
+
+def _dataset_paths(player_id):
+    """Return the files whose changes define a player's dataset generation."""
+    if player_id is None:
+        return ()
+    return (
+        games_path('duels', player_id),
+        games_path('team_duels', player_id),
+        _generation_path(player_id),
+    )
+
+
+def dataset_fingerprint(player_id):
+    """Return a fingerprint of a player's game store and generation.
+
+    Only stat() calls are involved, so this is cheap enough to run on every
+    request without touching the database or decoding any JSON.
+    """
+    raw = "|".join(_stat_token(p) for p in _dataset_paths(player_id))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def dataset_last_modified(player_id):
+    """Return the latest modification time of a player's dataset as a Unix timestamp."""
+    mtimes = [0]
+    for path in _dataset_paths(player_id):
+        try:
+            mtimes.append(int(os.stat(path).st_mtime))
+        except OSError:
+            continue
+    return max(mtimes)
+
+
+def bump_generation(player_id):
+    """Mark a player's dataset as changed, invalidating their cached results everywhere."""
+    path = _generation_path(player_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+
+def make_key(player_id, namespace, params):
+    """Build a cache key from a player, a namespace and a dict of filter parameters."""
+    raw = json_dumps([player_id, namespace, params], sort_keys=True)
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _reset_schema(db):
+    """Rebuild the cache tables unless another worker just did.
+
+    The version is checked again under a write lock, so workers starting
+    together never drop a table another one has just created.
+    """
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    db.execute(statement)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+
+def get_cache_db():
+    """Open the shared cache database for this request."""
+    if 'cache_db' not in flask.g:
+        path = geodash.app.config['CACHE_FILENAME']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = sqlite3.connect(str(path), timeout=5)
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            _reset_schema(db)
+        flask.g.cache_db = db
+    return profiling.wrap(flask.g.cache_db)
+
+
+def close_cache_db(error):
+    """Close the cache database connection."""
+    db = flask.g.pop('cache_db', None)
+    if db is not None:
+        db.close()
+
+
+def cache_get(key, generation):
+    """Return the cached value for key, or None if missing or stale.
+
+    A hit only refreshes the entry's LRU timestamp when it is older than
+    CACHE_TOUCH_SECONDS, so most hits are pure reads.
+    """
+    db = get_cache_db()
+    row = db.execute(
+        "SELECT value, accessed_at FROM cache_entries WHERE key = ? AND generation = ?",
+        (key, generation)
+    ).fetchone()
+    if row is None:
+        return None
+    now = time.time()
+    if now - row[1] >= geodash.app.config['CACHE_TOUCH_SECONDS']:
+        with db:
+            db.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE key = ?",
+                (now, key)
+            )
+    return json_loads(row[0])
+
+
+def cache_set(player_id, key, generation, value):
+    """Store value under key and evict stale or least recently used entries.
+
+    Stale entries are only looked for in player_id's partition.
+    """
+    db = get_cache_db()
+    blob = json_dumps(value)
+    max_bytes = geodash.app.config['CACHE_MAX_BYTES']
+    if len(blob) > max_bytes:
+        return
+
+    with db:
+        # The player's entries from older generations can never be served again
+        db.execute(
+            "DELETE FROM cache_entries WHERE player_id = ? AND generation != ?",
+            (player_id, generation)
+        )
+        db.execute(
+            """INSERT OR REPLACE INTO cache_entries
+               (key, player_id, generation, value, size, accessed_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (key, player_id, generation, blob, len(blob), time.time())
+        )
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total > max_bytes:
+            rows = db.execute(
+                "SELECT key, size FROM cache_entries WHERE key != ? ORDER BY accessed_at",
+                (key,)
+            ).fetchall()
+            evict = []
+            for old_key, size in rows:
+                if total <= max_bytes:
+                    break
+                evict.append((old_key,))
+                total -= size
+            db.executemany("DELETE FROM cache_entries WHERE key = ?", evict)
+
+
+def peek_cached(player_id, namespace, params):
+    """Return the cached result for a player's dataset, or None without computing it."""
+    value = cache_get(make_key(player_id, namespace, params), dataset_fingerprint(player_id))
+    CACHE_LOOKUPS.inc(namespace=namespace, result='miss' if value is None else 'hit')
+    return value
+
+
+def cached(player_id, namespace, params, compute):
+    """Return compute() for a player's dataset through the shared cache.
+
+    The result must be JSON-serializable; it is returned as it would be after
+    a round trip through the cache, so hits and misses look identical.
+    """
+    generation = dataset_fingerprint(player_id)
+    key = make_key(player_id, namespace, params)
+    value = cache_get(key, generation)
+    CACHE_LOOKUPS.inc(namespace=namespace, result='miss' if value is None else 'hit')
+    if value is not None:
+        return value
+    value = compute()
+    cache_set(player_id or '', key, generation, value)
+    return json_loads(json_dumps(value))
@@ -0,0 +1,284 @@
+"""Command-line entry point for GeoGuessr Dashboard.
+
+    geodash sync --player-id ID --ncfa COOKIE [--profile]
+    geodash schedule --accounts accounts.json [--workers N] [--deadline SECONDS]
+    geodash profile --player-id ID [--game-type TYPE] [--mode MODE] [--teammate ID]
+    geodash validate --player-id ID
+
+`sync` runs the same incremental sync as the web app, without prompting,
+and writes to the same database and game stores.  Credentials can also come
+from GEODASH_PLAYER_ID and GEODASH_NCFA, which keeps the cookie out of the
+process list when run from cron.  `schedule` syncs every account in a JSON
+file ([{"playerId": ..., "ncfa": ...}], or $GEODASH_ACCOUNTS) concurrently;
+see geodash.scheduler.  `profile` runs the stats processor over a player's
+stored games under cProfile and tracemalloc; `sync --profile` profiles each
+sync phase.  Profiles are saved in PROFILE_DIR (see geodash.profiling).
+`validate` applies the ingest checks of geoguessr.validate to a game store
+written before they existed, quarantining rejected games.
+Progress goes to stderr; stdout gets a single JSON summary line.
+
+Exit codes:
+    0   sync complete (for schedule: no account failed)
+    1   sync failed (GeoGuessr API or network error)
+    2   bad usage
+    3   credentials rejected
+    4   database not initialised (run bin/geodashdb create)
+    75  a sync for this player is already running; try again later
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_AUTH = 3
+EXIT_NO_DATABASE = 4
+EXIT_BUSY = 75
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='geodash', description="GeoGuessr Dashboard tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sync = commands.add_parser('sync', help="fetch new games and recompute stats")
+    sync.add_argument('--player-id', default=os.environ.get('GEODASH_PLAYER_ID'),
+                      help="GeoGuessr player ID (default: $GEODASH_PLAYER_ID)")
+    sync.add_argument('--ncfa', default=os.environ.get('GEODASH_NCFA'),
+                      help="_ncfa cookie (default: $GEODASH_NCFA)")
+    sync.add_argument('-q', '--quiet', action='store_true',
+                      help="don't print progress to stderr")
+    sync.add_argument('--profile', action='store_true',
+                      help="profile each sync phase into PROFILE_DIR")
+
+    schedule = commands.add_parser('schedule', help="sync many accounts concurrently")
+    schedule.add_argument('--accounts', default=os.environ.get('GEODASH_ACCOUNTS'),
+                          help="JSON file of accounts (default: $GEODASH_ACCOUNTS)")
+    schedule.add_argument('--workers', type=int,
+                          help="concurrent syncs (default: SCHEDULER_WORKERS)")
+    schedule.add_argument('--deadline', type=float,
+                          help="seconds after which no further account is started")
+    schedule.add_argument('-q', '--quiet', action='store_true',
+                          help="don't print progress to stderr")
+
+    profile = commands.add_parser('profile', help="profile the stats processor on stored games")
+    profile.add_argument('--player-id', default=os.environ.get('GEODASH_PLAYER_ID'),
+                         help="GeoGuessr player ID (default: $GEODASH_PLAYER_ID)")
+    profile.add_argument('--game-type', choices=('duels', 'team_duels'), default='team_duels')
+    profile.add_argument('--mode', choices=('all', 'competitive', 'casual'), default='all')
+    profile.add_argument('--teammate', default='', help="only team duels with this teammate")
+
+    validate = commands.add_parser('validate', help="quarantine invalid games in a game store")
+    validate.add_argument('--player-id', default=os.environ.get('GEODASH_PLAYER_ID'),
+                          help="GeoGuessr player ID (default: $GEODASH_PLAYER_ID)")
+    return parser
+
+
+def _database_missing(app, command):
+    """Report and return True if the database has not been created."""
+    if Path(app.config['DATABASE_FILENAME']).exists():
+        return False
+    print(f"geodash {command}: database not found; run bin/geodashdb create", file=sys.stderr)
+    return True
+
+
+class _Timer:
+    """Job listener that records phase durations and echoes progress."""
+
+    def __init__(self, quiet):
+        self.quiet = quiet
+        self.started = {}
+        self.phases = {}
+
+    def __call__(self, event, data):
+        if event != 'phase':
+            return
+        phase = data['phase']
+        name = data.get('name', f"phase {phase}")
+        if data['status'] == 'in_progress':
+            self.started[phase] = time.monotonic()
+            if not self.quiet:
+                print(f"[{phase}/6] {name}...", file=sys.stderr)
+        elif phase in self.started:
+            self.phases[name] = round(time.monotonic() - self.started[phase], 3)
+
+
+def sync(args):
+    """Run one sync and print its summary.
+
+    Returns:
+        int: the process exit code
+    """
+    if not args.player_id or not args.ncfa:
+        print("geodash sync: --player-id and --ncfa (or GEODASH_PLAYER_ID and "
+              "GEODASH_NCFA) are required", file=sys.stderr)
+        return EXIT_USAGE
+
+    import geodash
+    from geodash import jobs
+    from geodash.store import valid_player_id
+
+    if not valid_player_id(args.player_id):
+        print(f"geodash sync: invalid player ID {args.player_id!r}", file=sys.stderr)
+        return EXIT_USAGE
+    if _database_missing(geodash.app, 'sync'):
+        return EXIT_NO_DATABASE
+
+    timer = _Timer(args.quiet)
+    listeners = [timer]
+    if args.profile:
+        from geodash import profiling
+        geodash.app.config['PROFILING_ENABLED'] = True
+        phases = profiling.PhaseProfiler(f"sync-{args.player_id}")
+        listeners.append(phases)
+
+    def listener(event, data):
+        for each in listeners:
+            each(event, data)
+
+    started = time.monotonic()
+    with geodash.app.app_context():
+        job, ran = jobs.run_sync_now(args.player_id, args.ncfa, listener)
+
+    summary = {
+        "status": job['status'] if ran else 'busy',
+        "job_id": job['id'],
+        "player_id": args.player_id,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "phases": timer.phases,
+    }
+    summary.update(job.get('result', {}))
+    summary.pop('success', None)
+    if args.profile:
+        phases.close()
+        summary['profiles'] = phases.paths
+    print(geodash.app.json.dumps(summary))
+
+    if not ran:
+        print(f"geodash sync: sync job {job['id']} is already running for this player",
+              file=sys.stderr)
+        return EXIT_BUSY
+    if job['status'] == 'complete':
+        return EXIT_OK
+    print(f"geodash sync: {job['result']['error']}", file=sys.stderr)
+    return EXIT_AUTH if 'field' in job['result'] else EXIT_FAILED
+
+
+def schedule(args):
+    """Sync every account in the accounts file and print a run summary.
+
+    Returns:
+        int: the process exit code
+    """
+    if not args.accounts:
+        print("geodash schedule: --accounts (or GEODASH_ACCOUNTS) is required", file=sys.stderr)
+        return EXIT_USAGE
+
+    import geodash
+    from geodash import scheduler
+
+    try:
+        accounts = scheduler.load_accounts(args.accounts)
+    except (OSError, ValueError) as exc:
+        print(f"geodash schedule: {args.accounts}: {exc}", file=sys.stderr)
+        return EXIT_USAGE
+    if _database_missing(geodash.app, 'schedule'):
+        return EXIT_NO_DATABASE
+
+    def listener(player_id, event, data):
+        if event == 'phase' and data['status'] == 'in_progress':
+            print(f"{player_id}: [{data['phase']}/6] {data.get('name', '')}", file=sys.stderr)
+
+    summary = scheduler.run_schedule(accounts, args.workers, args.deadline,
+                                     None if args.quiet else listener)
+    print(geodash.app.json.dumps(summary))
+
+    failed = [a for a in summary['accounts'] if a['status'] == 'error']
+    if any('field' in a for a in failed):
+        return EXIT_AUTH
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def profile(args):
+    """Profile process_games or process_duels on a player's stored games.
+
+    Returns:
+        int: the process exit code
+    """
+    import geodash
+    from geodash import profiling
+    from geodash.store import load_games, valid_player_id
+    from geoguessr.process_stats import process_duels, process_games
+
+    if not args.player_id or not valid_player_id(args.player_id):
+        print("geodash profile: a valid --player-id (or GEODASH_PLAYER_ID) is required",
+              file=sys.stderr)
+        return EXIT_USAGE
+
+    with geodash.app.app_context():
+        games = load_games(args.player_id, args.game_type, args.mode, args.teammate)
+    if not games:
+        print(f"geodash profile: no stored {args.game_type} games for {args.player_id}",
+              file=sys.stderr)
+        return EXIT_FAILED
+
+    process = process_duels if args.game_type == 'duels' else process_games
+    with profiling.Profile(f"process-{args.game_type}-{args.mode}-{args.player_id}") as result:
+        process(games)
+
+    print(geodash.app.json.dumps({
+        "player_id": args.player_id,
+        "game_type": args.game_type,
+        "mode": args.mode,
+        "games": len(games),
+        "elapsed_seconds": round(result.seconds, 3),
+        "profile": str(result.path),
+    }))
+    return EXIT_OK
+
+
+def validate(args):
+    """Quarantine a player's invalid stored games and recompute their stats.
+
+    Returns:
+        int: the process exit code
+    """
+    import geodash
+    from geodash.store import valid_player_id
+    from geodash.sync import compute_and_store_all_variations, validate_store
+
+    if not args.player_id or not valid_player_id(args.player_id):
+        print("geodash validate: a valid --player-id (or GEODASH_PLAYER_ID) is required",
+              file=sys.stderr)
+        return EXIT_USAGE
+    if _database_missing(geodash.app, 'validate'):
+        return EXIT_NO_DATABASE
+
+    with geodash.app.app_context():
+        summary = {game_type: validate_store(args.player_id, game_type)
+                   for game_type in ('duels', 'team_duels')}
+        if any(result['quarantined'] for result in summary.values()):
+            compute_and_store_all_variations(args.player_id)
+
+    print(geodash.app.json.dumps(dict(summary, player_id=args.player_id)))
+    return EXIT_OK
+
+
+def main(argv=None):
+    """Parse arguments and run the requested command."""
+    args = _parser().parse_args(argv)
+    if args.command == 'sync':
+        return sync(args)
+    if args.command == 'schedule':
+        return schedule(args)
+    if args.command == 'profile':
+        return profile(args)
+    if args.command == 'validate':
+        return validate(args)
+    return EXIT_USAGE
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,3 +8,78 @@ SESSION_COOKIE_NAME = 'geodash_session'
 
 GEODASH_ROOT = pathlib.Path(__file__).resolve().parent.parent
 DATABASE_FILENAME = GEODASH_ROOT / 'var' / 'geodash.sqlite3'
+DATABASE_MMAP_SIZE = 256 * 1024 * 1024
+DATABASE_CACHE_SIZE_KB = 16 * 1024
+DATABASE_BUSY_TIMEOUT_MS = 5000
+
+# Stats snapshots kept per player and filter type; older ones are deleted
+# after each sync (1 keeps only the latest)
+SNAPSHOT_RETENTION = 3
+
+# Background sync jobs: worker threads per process, seconds without a
+# heartbeat before a job is considered dead (running jobs beat every
+# SYNC_JOB_HEARTBEAT_SECONDS), subscriber poll interval and finished jobs
+# kept for status lookups
+SYNC_WORKERS = 2
+SYNC_JOB_STALE_SECONDS = 300
+SYNC_JOB_HEARTBEAT_SECONDS = 30
+SYNC_POLL_INTERVAL = 0.25
+SYNC_JOB_RETENTION = 50
+
+# Minimum seconds between per-game progress events of a running sync
+SYNC_PROGRESS_INTERVAL = 0.25
+
+# GeoGuessr API budget shared by every sync thread in a process, concurrent
+# username lookups, and days before a cached username is looked up again
+# (at most USERNAME_REFRESH_BATCH stale names per sync)
+GEOGUESSR_REQUESTS_PER_SECOND = 10
+USERNAME_WORKERS = 4
+USERNAME_TTL_DAYS = 30
+USERNAME_REFRESH_BATCH = 50
+
+# Multi-account scheduler: concurrent account syncs (sharing the request
+# budget above), the games/hour assumed for inactive accounts when
+# ranking them by expected backlog, and the most raw games a run keeps
+# for sharing between its accounts
+SCHEDULER_WORKERS = 4
+SCHEDULER_IDLE_GAMES_PER_HOUR = 0.1
+SCHEDULER_GAME_CACHE_SIZE = 1000
+
+# Game store written by the fetch pipeline, one directory per player
+PLAYER_DATA_DIR = GEODASH_ROOT / 'data' / 'players'
+
+# Player served when a read request has no ?player= and more than one
+# player is tracked (None: such requests are rejected)
+DEFAULT_PLAYER_ID = None
+
+# Shared result cache, visible to every worker process, and the per-player
+# generation files a sync bumps to retire that player's cached results
+CACHE_FILENAME = GEODASH_ROOT / 'var' / 'cache.sqlite3'
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Cache hits refresh an entry's LRU timestamp at most this often
+CACHE_TOUCH_SECONDS = 60
+GENERATION_DIR = GEODASH_ROOT / 'var' / 'generations'
+
+# Per-process limit on the last_n/since/until prefix-sum indexes kept in
+# memory (see geodash.windows), one per player, game type and filter
+WINDOW_INDEX_CACHE_SIZE = 32
+
+# Prometheus metrics at /metrics, served only to these client addresses
+METRICS_ENABLED = True
+METRICS_ALLOWED_ADDRS = ('127.0.0.1', '::1')
+
+# On-demand profiling (see geodash.profiling): requests ask for it with
+# ?profile=1 or an X-Geodash-Profile header and are profiled in debug mode or
+# from these addresses; profiles are saved in PROFILE_DIR
+PROFILING_ENABLED = False
+PROFILING_ALLOWED_ADDRS = ('127.0.0.1', '::1')
+PROFILE_DIR = GEODASH_ROOT / 'var' / 'profiles'
+
+# Country heatmaps with more points than this are binned into weighted cells
+HEATMAP_MAX_BINS = 2000
+
+# JSON responses at least this large are gzip/deflate compressed
+COMPRESS_MIN_SIZE = 1024
+
+# Embed the initial data bundle in rendered pages to save API round trips
+EMBED_BUNDLE = True
@@ -0,0 +1,244 @@
+"""Background sync jobs for GeoGuessr Dashboard.
+
+A sync runs on a worker thread instead of inside the request that started
+it.  Jobs and their progress events are stored in the database, so any
+server process can report on a job, a closed browser tab does not stop the
+sync, and a second request for the same player joins the running job.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import geodash
+from geodash import sync
+from geodash.model import get_db
+from geoguessr.utils import json_dumps, json_loads
+
+# Events that end a job's event stream
+TERMINAL_EVENTS = ('complete', 'error')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the process-wide sync worker pool, starting it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(geodash.app.config['SYNC_WORKERS']),
+                thread_name_prefix='geodash-sync'
+            )
+    return _executor
+
+
+def _job_dict(row):
+    """Convert a sync_jobs row to its API representation."""
+    job = {
+        'id': row['id'],
+        'player_id': row['player_id'],
+        'status': row['status'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    }
+    if row['result'] is not None:
+        job['result'] = json_loads(row['result'])
+    return job
+
+
+def get_job(db, job_id):
+    """Return a job by id, or None."""
+    row = db.execute("SELECT * FROM sync_jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def _add_event(db, job_id, event, data):
+    """Append an event to a job and refresh its heartbeat."""
+    db.execute(
+        """INSERT INTO sync_job_events (job_id, seq, event, data)
+           SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?
+           FROM sync_job_events WHERE job_id = ?""",
+        (job_id, event, json_dumps(data).decode(), job_id)
+    )
+    db.execute("UPDATE sync_jobs SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (job_id,))
+
+
+def _finish(db, job_id, event, payload):
+    """Mark an active job as finished with its terminal event.
+
+    Returns False if the job had already finished (for example it was
+    expired as stale while still running).
+    """
+    with db:
+        cur = db.execute(
+            """UPDATE sync_jobs SET status = ?, result = ?, updated_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND status IN ('queued', 'running')""",
+            (event, json_dumps(payload).decode(), job_id)
+        )
+        if cur.rowcount == 0:
+            return False
+        _add_event(db, job_id, event, payload)
+    return True
+
+
+def _heartbeat(job_id, stop):
+    """Refresh a running job's heartbeat until stop is set.
+
+    Runs on its own thread so long stretches without events (stats on a
+    large store, rate-limit back-offs) do not make a live job look stale.
+    """
+    interval = float(geodash.app.config['SYNC_JOB_HEARTBEAT_SECONDS'])
+    with geodash.app.app_context():
+        db = get_db()
+        while not stop.wait(interval):
+            with db:
+                db.execute(
+                    """UPDATE sync_jobs SET updated_at = CURRENT_TIMESTAMP
+                       WHERE id = ? AND status = 'running'""",
+                    (job_id,)
+                )
+
+
+def _expire_stale_jobs(db):
+    """Fail active jobs whose worker stopped reporting progress."""
+    stale = int(geodash.app.config['SYNC_JOB_STALE_SECONDS'])
+    cur = db.execute(
+        """SELECT id FROM sync_jobs
+           WHERE status IN ('queued', 'running') AND updated_at < datetime('now', ?)""",
+        (f'-{stale} seconds',)
+    )
+    for row in cur.fetchall():
+        _finish(db, row['id'], 'error', {
+            "error": "The sync stopped responding. Please try again."
+        })
+
+
+def _prune_jobs(db):
+    """Delete finished jobs beyond SYNC_JOB_RETENTION, with their events."""
+    with db:
+        db.execute(
+            """DELETE FROM sync_jobs
+               WHERE status IN ('complete', 'error') AND id NOT IN (
+                   SELECT id FROM sync_jobs WHERE status IN ('complete', 'error')
+                   ORDER BY id DESC LIMIT ?
+               )""",
+            (int(geodash.app.config['SYNC_JOB_RETENTION']),)
+        )
+
+
+def _create_job(db, player_id):
+    """Queue a job for player_id unless one is already queued or running.
+
+    Returns:
+        tuple: (job dict, True if a new job was created)
+    """
+    _expire_stale_jobs(db)
+    try:
+        with db:
+            cur = db.execute("INSERT INTO sync_jobs (player_id) VALUES (?)", (player_id,))
+    except sqlite3.IntegrityError:
+        row = db.execute(
+            "SELECT * FROM sync_jobs WHERE player_id = ? AND status IN ('queued', 'running')",
+            (player_id,)
+        ).fetchone()
+        if row is not None:
+            return _job_dict(row), False
+        # The active job finished in between; start a fresh one
+        return _create_job(db, player_id)
+    return get_job(db, cur.lastrowid), True
+
+
+def submit_sync(player_id, ncfa):
+    """Queue a sync for player_id, or join the one already queued or running.
+
+    The ncfa cookie is only handed to the worker, never stored.
+
+    Returns:
+        tuple: (job dict, True if a new job was created)
+    """
+    job, created = _create_job(get_db(), player_id)
+    if created:
+        _get_executor().submit(_run_job, job['id'], player_id, ncfa)
+    return job, created
+
+
+def run_sync_now(player_id, ncfa, listener=None, **options):
+    """Run a sync job in the calling thread, for command-line use.
+
+    listener(event, data) sees every event, including the final one, and
+    options are passed on to sync.run_sync. If a sync for the player is
+    already active it is returned without running.
+
+    Returns:
+        tuple: (job dict, True if this call ran the sync)
+    """
+    job, created = _create_job(get_db(), player_id)
+    if created:
+        _run_job(job['id'], player_id, ncfa, listener, options)
+        job = get_job(get_db(), job['id'])
+    return job, created
+
+
+def _run_job(job_id, player_id, ncfa, listener=None, options=None):
+    """Run one sync job to completion (worker or CLI entry point)."""
+    with geodash.app.app_context():
+        db = get_db()
+        with db:
+            cur = db.execute(
+                """UPDATE sync_jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status = 'queued'""",
+                (job_id,)
+            )
+        if cur.rowcount == 0:
+            return
+
+        def emit(event, data):
+            with db:
+                _add_event(db, job_id, event, data)
+            if listener:
+                listener(event, data)
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop),
+                                     name=f'geodash-heartbeat-{job_id}', daemon=True)
+        heartbeat.start()
+        try:
+            event, payload = 'complete', sync.run_sync(player_id, ncfa, emit, **(options or {}))
+        except Exception as exc:
+            geodash.app.logger.exception("Sync job %s failed", job_id)
+            if db.in_transaction:
+                db.rollback()
+            event, payload = 'error', sync.sync_error(exc)
+        finally:
+            stop.set()
+            heartbeat.join()
+        if _finish(db, job_id, event, payload) and listener:
+            listener(event, payload)
+        _prune_jobs(db)
+
+
+def job_events(job_id, after=0):
+    """Yield a job's events after seq `after`, following it until it ends.
+
+    Yields (seq, event, data) tuples, and None whenever a poll finds nothing
+    new so callers can send keepalives. Must run inside an app context.
+    """
+    db = get_db(readonly=True)
+    poll = float(geodash.app.config['SYNC_POLL_INTERVAL'])
+    while True:
+        rows = db.execute(
+            """SELECT seq, event, data FROM sync_job_events
+               WHERE job_id = ? AND seq > ? ORDER BY seq""",
+            (job_id, after)
+        ).fetchall()
+        for row in rows:
+            after = row['seq']
+            yield after, row['event'], json_loads(row['data'])
+            if row['event'] in TERMINAL_EVENTS:
+                return
+        if not rows:
+            if get_job(db, job_id) is None:
+                return
+            yield None
+            time.sleep(poll)
@@ -0,0 +1,37 @@
+"""Flask JSON provider backed by the shared fast codec."""
+from flask.json.provider import DefaultJSONProvider
+from geoguessr.utils import json_dumps, json_loads
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Encode and decode through orjson when it is installed.
+
+    Values the fast codec cannot handle (Decimal, objects with __html__)
+    and pretty-printed debug output fall back to the stdlib provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a JSON string."""
+        if 'indent' not in kwargs:
+            try:
+                return json_dumps(obj, sort_keys=self.sort_keys).decode()
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize a JSON string or bytes."""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return json_loads(s)
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response without an intermediate str."""
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = json_dumps(obj, sort_keys=self.sort_keys)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
@@ -1,28 +1,66 @@
 """GeoGuessr Dashboard database connection."""
 import sqlite3
+import threading
 import flask
 import geodash
+from geodash import profiling
 
+# Connections are reused by later requests on the same thread
+_local = threading.local()
 
-def dict_factory(cursor, row):
-    """Convert database row to dictionary."""
-    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
+def _connect(db_path, readonly):
+    """Open and tune a new SQLite connection."""
+    config = geodash.app.config
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(str(db_path))
+        # WAL lets readers proceed while a sync holds the write lock
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    # sqlite3.Row is built in C and supports row['col'] and dict(row)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(config['DATABASE_BUSY_TIMEOUT_MS'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(config['DATABASE_MMAP_SIZE'])}")
+    conn.execute(f"PRAGMA cache_size = -{int(config['DATABASE_CACHE_SIZE_KB'])}")
+    # Enable foreign keys
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
 
-def get_db():
-    """Open a new database connection."""
-    if 'sqlite_db' not in flask.g:
-        db_path = geodash.app.config['DATABASE_FILENAME']
-        flask.g.sqlite_db = sqlite3.connect(str(db_path))
-        flask.g.sqlite_db.row_factory = dict_factory
-        # Enable foreign keys
-        flask.g.sqlite_db.execute("PRAGMA foreign_keys = ON")
-    return flask.g.sqlite_db
+
+def _thread_connection(readonly):
+    """Return this thread's pooled connection to the configured database."""
+    db_path = str(geodash.app.config['DATABASE_FILENAME'])
+    pool = getattr(_local, 'connections', None)
+    if pool is None:
+        pool = _local.connections = {}
+    key = (db_path, readonly)
+    if key not in pool:
+        pool[key] = _connect(db_path, readonly)
+    return pool[key]
+
+
+def get_db(readonly=False):
+    """Return a database connection for this request.
+
+    Read-only handlers should pass readonly=True; they get a connection that
+    cannot write and never waits on a sync in progress.
+    """
+    name = 'sqlite_db_ro' if readonly else 'sqlite_db'
+    if name not in flask.g:
+        setattr(flask.g, name, _thread_connection(readonly))
+    return profiling.wrap(getattr(flask.g, name))
 
 
 def close_db(error):
-    """Close the database connection."""
+    """Finish the request's transactions and return connections to the pool."""
     db = flask.g.pop('sqlite_db', None)
-    if db is not None:
-        db.commit()
-        db.close()
+    if db is not None and db.in_transaction:
+        if error is None:
+            db.commit()
+        else:
+            db.rollback()
+    db = flask.g.pop('sqlite_db_ro', None)
+    if db is not None and db.in_transaction:
+        db.rollback()
@@ -0,0 +1,281 @@
+"""On-demand profiling of single requests, sync phases and stats runs.
+
+A Profile wraps a block with cProfile and tracemalloc.  While
+PROFILING_ENABLED is set, database connections returned by get_db() and
+get_cache_db() also time every statement run inside an active Profile.
+On exit the profile is saved under PROFILE_DIR as <stamp>-<label>.prof
+(for pstats or snakeviz) and <stamp>-<label>.json, a summary of the top
+functions by cumulative time, the top allocation sites and SQL statement
+counts and timings.
+
+Requests are profiled with ?profile=1 or an X-Geodash-Profile header, when
+profiling is enabled and the app is in debug mode or the client is in
+PROFILING_ALLOWED_ADDRS; the response then carries a Server-Timing header
+and the profile's name in X-Geodash-Profile.  `geodash sync --profile`
+profiles each sync phase and `geodash profile` the stats processors.
+"""
+import cProfile
+import json
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import flask
+import geodash
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+_local = threading.local()
+
+# cProfile (from Python 3.12) and tracemalloc are process-wide, so only one
+# profile runs at a time
+_running = threading.Lock()
+
+
+def active():
+    """Return the Profile running on this thread, or None."""
+    return getattr(_local, 'profile', None)
+
+
+class Profile:
+    """cProfile, tracemalloc and SQL timings for one block of work."""
+
+    def __init__(self, label):
+        self.label = re.sub(r'[^A-Za-z0-9_.-]+', '-', label).strip('-') or 'profile'
+        self.sql = {}
+        self.seconds = None
+        self.path = None
+
+    def __enter__(self):
+        if not _running.acquire(blocking=False):
+            raise RuntimeError("another profile is already running")
+        try:
+            self._profiler = cProfile.Profile()
+            self._owns_tracing = not tracemalloc.is_tracing()
+            if self._owns_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self._started = time.perf_counter()
+            self._profiler.enable()
+        except BaseException:
+            _running.release()
+            raise
+        _local.profile = self
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.disable()
+        self.seconds = time.perf_counter() - self._started
+        _local.profile = None
+        peak = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        if self._owns_tracing:
+            tracemalloc.stop()
+        _running.release()
+        self.path = self._save(snapshot, peak)
+        return False
+
+    def record_sql(self, statement, seconds, executions=1):
+        """Add time spent running (or fetching the rows of) a statement."""
+        key = ' '.join(statement.split())
+        count, total = self.sql.get(key, (0, 0.0))
+        self.sql[key] = (count + executions, total + seconds)
+
+    @property
+    def sql_count(self):
+        return sum(count for count, _ in self.sql.values())
+
+    @property
+    def sql_seconds(self):
+        return sum(total for _, total in self.sql.values())
+
+    def _save(self, snapshot, peak):
+        directory = geodash.app.config['PROFILE_DIR']
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%f')
+        path = directory / f"{stamp}-{self.label}"
+
+        stats = pstats.Stats(self._profiler)
+        stats.dump_stats(f"{path}.prof")
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        summary = {
+            "label": self.label,
+            "seconds": round(self.seconds, 4),
+            "peak_memory_mb": round(peak / 2**20, 2),
+            "top_functions": [
+                {"function": f"{file}:{line}({name})", "calls": nc,
+                 "tottime": round(tt, 4), "cumtime": round(ct, 4)}
+                for (file, line, name), (_, nc, tt, ct, _) in functions[:TOP_FUNCTIONS]
+            ],
+            "top_allocations": [
+                {"site": str(stat.traceback), "size_kb": round(stat.size / 1024, 1),
+                 "count": stat.count}
+                for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+            ],
+            "sql": {
+                "statements": self.sql_count,
+                "seconds": round(self.sql_seconds, 4),
+                "by_statement": [
+                    {"sql": sql, "count": count, "seconds": round(total, 4)}
+                    for sql, (count, total) in sorted(self.sql.items(), key=lambda item: -item[1][1])
+                ],
+            },
+        }
+        with open(f"{path}.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+        return path
+
+
+class _ProfiledCursor:
+    """Cursor whose fetches count towards its statement's time."""
+
+    def __init__(self, cursor, statement):
+        self._cursor = cursor
+        self._statement = statement
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            profile = active()
+            if profile is not None:
+                profile.record_sql(self._statement, time.perf_counter() - started, executions=0)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+
+class _ProfiledConnection:
+    """Connection proxy that records statements run inside a Profile."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def _run(self, method, statement, *args):
+        profile = active()
+        if profile is None:
+            return method(statement, *args)
+        started = time.perf_counter()
+        try:
+            cursor = method(statement, *args)
+        finally:
+            profile.record_sql(statement, time.perf_counter() - started)
+        return _ProfiledCursor(cursor, statement)
+
+    def execute(self, statement, *args):
+        return self._run(self._conn.execute, statement, *args)
+
+    def executemany(self, statement, *args):
+        return self._run(self._conn.executemany, statement, *args)
+
+    def executescript(self, script):
+        return self._run(self._conn.executescript, script)
+
+
+def wrap(conn):
+    """Return conn, timed inside profiles when PROFILING_ENABLED."""
+    if geodash.app.config['PROFILING_ENABLED']:
+        return _ProfiledConnection(conn)
+    return conn
+
+
+class PhaseProfiler:
+    """Sync listener profiling each phase separately.
+
+    Must be called on the thread running the sync (as run_sync_now's
+    listener is); profiles are saved as each phase completes.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.paths = []
+        self._current = None
+
+    def __call__(self, event, data):
+        if event == 'phase' and data.get('status') == 'complete':
+            self.close()
+        elif event == 'phase' and data.get('status') == 'in_progress':
+            self.close()
+            self._current = Profile(f"{self.label}-phase{data['phase']}")
+            self._current.__enter__()
+        elif event in ('complete', 'error'):
+            self.close()
+
+    def close(self):
+        """Stop and save the running phase's profile, if any."""
+        if self._current is not None:
+            self._current.__exit__(None, None, None)
+            self.paths.append(str(self._current.path))
+            self._current = None
+
+
+def _requested():
+    config = geodash.app.config
+    if not config['PROFILING_ENABLED']:
+        return False
+    args, headers = flask.request.args, flask.request.headers
+    if args.get('profile') in (None, '', '0') and not headers.get('X-Geodash-Profile'):
+        return False
+    return geodash.app.debug or flask.request.remote_addr in config['PROFILING_ALLOWED_ADDRS']
+
+
+@geodash.app.before_request
+def start_request_profile():
+    """Start profiling the request if it asked to be profiled."""
+    if _requested():
+        profile = Profile(f"{flask.request.method}{flask.request.path}")
+        try:
+            flask.g.profile = profile.__enter__()
+        except RuntimeError as exc:
+            geodash.app.logger.warning("Not profiling %s: %s", flask.request.path, exc)
+
+
+@geodash.app.after_request
+def finish_request_profile(response):
+    """Save the request's profile and report it in the response headers."""
+    profile = flask.g.pop('profile', None)
+    if profile is not None:
+        profile.__exit__(None, None, None)
+        response.headers['X-Geodash-Profile'] = profile.path.name
+        response.headers['Server-Timing'] = (
+            f'sql;desc="{profile.sql_count} statements";dur={profile.sql_seconds * 1000:.1f}, '
+            f'app;dur={profile.seconds * 1000:.1f}'
+        )
+    return response
+
+
+@geodash.app.teardown_request
+def abandon_request_profile(error):
+    """Save the profile of a request that raised before after_request."""
+    profile = flask.g.pop('profile', None)
+    if profile is not None:
+        profile.__exit__(None, None, None)
@@ -0,0 +1,414 @@
+"""SQL round store and push-down aggregation for GeoGuessr Dashboard.
+
+Synced games are flattened into one row per game, per round and per player
+round, partitioned by owner_id: the tracked player whose perspective (team,
+result) the rows are from.  Guess countries are reverse geocoded once at ingest, so filtered
+stats are GROUP BY queries instead of Python passes over the game store.
+"""
+import reverse_geocoder as rg
+from geoguessr.utils import geocoding, json_dumps, parse_time
+
+# World map diagonal in meters, used as the distance of a missed guess
+MAP_SIZE = 14916.862 * 1000
+
+# Trend rollup periods and the SQL bucket (day, or Monday of the week) of a game g
+PERIODS = {
+    'day': "date(g.played_at)",
+    'week': "date(g.played_at, '-6 days', 'weekday 1')",
+}
+
+
+def _played_at(game):
+    """Return a game's start time as UTC 'YYYY-MM-DD HH:MM:SS', or None."""
+    if not game.get('playedAt'):
+        return None
+    return parse_time(game['playedAt']).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _flatten_team_game(game, owner_id, mapsize):
+    """Flatten a 2-player team game the way process_games reads it."""
+    players = list(game['playerStats'].keys())
+    if len(players) != 2:
+        return None
+
+    game_id = game['gameId']
+    health_change = game['teamStats']['totalHealthChange']
+    score_diff = game['teamStats'].get('scoreDiff', 0)
+    won = health_change > -6000
+    lost = health_change == -6000
+    num_rounds = game['roundStats'][-1]['roundNumber']
+    enemy_best = {rs['roundNumber']: rs.get('enemyBestScore', 0) for rs in game['roundStats']}
+
+    p1, p2 = players
+    rounds_p1 = {r['roundNumber']: r for r in game['playerStats'][p1]['rounds']}
+    rounds_p2 = {r['roundNumber']: r for r in game['playerStats'][p2]['rounds']}
+
+    rounds = []
+    player_rounds = []
+    for rn in range(1, num_rounds + 1):
+        r1 = rounds_p1.get(rn)
+        r2 = rounds_p2.get(rn)
+        score1, dist1 = (r1['score'], r1['distance']) if r1 else (0, mapsize)
+        score2, dist2 = (r2['score'], r2['distance']) if r2 else (0, mapsize)
+
+        country = r1['country'] if r1 else None
+        if country is None and r2 is not None:
+            country = r2['country']
+
+        for pid, r, score, dist, other_dist in ((p1, r1, score1, dist1, dist2),
+                                                (p2, r2, score2, dist2, dist1)):
+            player_rounds.append(_player_round(owner_id, game_id, rn, pid, r, score, dist,
+                                               dist < other_dist))
+
+        # The team's guess is the better-scoring teammate's
+        best = r1 if score1 > score2 else r2
+        rounds.append({
+            'owner_id': owner_id,
+            'game_id': game_id,
+            'round_number': rn,
+            'country_code': country.lower() if country else None,
+            'team_score': max(score1, score2),
+            'team_distance': min(dist1, dist2),
+            'enemy_score': enemy_best.get(rn, 0),
+            'five_ks': (score1 == 5000) + (score2 == 5000),
+            'guess': (best['lat'], best['lng']) if best and country else None,
+        })
+
+    game_row = (owner_id, game_id, 'team_duels', int(game.get('isCompetitive', False)), int(won),
+                int(lost and score_diff > 0), int(won and score_diff < 0), num_rounds,
+                _played_at(game))
+    return game_row, rounds, player_rounds
+
+
+def _flatten_duel(game, player_id, mapsize):
+    """Flatten a solo duel the way process_duels reads it."""
+    game_id = game['gameId']
+    round_stats = game['roundStats']
+    health_change = sum(rs['totalHealthChange'] for rs in round_stats)
+    score_diff = game['playerStats']['totalScore'] - sum(rs['enemyScore'] for rs in round_stats)
+    won = health_change > -6000
+    lost = health_change == -6000
+    num_rounds = len(round_stats)
+
+    rounds_dict = {r['roundNumber']: r for r in game['playerStats']['rounds']}
+    round_stats_dict = {rs['roundNumber']: rs for rs in round_stats}
+
+    rounds = []
+    player_rounds = []
+    for rn in range(1, num_rounds + 1):
+        r = rounds_dict.get(rn)
+        rs = round_stats_dict.get(rn)
+        score, dist = (r['score'], r['distance']) if r else (0, mapsize)
+
+        country = r['country'] if r else None
+        if country is None and rs:
+            country = rs.get('country')
+
+        player_rounds.append(_player_round(player_id, game_id, rn, player_id, r, score, dist, True))
+        rounds.append({
+            'owner_id': player_id,
+            'game_id': game_id,
+            'round_number': rn,
+            'country_code': country.lower() if country else None,
+            'team_score': score,
+            'team_distance': dist,
+            'enemy_score': rs['enemyScore'] if rs else 0,
+            'five_ks': int(score == 5000),
+            'guess': (r['lat'], r['lng']) if r and country else None,
+        })
+
+    game_row = (player_id, game_id, 'duels', int(game.get('isCompetitive', False)), int(won),
+                int(lost and score_diff > 0), int(won and score_diff < 0), num_rounds,
+                _played_at(game))
+    return game_row, rounds, player_rounds
+
+
+def _player_round(owner_id, game_id, round_number, player_id, r, score, dist, contributed):
+    """Build a player_rounds row; a missed round has no guess."""
+    r = r or {}
+    return (owner_id, game_id, round_number, player_id, score, dist, r.get('time'),
+            r.get('lat'), r.get('lng'), r.get('actualLat'), r.get('actualLng'),
+            int(contributed))
+
+
+def new_round_rows(db, game_type, games, player_id, mapsize=MAP_SIZE, replace=()):
+    """Flatten player_id's games not yet in their round store partition.
+
+    Games whose IDs are in replace are flattened again even if stored;
+    delete_games must remove their old rows before the new ones are
+    inserted. Does no writes, so the reverse geocoding runs without
+    holding the database write lock.
+
+    Returns:
+        dict: {"games": [...], "rounds": [...], "player_rounds": [...]}
+    """
+    cur = db.execute(
+        "SELECT game_id FROM games WHERE owner_id = ? AND game_type = ?",
+        (player_id, game_type)
+    )
+    known = {row[0] for row in cur.fetchall()} - set(replace)
+
+    rows = {"games": [], "rounds": [], "player_rounds": []}
+    rounds = []
+    for game in games:
+        game_id = game.get('gameId')
+        if game_id is None or game_id in known:
+            continue
+        known.add(game_id)
+
+        if game_type == 'team_duels':
+            flat = _flatten_team_game(game, player_id, mapsize)
+        else:
+            flat = _flatten_duel(game, player_id, mapsize)
+        if flat is None:
+            continue
+
+        game_row, game_rounds, player_rounds = flat
+        rows["games"].append(game_row)
+        rounds.extend(game_rounds)
+        rows["player_rounds"].extend(player_rounds)
+
+    # Batch reverse geocode unique guess coordinates
+    coords = list({r['guess'] for r in rounds if r['guess'] is not None})
+    guess_countries = {}
+    if coords:
+        with geocoding(len(coords)):
+            results = rg.search(coords)
+        for coord, result in zip(coords, results):
+            guess_countries[coord] = result['cc'].lower()
+
+    rows["rounds"] = [
+        (r['owner_id'], r['game_id'], r['round_number'], r['country_code'], r['team_score'],
+         r['team_distance'], r['enemy_score'], r['five_ks'], guess_countries.get(r['guess']))
+        for r in rounds
+    ]
+    return rows
+
+
+def insert_round_rows(db, rows):
+    """Insert rows from new_round_rows without committing."""
+    db.executemany(
+        """INSERT OR IGNORE INTO games
+           (owner_id, game_id, game_type, is_competitive, won, multi_merchant,
+            reverse_merchant, num_rounds, played_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows["games"]
+    )
+    db.executemany(
+        """INSERT OR IGNORE INTO game_rounds
+           (owner_id, game_id, round_number, country_code, team_score, team_distance,
+            enemy_score, five_ks, guess_country)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows["rounds"]
+    )
+    db.executemany(
+        """INSERT OR IGNORE INTO player_rounds
+           (owner_id, game_id, round_number, player_id, score, distance, time,
+            lat, lng, actual_lat, actual_lng, contributed)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows["player_rounds"]
+    )
+
+
+def delete_games(db, owner_id, game_type, game_ids):
+    """Delete games, with their rounds, from owner_id's round store.
+
+    Returns the number of games deleted; their trend rollups must then be
+    rebuilt. Runs inside the caller's transaction.
+    """
+    cur = db.execute(
+        """DELETE FROM games
+           WHERE owner_id = ? AND game_type = ? AND game_id IN (SELECT value FROM json_each(?))""",
+        (owner_id, game_type, json_dumps(sorted(game_ids)).decode())
+    )
+    return cur.rowcount
+
+
+def add_to_rollups(db, owner_id, game_ids=None):
+    """Add games in owner_id's round store to their trend rollups.
+
+    Only the given games are read, so a sync's rollup update costs as much
+    as its new games; game_ids=None adds every game, for rebuild_rollups.
+    Runs inside the caller's transaction.
+    """
+    where, params = "owner_id = ? AND played_at IS NOT NULL", [owner_id]
+    if game_ids is not None:
+        where += " AND game_id IN (SELECT value FROM json_each(?))"
+        params.append(json_dumps(sorted(game_ids)).decode())
+
+    for period, bucket in PERIODS.items():
+        db.execute(
+            f"""INSERT INTO trend_rollups
+                (owner_id, game_type, period, bucket, is_competitive, games, wins, rounds,
+                 total_score, five_ks)
+                SELECT g.owner_id, g.game_type, ?, {bucket} AS day, g.is_competitive,
+                       COUNT(*), SUM(g.won), SUM(r.rounds), SUM(r.score), SUM(r.five_ks)
+                FROM (SELECT * FROM games WHERE {where}) g
+                JOIN (SELECT game_id, COUNT(*) AS rounds, SUM(team_score) AS score,
+                             SUM(five_ks) AS five_ks
+                      FROM game_rounds
+                      WHERE owner_id = ? AND game_id IN (SELECT game_id FROM games WHERE {where})
+                      GROUP BY game_id) r ON r.game_id = g.game_id
+                GROUP BY g.game_type, day, g.is_competitive
+                ON CONFLICT (owner_id, game_type, period, bucket, is_competitive) DO UPDATE SET
+                    games = games + excluded.games,
+                    wins = wins + excluded.wins,
+                    rounds = rounds + excluded.rounds,
+                    total_score = total_score + excluded.total_score,
+                    five_ks = five_ks + excluded.five_ks""",
+            [period, *params, owner_id, *params]
+        )
+        db.execute(
+            f"""INSERT INTO trend_country_rollups
+                (owner_id, game_type, period, country_code, bucket, is_competitive, rounds,
+                 score_diff)
+                SELECT g.owner_id, g.game_type, ?, gr.country_code, {bucket} AS day,
+                       g.is_competitive, COUNT(*), SUM(gr.team_score - gr.enemy_score)
+                FROM (SELECT * FROM games WHERE {where}) g
+                JOIN game_rounds gr ON gr.owner_id = g.owner_id AND gr.game_id = g.game_id
+                WHERE gr.country_code IS NOT NULL
+                GROUP BY g.game_type, gr.country_code, day, g.is_competitive
+                ON CONFLICT (owner_id, game_type, period, country_code, bucket, is_competitive)
+                DO UPDATE SET
+                    rounds = rounds + excluded.rounds,
+                    score_diff = score_diff + excluded.score_diff""",
+            [period, *params]
+        )
+
+
+def rebuild_rollups(db, owner_id):
+    """Recompute owner_id's trend rollups from their round store.
+
+    For when games leave the round store. Runs inside the caller's
+    transaction.
+    """
+    db.execute("DELETE FROM trend_rollups WHERE owner_id = ?", (owner_id,))
+    db.execute("DELETE FROM trend_country_rollups WHERE owner_id = ?", (owner_id,))
+    add_to_rollups(db, owner_id)
+
+
+def _mode_clause(mode):
+    if mode == 'competitive':
+        return " AND is_competitive = 1"
+    if mode == 'casual':
+        return " AND is_competitive = 0"
+    return ""
+
+
+def trend(db, owner_id, game_type, period, mode='all'):
+    """Return owner_id's per-bucket totals from the trend rollups, oldest first."""
+    cur = db.execute(
+        f"""SELECT bucket, SUM(games) AS games, SUM(wins) AS wins,
+                   SUM(wins) * 1.0 / SUM(games) AS win_rate,
+                   SUM(total_score) * 1.0 / SUM(rounds) AS avg_score,
+                   SUM(five_ks) AS total_5ks
+            FROM trend_rollups
+            WHERE owner_id = ? AND game_type = ? AND period = ?{_mode_clause(mode)}
+            GROUP BY bucket
+            ORDER BY bucket""",
+        (owner_id, game_type, period)
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def country_trend(db, owner_id, game_type, period, country_code, mode='all'):
+    """Return owner_id's per-bucket score diff in one country, oldest first."""
+    cur = db.execute(
+        f"""SELECT bucket, SUM(rounds) AS rounds,
+                   SUM(score_diff) * 1.0 / SUM(rounds) AS avg_score_diff
+            FROM trend_country_rollups
+            WHERE owner_id = ? AND game_type = ? AND period = ? AND country_code = ?
+                  {_mode_clause(mode)}
+            GROUP BY bucket
+            ORDER BY bucket""",
+        (owner_id, game_type, period, country_code)
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def game_filter(player_id, game_type, mode, teammate):
+    """Return a WHERE clause over player_id's games g and its parameters."""
+    clauses = ["g.owner_id = ?", "g.game_type = ?"]
+    params = [player_id, game_type]
+    if mode == 'competitive':
+        clauses.append("g.is_competitive = 1")
+    elif mode == 'casual':
+        clauses.append("g.is_competitive = 0")
+    if teammate:
+        clauses.append(
+            "g.game_id IN (SELECT game_id FROM player_rounds WHERE owner_id = ? AND player_id = ?)"
+        )
+        params.extend([player_id, teammate])
+    return " AND ".join(clauses), params
+
+
+def aggregate_overall(db, player_id, game_type, mode='all', teammate=''):
+    """Return game-level totals for the player's matching games."""
+    where, params = game_filter(player_id, game_type, mode, teammate)
+    cur = db.execute(
+        f"""SELECT COUNT(*) AS total_games,
+                   COALESCE(AVG(g.won), 0) AS win_percentage,
+                   COALESCE(AVG(g.num_rounds), 0) AS avg_rounds_per_game,
+                   COALESCE(SUM(g.multi_merchant), 0) AS multi_merchant,
+                   COALESCE(SUM(g.reverse_merchant), 0) AS reverse_merchant
+            FROM games g
+            WHERE {where}""",
+        params
+    )
+    return dict(cur.fetchone())
+
+
+def aggregate_players(db, player_id, game_type, mode='all', teammate=''):
+    """Return per-player metrics for the player's matching games, most games first.
+
+    contribution_percent is the share of rounds where the player guessed
+    closer than their teammate.  As in process_games, 5ks only count in
+    rounds with a known country.
+    """
+    where, params = game_filter(player_id, game_type, mode, teammate)
+    cur = db.execute(
+        f"""SELECT pr.player_id,
+                   COALESCE(pn.username, pr.player_id) AS username,
+                   AVG(pr.contributed) AS contribution_percent,
+                   AVG(pr.score) AS avg_individual_score,
+                   SUM(pr.score = 5000 AND gr.country_code IS NOT NULL) AS total_5ks,
+                   COALESCE(AVG(pr.time), 0) AS avg_guess_time,
+                   COUNT(DISTINCT pr.game_id) AS games_played
+            FROM games g
+            JOIN player_rounds pr ON pr.owner_id = g.owner_id AND pr.game_id = g.game_id
+            JOIN game_rounds gr ON gr.owner_id = pr.owner_id AND gr.game_id = pr.game_id
+                                AND gr.round_number = pr.round_number
+            LEFT JOIN player_names pn ON pn.player_id = pr.player_id
+            WHERE {where}
+            GROUP BY pr.player_id
+            ORDER BY games_played DESC, pr.player_id""",
+        params
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+
+def aggregate_countries(db, player_id, game_type, mode='all', teammate=''):
+    """Return per-country metrics for the player's matching games.
+
+    Rows use the country_stats column names and are sorted by
+    avg_score_diff, best first.
+    """
+    where, params = game_filter(player_id, game_type, mode, teammate)
+    cur = db.execute(
+        f"""SELECT gr.country_code,
+                   COUNT(*) AS rounds,
+                   AVG(gr.team_score) AS avg_score,
+                   AVG(gr.team_distance) / 1000 AS avg_distance_km,
+                   SUM(gr.five_ks) * 1.0 / COUNT(*) AS five_k_rate,
+                   AVG(gr.team_score - gr.enemy_score) AS avg_score_diff,
+                   COALESCE(SUM(gr.guess_country = gr.country_code) * 1.0
+                            / COUNT(gr.guess_country), 0) AS hit_rate,
+                   AVG(gr.team_score > gr.enemy_score) AS win_rate
+            FROM games g
+            JOIN game_rounds gr ON gr.owner_id = g.owner_id AND gr.game_id = g.game_id
+            WHERE {where} AND gr.country_code IS NOT NULL
+            GROUP BY gr.country_code
+            ORDER BY avg_score_diff DESC""",
+        params
+    )
+    return [dict(row) for row in cur.fetchall()]
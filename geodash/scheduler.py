@@ -0,0 +1,202 @@
+"""Sync a list of tracked accounts concurrently.
+
+Accounts are synced most-overdue first, on SCHEDULER_WORKERS threads that
+all draw on the one GeoGuessr request budget (GEOGUESSR_REQUESTS_PER_SECOND),
+so the whole run's request rate is fixed however many accounts there are.
+A game that two tracked players were in is fetched once and processed from
+each player's perspective.  With a deadline, accounts not started in time
+are deferred; they are then the stalest and go first on the next run.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import geodash
+from geodash import jobs
+from geodash.model import get_db
+from geodash.store import valid_player_id
+from geoguessr.utils import json_dumps, load_data as load_json
+
+
+class GameCache:
+    """Raw games shared by the syncs of one scheduler run.
+
+    The first sync to ask for a game loads it; syncs asking for the same
+    game meanwhile wait for that load instead of making their own request.
+    A loaded game is dropped once every tracked player in it has used it,
+    and at most max_size games are kept, least recently used going first,
+    so a long run does not hold its whole history in memory.
+    """
+
+    def __init__(self, tracked=None, max_size=None):
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+        self._tracked = set(tracked) if tracked is not None else None
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._games)
+
+    def _uses(self, game):
+        """Return how many tracked players' syncs can ask for a game."""
+        if self._tracked is None:
+            return math.inf
+        players = {p.get('playerId') for team in game.get('teams', []) for p in team.get('players', [])}
+        return max(1, len(self._tracked & players))
+
+    def get(self, game_id, load):
+        """Return the game for game_id, calling load() only while it is not cached."""
+        with self._lock:
+            entry = self._games.get(game_id)
+            owner = entry is None
+            if owner:
+                # [future, remaining uses once loaded]
+                entry = self._games[game_id] = [Future(), math.inf]
+                self.misses += 1
+                while self._max_size and len(self._games) > self._max_size:
+                    self._games.popitem(last=False)
+            else:
+                self._games.move_to_end(game_id)
+                self.hits += 1
+        future = entry[0]
+        if owner:
+            try:
+                game = load()
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                entry[1] = self._uses(game)
+                future.set_result(game)
+        game = future.result()
+        with self._lock:
+            entry[1] -= 1
+            if entry[1] <= 0 and self._games.get(game_id) is entry:
+                del self._games[game_id]
+        return game
+
+
+def load_accounts(path):
+    """Read tracked accounts from a JSON file.
+
+    The file holds a list of {"playerId": ..., "ncfa": ...} objects.
+
+    Returns:
+        list: the accounts, de-duplicated by playerId
+
+    Raises:
+        ValueError: if the file is not in that format
+    """
+    accounts = load_json(path)
+    if not isinstance(accounts, list):
+        raise ValueError("accounts file must contain a list")
+    unique = {}
+    for account in accounts:
+        if not isinstance(account, dict) or not account.get('playerId') or not account.get('ncfa'):
+            raise ValueError("every account needs a playerId and an ncfa")
+        if not valid_player_id(account['playerId']):
+            raise ValueError(f"invalid playerId {account['playerId']!r}")
+        unique[account['playerId']] = account
+    return list(unique.values())
+
+
+def prioritise(db, accounts):
+    """Order accounts by how many new games they are expected to have.
+
+    Never-synced accounts come first. The rest are ranked by hours since
+    their last sync times their recent games per hour, with a floor of
+    SCHEDULER_IDLE_GAMES_PER_HOUR so idle accounts still age into the queue.
+
+    Returns:
+        list: (account, expected seconds or None) tuples, most overdue first
+    """
+    floor = float(geodash.app.config['SCHEDULER_IDLE_GAMES_PER_HOUR'])
+    cur = db.execute(
+        """SELECT player_id, games_per_hour, last_duration,
+                  (julianday('now') - julianday(last_synced_at)) * 24 AS hours_stale
+           FROM sync_accounts
+           WHERE player_id IN (SELECT value FROM json_each(?))""",
+        (json_dumps([a['playerId'] for a in accounts]).decode(),)
+    )
+    history = {row['player_id']: row for row in cur.fetchall()}
+
+    def backlog(account):
+        row = history.get(account['playerId'])
+        if row is None:
+            return math.inf
+        return row['hours_stale'] * max(row['games_per_hour'], floor)
+
+    ranked = sorted(accounts, key=backlog, reverse=True)
+    return [
+        (account, history[account['playerId']]['last_duration']
+         if account['playerId'] in history else None)
+        for account in ranked
+    ]
+
+
+def estimate_seconds(durations, workers):
+    """Estimate a run's wall time from the accounts' last sync durations.
+
+    Accounts without history are assumed to take as long as the slowest
+    known one. Returns None when no account has history.
+    """
+    known = [d for d in durations if d is not None]
+    if not known:
+        return None
+    filled = [d if d is not None else max(known) for d in durations]
+    return round(max(max(filled), sum(filled) / workers), 1)
+
+
+def run_schedule(accounts, workers=None, deadline=None, listener=None):
+    """Sync accounts concurrently, most overdue first.
+
+    Args:
+        accounts: list of {"playerId": ..., "ncfa": ...}
+        workers: concurrent syncs (default SCHEDULER_WORKERS)
+        deadline: seconds after which no further account is started
+        listener: called as listener(player_id, event, data) for sync events
+
+    Returns:
+        dict: per-account outcomes plus run timing and game cache counts
+    """
+    app = geodash.app
+    workers = max(1, int(workers or app.config['SCHEDULER_WORKERS']))
+    with app.app_context():
+        queue = prioritise(get_db(readonly=True), accounts)
+
+    cache = GameCache(tracked={a['playerId'] for a in accounts},
+                      max_size=int(app.config['SCHEDULER_GAME_CACHE_SIZE']))
+    started = time.monotonic()
+
+    def sync_one(account):
+        player_id = account['playerId']
+        if deadline is not None and time.monotonic() - started >= deadline:
+            return {"player_id": player_id, "status": "deferred"}
+        account_started = time.monotonic()
+        relay = (lambda event, data: listener(player_id, event, data)) if listener else None
+        with app.app_context():
+            job, ran = jobs.run_sync_now(player_id, account['ncfa'], relay, game_cache=cache)
+        outcome = {
+            "player_id": player_id,
+            "status": job['status'] if ran else 'busy',
+            "job_id": job['id'],
+            "elapsed_seconds": round(time.monotonic() - account_started, 3),
+        }
+        outcome.update(job.get('result', {}) if ran else {})
+        outcome.pop('success', None)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='geodash-schedule') as pool:
+        # Workers take accounts in submission order, so priority is kept
+        outcomes = list(pool.map(sync_one, [account for account, _ in queue]))
+
+    return {
+        "accounts": outcomes,
+        "workers": workers,
+        "estimated_seconds": estimate_seconds([d for _, d in queue], workers),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "games_fetched": cache.misses,
+        "games_shared": cache.hits,
+    }
@@ -0,0 +1,126 @@
+"""Game store access for GeoGuessr Dashboard.
+
+Each tracked player's games live in their own directory under
+PLAYER_DATA_DIR, so reading or rewriting one player's store never touches
+another's.
+"""
+import os
+import re
+import geodash
+from geoguessr.utils import load_data as load_json
+
+STORE_FILENAMES = {'duels': 'games.json', 'team_duels': 'team_games.json'}
+
+# GeoGuessr IDs are hex strings; anything else must never reach a path
+_PLAYER_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def valid_player_id(player_id):
+    """Return True if player_id is safe to use as a store directory name."""
+    return bool(player_id) and bool(_PLAYER_ID_RE.match(player_id))
+
+
+def player_dir(player_id):
+    """Return the store directory for a player.
+
+    Raises:
+        ValueError: if player_id is not a valid player ID
+    """
+    if not valid_player_id(player_id):
+        raise ValueError(f"Invalid player ID: {player_id!r}")
+    return geodash.app.config['PLAYER_DATA_DIR'] / player_id
+
+
+def games_path(game_type, player_id):
+    """Return a player's game store path for a game type."""
+    return player_dir(player_id) / STORE_FILENAMES.get(game_type, STORE_FILENAMES['duels'])
+
+
+def tracked_players():
+    """Return the IDs of players with a game store, sorted."""
+    try:
+        names = os.listdir(geodash.app.config['PLAYER_DATA_DIR'])
+    except OSError:
+        return []
+    return sorted(name for name in names if valid_player_id(name))
+
+
+def load_games(player_id, game_type, mode='all', teammate=''):
+    """Load a player's games of one type, filtered by mode and teammate.
+
+    Returns None if the player's game store has not been written yet.
+    """
+    if player_id is None:
+        return None
+    try:
+        games = load_json(games_path(game_type, player_id))
+    except Exception:
+        return None
+
+    if mode == 'competitive':
+        games = [g for g in games if g.get('isCompetitive', False)]
+    elif mode == 'casual':
+        games = [g for g in games if not g.get('isCompetitive', False)]
+
+    if teammate and game_type == 'team_duels':
+        games = [g for g in games if teammate in g.get('playerStats', {}).keys()]
+
+    return games
+
+
+def collect_rounds(games, game_type, country_code=None):
+    """Flatten games into one record per round, optionally for one country.
+
+    For team duels the round record is the guess of the best-scoring
+    teammate. Each record has distance, score, guessLat/guessLng,
+    actualLat/actualLng, time, country and enemyScore.
+    """
+    rounds_data = []
+
+    for game in games:
+        # Build a lookup for round stats (enemy scores)
+        round_stats_lookup = {}
+        for rs in game.get('roundStats', []):
+            rn = rs.get('roundNumber')
+            if game_type == 'team_duels':
+                round_stats_lookup[rn] = rs.get('enemyBestScore', 0)
+            else:
+                round_stats_lookup[rn] = rs.get('enemyScore', 0)
+
+        if game_type == 'team_duels':
+            # For team duels, find the best score per round across players
+            best_scores_per_round = {}
+            for player_stats in game.get('playerStats', {}).values():
+                for round_data in player_stats.get('rounds', []):
+                    rn = round_data.get('roundNumber')
+                    score = round_data.get('score', 0)
+                    if rn not in best_scores_per_round or score > best_scores_per_round[rn]['score']:
+                        best_scores_per_round[rn] = _round_record(
+                            round_data, round_stats_lookup.get(rn, 0))
+            candidates = best_scores_per_round.values()
+        else:
+            candidates = [
+                _round_record(round_data, round_stats_lookup.get(round_data.get('roundNumber'), 0))
+                for round_data in game.get('playerStats', {}).get('rounds', [])
+            ]
+
+        for rd in candidates:
+            if country_code is None or rd['country'] == country_code:
+                rounds_data.append(rd)
+
+    return rounds_data
+
+
+def _round_record(round_data, enemy_score):
+    """Build a flat round record from a stored player round."""
+    return {
+        'distance': round_data.get('distance', 0),
+        'score': round_data.get('score', 0),
+        'guessLat': round_data.get('lat'),
+        'guessLng': round_data.get('lng'),
+        'actualLat': round_data.get('actualLat'),
+        'actualLng': round_data.get('actualLng'),
+        'time': round_data.get('time'),
+        'country': (round_data.get('country') or '').lower(),
+        'enemyScore': enemy_score
+    }
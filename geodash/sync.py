@@ -0,0 +1,654 @@
+"""Sync pipeline: fetch new games and rebuild the stored statistics."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import geodash
+from geodash.cache import bump_generation
+from geodash.model import get_db
+from geodash.rounds import (
+    add_to_rollups, delete_games, insert_round_rows, new_round_rows, rebuild_rollups
+)
+from geodash.store import games_path
+from geoguessr import fetch_games
+from geoguessr.fetch_games import (
+    fetch_filtered_tokens, fetch_duels, fetch_game, fetch_team_duels,
+    AuthenticationError, InvalidPlayerIdError
+)
+from geoguessr.metrics import Histogram
+from geoguessr.process_stats import process_duels, process_games
+from geoguessr.ratelimit import RateLimiter
+from geoguessr.utils import json_dumps, save_json, load_data as load_json
+from geoguessr.validate import GameValidator
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+# Serialises read-modify-write of the game store between concurrent syncs
+_store_lock = threading.Lock()
+
+STATS_COMPUTE_SECONDS = Histogram(
+    'geodash_stats_compute_seconds', "process_games/process_duels time per variation.",
+    ['filter_type'])
+STATS_DB_WRITE_SECONDS = Histogram(
+    'geodash_stats_db_write_seconds', "Time writing one stats snapshot.", ['filter_type'])
+
+
+def run_sync(player_id, ncfa, emit, game_cache=None):
+    """Fetch new games for a player and recompute all stat variations.
+
+    Progress is reported as emit(event_type, data) with "phase" and
+    "progress" events. Every request draws on the process-wide GeoGuessr
+    budget; syncs sharing a game_cache fetch each game at most once. Must
+    run inside an app context.
+
+    Returns:
+        dict: the summary sent as the "complete" event
+    """
+    # Create authenticated session
+    session = fetch_games.new_session(ncfa)
+
+    started = time.monotonic()
+    wait = _api_limiter().wait
+    fetch = _game_fetcher(game_cache)
+    db = get_db()
+    new_team = []
+    changed = False
+    replaced = {'duels': [], 'team_duels': []}
+    results = {
+        "duels": {"new": 0, "total": 0, "quarantined": 0},
+        "team_duels": {"new": 0, "total": 0, "quarantined": 0}
+    }
+
+    # --- Phase 1: Fetch Duel Tokens ---
+    emit("phase", {"phase": 1, "name": "Fetching Duel tokens", "status": "in_progress"})
+
+    duels_game_ids = fetch_filtered_tokens(session, game_type="duels", mode_filter="all", wait=wait)
+    emit("phase", {
+        "phase": 1,
+        "name": "Fetching Duel tokens",
+        "status": "complete",
+        "count": len(duels_game_ids)
+    })
+
+    # --- Phase 2: Fetch Duel Games ---
+    if duels_game_ids:
+        cur = db.execute(
+            "SELECT game_id FROM fetched_games WHERE player_id = ? AND game_type = ?",
+            (player_id, 'duels')
+        )
+        existing_ids = {row['game_id'] for row in cur.fetchall()}
+        new_duels_ids = {
+            gid: mode for gid, mode in duels_game_ids.items()
+            if gid not in existing_ids
+        }
+
+        total_new = len(new_duels_ids)
+        emit("phase", {
+            "phase": 2,
+            "name": "Fetching Duel games",
+            "status": "in_progress",
+            "total": total_new,
+            "current": 0
+        })
+
+        new_duels = []
+        validator = GameValidator('duels', existing_ids)
+        if new_duels_ids:
+            new_duels = fetch_duels(session, new_duels_ids, player_id,
+                                    progress=coalesced_progress(emit, 2), fetch=fetch,
+                                    validator=validator)
+            results["duels"]["new"] = len(new_duels)
+
+        total, written, replaced['duels'] = _upsert_games('duels', player_id, new_duels)
+        results["duels"]["total"] = total
+        changed = changed or written
+        _quarantine(db, player_id, 'duels', validator.rejected)
+        _mark_fetched(db, player_id, 'duels', new_duels_ids)
+        results["duels"]["quarantined"] = len(validator.rejected)
+
+    emit("phase", {
+        "phase": 2,
+        "name": "Fetching Duel games",
+        "status": "complete",
+        "new": results["duels"]["new"],
+        "total": results["duels"]["total"]
+    })
+
+    # --- Phase 3: Fetch Team Duel Tokens ---
+    emit("phase", {"phase": 3, "name": "Fetching Team Duel tokens", "status": "in_progress"})
+
+    team_game_ids = fetch_filtered_tokens(session, game_type="team", mode_filter="all", wait=wait)
+    emit("phase", {
+        "phase": 3,
+        "name": "Fetching Team Duel tokens",
+        "status": "complete",
+        "count": len(team_game_ids)
+    })
+
+    # --- Phase 4: Fetch Team Duel Games ---
+    if team_game_ids:
+        cur = db.execute(
+            "SELECT game_id FROM fetched_games WHERE player_id = ? AND game_type = ?",
+            (player_id, 'team_duels')
+        )
+        existing_ids = {row['game_id'] for row in cur.fetchall()}
+        new_team_ids = {
+            gid: mode for gid, mode in team_game_ids.items()
+            if gid not in existing_ids
+        }
+
+        total_new = len(new_team_ids)
+        emit("phase", {
+            "phase": 4,
+            "name": "Fetching Team Duel games",
+            "status": "in_progress",
+            "total": total_new,
+            "current": 0
+        })
+
+        validator = GameValidator('team_duels', existing_ids)
+        if new_team_ids:
+            new_team = fetch_team_duels(session, new_team_ids, player_id,
+                                        progress=coalesced_progress(emit, 4), fetch=fetch,
+                                        validator=validator)
+            results["team_duels"]["new"] = len(new_team)
+
+        total, written, replaced['team_duels'] = _upsert_games('team_duels', player_id, new_team)
+        results["team_duels"]["total"] = total
+        changed = changed or written
+        _quarantine(db, player_id, 'team_duels', validator.rejected)
+        _mark_fetched(db, player_id, 'team_duels', new_team_ids)
+        results["team_duels"]["quarantined"] = len(validator.rejected)
+
+    emit("phase", {
+        "phase": 4,
+        "name": "Fetching Team Duel games",
+        "status": "complete",
+        "new": results["team_duels"]["new"],
+        "total": results["team_duels"]["total"]
+    })
+
+    # --- Phase 5: Fetch usernames ---
+    emit("phase", {"phase": 5, "name": "Fetching player usernames", "status": "in_progress"})
+    try:
+        player_ids = set()
+        for game in new_team:
+            player_ids.update(game.get('playerStats', {}).keys())
+        resolved = resolve_usernames(session, player_ids)
+    except Exception:
+        geodash.app.logger.exception("Error fetching usernames")
+        resolved = 0
+
+    emit("phase", {"phase": 5, "name": "Fetching player usernames", "status": "complete",
+                   "count": resolved})
+
+    # --- Phase 6: Compute statistics ---
+    # Skipped when no game store changed and the current snapshots exist
+    emit("phase", {"phase": 6, "name": "Computing statistics", "status": "in_progress"})
+    recompute = changed or not _has_snapshots(db, player_id)
+    if recompute:
+        compute_and_store_all_variations(player_id, replaced)
+    emit("phase", {"phase": 6, "name": "Computing statistics", "status": "complete",
+                   "skipped": not recompute})
+
+    _record_sync(db, player_id, results["duels"]["new"] + results["team_duels"]["new"],
+                 time.monotonic() - started)
+
+    return {
+        "success": True,
+        "duels_fetched": results["duels"]["new"],
+        "duels_total": results["duels"]["total"],
+        "duels_quarantined": results["duels"]["quarantined"],
+        "team_duels_fetched": results["team_duels"]["new"],
+        "team_duels_total": results["team_duels"]["total"],
+        "team_duels_quarantined": results["team_duels"]["quarantined"]
+    }
+
+
+def coalesced_progress(emit, phase):
+    """Return a fetch progress callback that emits at most a few events/s.
+
+    Events are spaced at least SYNC_PROGRESS_INTERVAL seconds apart, except
+    the final one, and carry throughput (games/s) and an ETA in seconds.
+    """
+    interval = float(geodash.app.config['SYNC_PROGRESS_INTERVAL'])
+    started = time.monotonic()
+    last_sent = started
+
+    def progress(done, total):
+        nonlocal last_sent
+        now = time.monotonic()
+        if done < total and now - last_sent < interval:
+            return
+        last_sent = now
+        elapsed = now - started
+        rate = done / elapsed if elapsed > 0 else 0
+        emit("progress", {
+            "phase": phase,
+            "current": done,
+            "total": total,
+            "rate": round(rate, 2),
+            "eta": round((total - done) / rate, 1) if rate else None
+        })
+
+    return progress
+
+
+def sync_error(exc):
+    """Return the user-facing "error" event payload for a failed sync."""
+    if isinstance(exc, InvalidPlayerIdError):
+        return {
+            "error": "This player ID doesn't match your account. Check that you copied it correctly.",
+            "field": "playerId"
+        }
+    if isinstance(exc, AuthenticationError):
+        error_msg = str(exc)
+        # Provide user-friendly messages based on the error
+        if "401" in error_msg or "403" in error_msg or "Invalid _ncfa" in error_msg:
+            return {
+                "error": "Invalid or expired NCFA token. Try copying a fresh token from your browser.",
+                "field": "ncfa"
+            }
+        return {
+            "error": "Authentication failed. Please check your credentials and try again.",
+            "field": "ncfa"
+        }
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return {
+            "error": "Connection to the GeoGuessr API failed. Please check your internet connection and try again."
+        }
+    if isinstance(exc, requests.exceptions.Timeout):
+        return {
+            "error": "Request timed out. The GeoGuessr API may be slow. Please try again."
+        }
+    return {
+        "error": ("Something went wrong while fetching your games. Please try again. "
+                  "If this keeps happening, the GeoGuessr API may be temporarily unavailable.")
+    }
+
+
+def _api_limiter():
+    """Return the process-wide GeoGuessr request limiter."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(float(geodash.app.config['GEOGUESSR_REQUESTS_PER_SECOND']))
+    return _limiter
+
+
+def _game_fetcher(game_cache=None):
+    """Return fetch(session, game_id) for the game fetchers.
+
+    Requests draw on the shared limiter; with a game_cache, a game already
+    fetched (or being fetched) by another sync is reused instead.
+    """
+    limiter = _api_limiter()
+
+    def fetch(session, game_id):
+        limiter.wait()
+        return fetch_game(session, game_id)
+
+    if game_cache is None:
+        return fetch
+    return lambda session, game_id: game_cache.get(game_id, lambda: fetch(session, game_id))
+
+
+def _record_sync(db, player_id, new_games, duration):
+    """Update a player's sync history, used to schedule multi-account syncs.
+
+    games_per_hour is the rate of new games since the previous sync.
+    """
+    with db:
+        db.execute(
+            """INSERT INTO sync_accounts (player_id, last_synced_at, games_per_hour, last_duration)
+               VALUES (?, CURRENT_TIMESTAMP, 0, ?)
+               ON CONFLICT (player_id) DO UPDATE SET
+                   games_per_hour = ? / MAX((julianday('now') - julianday(last_synced_at)) * 24,
+                                            1.0 / 60),
+                   last_synced_at = CURRENT_TIMESTAMP,
+                   last_duration = excluded.last_duration""",
+            (player_id, duration, new_games)
+        )
+
+
+def _lookup_username(session, player_id):
+    """Fetch a player's username from the GeoGuessr API, or None on failure."""
+    _api_limiter().wait()
+    try:
+        resp = session.get(fetch_games.BASE_USER_URL + player_id, timeout=30)
+        if resp.status_code == 200:
+            data = resp.json()
+            return data.get('nick') or data.get('name') or None
+    except Exception:
+        pass
+    return None
+
+
+def resolve_usernames(session, player_ids):
+    """Look up usernames for new player IDs and refresh stale cached ones.
+
+    IDs already cached within USERNAME_TTL_DAYS are skipped with one bulk
+    query; the rest (plus up to USERNAME_REFRESH_BATCH stale names) are
+    fetched concurrently under the shared request limiter. A failed lookup
+    keeps any existing name and otherwise falls back to the ID.
+
+    Returns:
+        int: number of IDs looked up
+    """
+    config = geodash.app.config
+    db = get_db()
+    ttl = f"-{int(config['USERNAME_TTL_DAYS'])} days"
+
+    cur = db.execute(
+        """SELECT player_id FROM player_names
+           WHERE player_id IN (SELECT value FROM json_each(?))
+             AND fetched_at >= datetime('now', ?)""",
+        (json_dumps(sorted(player_ids)).decode(), ttl)
+    )
+    wanted = set(player_ids) - {row['player_id'] for row in cur.fetchall()}
+
+    cur = db.execute(
+        """SELECT player_id FROM player_names
+           WHERE fetched_at < datetime('now', ?)
+           ORDER BY fetched_at LIMIT ?""",
+        (ttl, int(config['USERNAME_REFRESH_BATCH']))
+    )
+    wanted.update(row['player_id'] for row in cur.fetchall())
+    if not wanted:
+        return 0
+
+    wanted = sorted(wanted)
+    with ThreadPoolExecutor(max_workers=int(config['USERNAME_WORKERS'])) as pool:
+        names = list(pool.map(lambda pid: _lookup_username(session, pid), wanted))
+
+    with db:
+        db.executemany(
+            "INSERT OR REPLACE INTO player_names (player_id, username) VALUES (?, ?)",
+            [(pid, name) for pid, name in zip(wanted, names) if name]
+        )
+        db.executemany(
+            "INSERT OR IGNORE INTO player_names (player_id, username) VALUES (?, ?)",
+            [(pid, pid) for pid, name in zip(wanted, names) if not name]
+        )
+    return len(wanted)
+
+
+def _upsert_games(game_type, player_id, games):
+    """Insert or replace games in a player's game store, keyed by gameId.
+
+    The store is indexed by game ID, so each game is one dict lookup;
+    duplicates left by earlier syncs collapse into their first position.
+    The file is written only if it is missing or a game was added, changed
+    or collapsed, so re-ingesting games already stored writes nothing.
+
+    Returns:
+        tuple: (number of games in the store, whether it was rewritten,
+        IDs of stored games that were replaced with a different record)
+    """
+    with _store_lock:
+        try:
+            stored = load_json(games_path(game_type, player_id))
+            missing = False
+        except Exception:
+            stored, missing = [], True
+
+        index = {}
+        for game in stored:
+            index[game['gameId']] = game
+        changed = missing or len(index) != len(stored)
+        replaced = []
+        for game in games:
+            old = index.get(game['gameId'])
+            if old != game:
+                if old is not None:
+                    replaced.append(game['gameId'])
+                index[game['gameId']] = game
+                changed = True
+
+        if changed:
+            _save_games(game_type, player_id, list(index.values()))
+    return len(index), changed, replaced
+
+
+def _has_snapshots(db, player_id):
+    """Return True if the player has current stats snapshots."""
+    cur = db.execute("SELECT 1 FROM latest_stats WHERE player_id = ? LIMIT 1", (player_id,))
+    return cur.fetchone() is not None
+
+
+def _save_games(game_type, player_id, games):
+    """Write a player's game store for one game type, creating their directory."""
+    path = games_path(game_type, player_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_json(path, games)
+
+
+def _quarantine(db, player_id, game_type, rejected):
+    """Record games rejected by a GameValidator, with the rules they broke.
+
+    Rejected games are still marked fetched, so they are not fetched again.
+    """
+    with db:
+        db.executemany(
+            """INSERT OR REPLACE INTO quarantined_games
+               (player_id, game_type, game_id, rule, reasons, game)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [(player_id, game_type, game.get('gameId'), reasons[0][0],
+              json_dumps([message for _, message in reasons]).decode(), json_dumps(game).decode())
+             for game, reasons in rejected]
+        )
+
+
+def validate_store(player_id, game_type):
+    """Validate a player's stored games, quarantining and removing rejects.
+
+    For stores written before games were validated at ingest; the store is
+    rewritten only if a game is rejected.
+
+    Returns:
+        dict: {"games": kept, "quarantined": {rule: count}}
+    """
+    validator = GameValidator(game_type)
+    with _store_lock:
+        try:
+            games = load_json(games_path(game_type, player_id))
+        except Exception:
+            games = []
+        kept = validator.filter(games)
+        if validator.rejected:
+            _save_games(game_type, player_id, kept)
+
+    # Drop rejected games from the round store; a duplicate's ID stays with its kept copy
+    db = get_db()
+    dropped = {game.get('gameId') for game, _ in validator.rejected} - validator.seen - {None}
+    with db:
+        if delete_games(db, player_id, game_type, dropped):
+            rebuild_rollups(db, player_id)
+    _quarantine(db, player_id, game_type, validator.rejected)
+
+    rules = {}
+    for _, reasons in validator.rejected:
+        rules[reasons[0][0]] = rules.get(reasons[0][0], 0) + 1
+    return {"games": len(kept), "quarantined": rules}
+
+
+def _mark_fetched(db, player_id, game_type, game_ids):
+    """Record game IDs as fetched in one batched statement.
+
+    Called after the games are saved to the game store, so a crash in between
+    causes a re-fetch rather than a lost game.
+    """
+    with db:
+        db.executemany(
+            "INSERT OR IGNORE INTO fetched_games (game_id, player_id, game_type) VALUES (?, ?, ?)",
+            [(gid, player_id, game_type) for gid in game_ids]
+        )
+
+
+def compute_and_store_all_variations(player_id, replaced=None):
+    """Compute and store stats for all 6 filter combinations.
+
+    Every variation is computed before the database is touched, then new
+    games are added to the round store and all snapshots are written and
+    made current in a single transaction. replaced maps a game type to IDs
+    of stored games whose records changed; their round store rows are
+    rebuilt along with the trend rollups.
+    """
+    replaced = replaced or {}
+    with _store_lock:
+        try:
+            all_duels = load_json(games_path('duels', player_id))
+        except Exception:
+            all_duels = []
+
+        try:
+            all_team = load_json(games_path('team_duels', player_id))
+        except Exception:
+            all_team = []
+
+    variations = []
+
+    def compute(game_type, filter_type, process, games):
+        with STATS_COMPUTE_SECONDS.time(filter_type=filter_type):
+            variations.append((game_type, filter_type, process(games)))
+
+    # Duels variations
+    if all_duels:
+        compute('duels', 'duels_all', process_duels, all_duels)
+
+        competitive = [g for g in all_duels if g.get('isCompetitive', False)]
+        if competitive:
+            compute('duels', 'duels_competitive', process_duels, competitive)
+
+        casual = [g for g in all_duels if not g.get('isCompetitive', False)]
+        if casual:
+            compute('duels', 'duels_casual', process_duels, casual)
+
+    # Team duels variations
+    if all_team:
+        compute('team_duels', 'team_duels_all', process_games, all_team)
+
+        competitive = [g for g in all_team if g.get('isCompetitive', False)]
+        if competitive:
+            compute('team_duels', 'team_duels_competitive', process_games, competitive)
+
+        casual = [g for g in all_team if not g.get('isCompetitive', False)]
+        if casual:
+            compute('team_duels', 'team_duels_casual', process_games, casual)
+
+    db = get_db()
+    duel_rows = new_round_rows(db, 'duels', all_duels, player_id,
+                               replace=replaced.get('duels', ()))
+    team_rows = new_round_rows(db, 'team_duels', all_team, player_id,
+                               replace=replaced.get('team_duels', ()))
+
+    with db:
+        stale = sum(delete_games(db, player_id, game_type, game_ids)
+                    for game_type, game_ids in replaced.items())
+        insert_round_rows(db, duel_rows)
+        insert_round_rows(db, team_rows)
+        if stale:
+            rebuild_rollups(db, player_id)
+        else:
+            add_to_rollups(db, player_id, [row[1] for row in duel_rows['games'] + team_rows['games']])
+        pointers = []
+        for game_type, filter_type, stats in variations:
+            with STATS_DB_WRITE_SECONDS.time(filter_type=filter_type):
+                pointers.append((filter_type, _save_stats_to_db(player_id, game_type, filter_type,
+                                                                stats)))
+        db.executemany(
+            """INSERT OR REPLACE INTO latest_stats (player_id, filter_type, overall_stats_id)
+               VALUES (?, ?, ?)""",
+            [(player_id, filter_type, stats_id) for filter_type, stats_id in pointers]
+        )
+        _prune_snapshots(player_id)
+
+    # New snapshots are in place; retire the player's cached results and validators
+    bump_generation(player_id)
+
+
+def _prune_snapshots(player_id):
+    """Delete all but the newest SNAPSHOT_RETENTION snapshots per filter type.
+
+    Contributions and country stats go with their snapshot through
+    ON DELETE CASCADE. Runs inside the caller's transaction.
+    """
+    keep = max(1, int(geodash.app.config['SNAPSHOT_RETENTION']))
+    db = get_db()
+    db.execute(
+        """DELETE FROM overall_stats
+           WHERE player_id = ? AND id NOT IN (
+               SELECT newer.id FROM overall_stats newer
+               WHERE newer.player_id = overall_stats.player_id
+                 AND newer.filter_type = overall_stats.filter_type
+               ORDER BY newer.created_at DESC, newer.id DESC
+               LIMIT ?
+           )""",
+        (player_id, keep)
+    )
+
+
+def _save_stats_to_db(player_id, game_type, filter_type, stats):
+    """Insert one stats snapshot without committing; return its id."""
+    db = get_db()
+
+    overall = stats['overall']
+
+    if game_type == 'duels':
+        cur = db.execute(
+            """INSERT INTO overall_stats
+               (player_id, game_type, filter_type, total_games, win_percentage, avg_rounds_per_game,
+                avg_score, total_5ks, avg_guess_time, multi_merchant, reverse_merchant)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (player_id, game_type, filter_type, overall['total_games'], overall['win_percentage'],
+             overall['avg_rounds_per_game'], overall.get('avg_score'),
+             overall.get('total_5ks'), overall.get('avg_guess_time'),
+             overall['merchant_stats']['multi_merchant'],
+             overall['merchant_stats']['reverse_merchant'])
+        )
+    else:
+        cur = db.execute(
+            """INSERT INTO overall_stats
+               (player_id, game_type, filter_type, total_games, win_percentage, avg_rounds_per_game,
+                multi_merchant, reverse_merchant)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (player_id, game_type, filter_type, overall['total_games'], overall['win_percentage'],
+             overall['avg_rounds_per_game'],
+             overall['merchant_stats']['multi_merchant'],
+             overall['merchant_stats']['reverse_merchant'])
+        )
+
+    overall_id = cur.lastrowid
+
+    # Insert player contributions (for team duels)
+    if game_type == 'team_duels':
+        games_per_player = overall.get('games_per_player', {})
+        db.executemany(
+            """INSERT INTO player_contributions
+               (overall_stats_id, player_id, contribution_percent, avg_individual_score,
+                total_5ks, avg_guess_time, games_played)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [(overall_id, pid, contrib,
+              overall.get('avg_individual_score', {}).get(pid),
+              overall.get('player_total_5ks', {}).get(pid),
+              overall.get('avg_guess_time', {}).get(pid),
+              games_per_player.get(pid, 0))
+             for pid, contrib in overall.get('player_contribution_percent', {}).items()]
+        )
+
+    # Insert country stats
+    db.executemany(
+        """INSERT INTO country_stats
+           (overall_stats_id, country_code, rounds, avg_score, avg_distance_km,
+            five_k_rate, avg_score_diff, hit_rate, win_rate)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [(overall_id, country_code, cstats['rounds'],
+          cstats.get('avg_score') or cstats.get('avg_team_score', 0),
+          cstats.get('avg_distance_km') or cstats.get('avg_team_distance_km', 0),
+          cstats.get('5k_rate') or 0,
+          cstats['avg_score_diff'], cstats['hit_rate'], cstats['win_rate'])
+         for country_code, cstats in stats.get('countries', [])]
+    )
+
+    return overall_id
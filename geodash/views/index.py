@@ -1,6 +1,8 @@
 """Web views for GeoGuessr Dashboard."""
 import flask
 import geodash
+from geodash.api.bundle import build_bundle, bundle_error
+from geodash.api.players import request_player
 
 
 @geodash.app.route('/', methods=['GET'])
@@ -24,10 +26,25 @@ def show_fetch():
 @geodash.app.route('/stats/', methods=['GET'])
 def show_stats():
     """Display stats page."""
-    return flask.render_template('stats.html')
+    bundle = None
+    player_id, error = request_player()
+    if geodash.app.config['EMBED_BUNDLE'] and not error and not bundle_error('stats', flask.request.args):
+        bundle = build_bundle('stats', flask.request.args, player_id)
+    return flask.render_template('stats.html', bundle=bundle)
 
 
 @geodash.app.route('/countries/<country_code>/', methods=['GET'])
 def show_country(country_code):
-    """Display stats for a specific country."""
-    return flask.render_template('country.html', country_code=country_code)
+    """Display stats for a specific country.
+
+    The bundle is only embedded when the country details are already
+    cached; otherwise the page fetches it instead of waiting on geocoding.
+    """
+    bundle = None
+    country_code = country_code.lower()
+    player_id, error = request_player()
+    if (geodash.app.config['EMBED_BUNDLE'] and not error
+            and not bundle_error('country', flask.request.args, country_code)):
+        bundle = build_bundle('country', flask.request.args, player_id, country_code,
+                              cached_details_only=True)
+    return flask.render_template('country.html', country_code=country_code, bundle=bundle)
@@ -0,0 +1,279 @@
+"""Last-N-games and date-range windows over the round store.
+
+A WindowIndex lists a player's matching games in the order they were played
+with cumulative sums of every game-level total.  Games synced before start
+times were recorded come first, in game ID order: last_n treats them as
+the oldest games, and since/until windows leave them out.  Each country and each player in those games gets the
+positions of the games they appear in plus cumulative sums of their round
+metrics, so the totals of any window of consecutive games are two bisects
+and a subtraction per country: stats for "the last 200 competitive duels"
+cost O(countries log games) instead of a pass over the game list.
+
+Indexes are built with one scan of the round store and kept per process
+until the player's dataset changes.
+"""
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+import geodash
+from geodash.cache import dataset_fingerprint
+from geodash.rounds import game_filter
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+GAME_FIELDS = ('won', 'num_rounds', 'multi_merchant', 'reverse_merchant', 'rounds', 'score',
+               'five_ks')
+COUNTRY_FIELDS = ('rounds', 'score', 'distance', 'five_ks', 'score_diff', 'hits', 'guesses',
+                  'wins')
+PLAYER_FIELDS = ('rounds', 'contributed', 'score', 'five_ks', 'time', 'timed')
+
+
+def _bound(value, name, end):
+    """Parse a since/until value as a 'YYYY-MM-DD HH:MM:SS' UTC bound.
+
+    A bare date as an until bound covers the whole day.
+    """
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day) + (timedelta(days=1) if end else timedelta())
+        else:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if moment.tzinfo is not None:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or date and time") from None
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_window(args):
+    """Return (window, error message) for a request's window parameters.
+
+    window is None when the request has no last_n, since or until;
+    otherwise a dict with last_n (int or None), since and until (UTC bounds
+    or None; until is exclusive).
+    """
+    last_n, since, until = args.get('last_n'), args.get('since'), args.get('until')
+    if not (last_n or since or until):
+        return None, None
+    window = {'last_n': None, 'since': None, 'until': None}
+    if last_n:
+        if not last_n.isdigit() or int(last_n) < 1:
+            return None, "last_n must be a positive integer"
+        window['last_n'] = int(last_n)
+    try:
+        if since:
+            window['since'] = _bound(since, 'since', end=False)
+        if until:
+            window['until'] = _bound(until, 'until', end=True)
+    except ValueError as exc:
+        return None, str(exc)
+    return window, None
+
+
+class _Series:
+    """Cumulative sums of one country's or player's metrics, by game position."""
+
+    def __init__(self, fields):
+        self.positions = []
+        self.sums = {field: [0] for field in fields}
+
+    def add(self, position, values):
+        self.positions.append(position)
+        for field, value in values.items():
+            column = self.sums[field]
+            column.append(column[-1] + (value or 0))
+
+    def totals(self, lo, hi):
+        """Return the sums over games in positions [lo, hi), or None if none."""
+        a = bisect.bisect_left(self.positions, lo)
+        b = bisect.bisect_left(self.positions, hi)
+        if a == b:
+            return None
+        totals = {field: column[b] - column[a] for field, column in self.sums.items()}
+        totals['games'] = b - a
+        return totals
+
+
+class WindowIndex:
+    """Time-ordered prefix sums of one player's games of one type and filter."""
+
+    def __init__(self, db, player_id, game_type, mode='all', teammate=''):
+        where, params = game_filter(player_id, game_type, mode, teammate)
+        order = "ORDER BY COALESCE(g.played_at, ''), g.game_id"
+
+        self.game_ids = []
+        self.played_at = []
+        self.sums = {field: [0] for field in GAME_FIELDS}
+        cur = db.execute(
+            f"""SELECT g.game_id, COALESCE(g.played_at, '') AS played_at, g.won, g.num_rounds,
+                       g.multi_merchant, g.reverse_merchant,
+                       COUNT(gr.round_number) AS rounds,
+                       COALESCE(SUM(gr.team_score), 0) AS score,
+                       COALESCE(SUM(gr.five_ks), 0) AS five_ks
+                FROM games g
+                LEFT JOIN game_rounds gr ON gr.owner_id = g.owner_id AND gr.game_id = g.game_id
+                WHERE {where}
+                GROUP BY g.game_id
+                {order}""",
+            params
+        )
+        for row in cur.fetchall():
+            self.game_ids.append(row['game_id'])
+            self.played_at.append(row['played_at'])
+            for field in GAME_FIELDS:
+                self.sums[field].append(self.sums[field][-1] + row[field])
+        # Games without a start time sort first, as ''
+        self.untimed = bisect.bisect_right(self.played_at, '')
+        position = {game_id: i for i, game_id in enumerate(self.game_ids)}
+
+        self.countries = {}
+        cur = db.execute(
+            f"""SELECT g.game_id, gr.country_code,
+                       COUNT(*) AS rounds,
+                       SUM(gr.team_score) AS score,
+                       SUM(gr.team_distance) AS distance,
+                       SUM(gr.five_ks) AS five_ks,
+                       SUM(gr.team_score - gr.enemy_score) AS score_diff,
+                       SUM(gr.guess_country = gr.country_code) AS hits,
+                       COUNT(gr.guess_country) AS guesses,
+                       SUM(gr.team_score > gr.enemy_score) AS wins
+                FROM games g
+                JOIN game_rounds gr ON gr.owner_id = g.owner_id AND gr.game_id = g.game_id
+                WHERE {where} AND gr.country_code IS NOT NULL
+                GROUP BY g.game_id, gr.country_code
+                {order}""",
+            params
+        )
+        for row in cur.fetchall():
+            series = self.countries.setdefault(row['country_code'], _Series(COUNTRY_FIELDS))
+            series.add(position[row['game_id']], {field: row[field] for field in COUNTRY_FIELDS})
+
+        self.players = {}
+        cur = db.execute(
+            f"""SELECT g.game_id, pr.player_id,
+                       COUNT(*) AS rounds,
+                       SUM(pr.contributed) AS contributed,
+                       SUM(pr.score) AS score,
+                       SUM(pr.score = 5000 AND gr.country_code IS NOT NULL) AS five_ks,
+                       SUM(pr.time) AS time,
+                       COUNT(pr.time) AS timed
+                FROM games g
+                JOIN player_rounds pr ON pr.owner_id = g.owner_id AND pr.game_id = g.game_id
+                JOIN game_rounds gr ON gr.owner_id = pr.owner_id AND gr.game_id = pr.game_id
+                                    AND gr.round_number = pr.round_number
+                WHERE {where}
+                GROUP BY g.game_id, pr.player_id
+                {order}""",
+            params
+        )
+        for row in cur.fetchall():
+            series = self.players.setdefault(row['player_id'], _Series(PLAYER_FIELDS))
+            series.add(position[row['game_id']], {field: row[field] for field in PLAYER_FIELDS})
+
+    def bounds(self, window):
+        """Return the [lo, hi) game positions a window covers.
+
+        Untimed games are only in windows without since or until.
+        """
+        lo, hi = 0, len(self.game_ids)
+        if window.get('since') or window.get('until'):
+            lo = self.untimed
+        if window.get('since'):
+            lo = max(lo, bisect.bisect_left(self.played_at, window['since']))
+        if window.get('until'):
+            hi = bisect.bisect_left(self.played_at, window['until'])
+        if window.get('last_n'):
+            lo = max(lo, hi - window['last_n'])
+        return lo, max(lo, hi)
+
+    def game_ids_in(self, window):
+        """Return the IDs of the games in a window."""
+        lo, hi = self.bounds(window)
+        return self.game_ids[lo:hi]
+
+    def overall(self, window):
+        """Return aggregate_overall-style totals for a window, plus round averages."""
+        lo, hi = self.bounds(window)
+        totals = {field: column[hi] - column[lo] for field, column in self.sums.items()}
+        games = hi - lo
+        timed = [s.totals(lo, hi) for s in self.players.values()]
+        time = sum(t['time'] for t in timed if t)
+        time_rounds = sum(t['timed'] for t in timed if t)
+        return {
+            "total_games": games,
+            "win_percentage": totals['won'] / games if games else 0,
+            "avg_rounds_per_game": totals['num_rounds'] / games if games else 0,
+            "multi_merchant": totals['multi_merchant'],
+            "reverse_merchant": totals['reverse_merchant'],
+            "avg_score": totals['score'] / totals['rounds'] if totals['rounds'] else 0,
+            "total_5ks": totals['five_ks'],
+            "avg_guess_time": time / time_rounds if time_rounds else 0,
+            "first_played_at": self.played_at[lo] or None if games else None,
+            "last_played_at": self.played_at[hi - 1] or None if games else None,
+        }
+
+    def countries_in(self, window):
+        """Return aggregate_countries-style rows for a window, best score diff first."""
+        lo, hi = self.bounds(window)
+        rows = []
+        for country_code, series in self.countries.items():
+            t = series.totals(lo, hi)
+            if t is None:
+                continue
+            rows.append({
+                "country_code": country_code,
+                "rounds": t['rounds'],
+                "avg_score": t['score'] / t['rounds'],
+                "avg_distance_km": t['distance'] / t['rounds'] / 1000,
+                "five_k_rate": t['five_ks'] / t['rounds'],
+                "avg_score_diff": t['score_diff'] / t['rounds'],
+                "hit_rate": t['hits'] / t['guesses'] if t['guesses'] else 0,
+                "win_rate": t['wins'] / t['rounds'],
+            })
+        rows.sort(key=lambda row: row['avg_score_diff'], reverse=True)
+        return rows
+
+    def players_in(self, window):
+        """Return aggregate_players-style rows (without usernames) for a window."""
+        lo, hi = self.bounds(window)
+        rows = []
+        for player_id, series in self.players.items():
+            t = series.totals(lo, hi)
+            if t is None:
+                continue
+            rows.append({
+                "player_id": player_id,
+                "contribution_percent": t['contributed'] / t['rounds'],
+                "avg_individual_score": t['score'] / t['rounds'],
+                "total_5ks": t['five_ks'],
+                "avg_guess_time": t['time'] / t['timed'] if t['timed'] else 0,
+                "games_played": t['games'],
+            })
+        rows.sort(key=lambda row: (-row['games_played'], row['player_id']))
+        return rows
+
+
+def window_index(db, player_id, game_type, mode='all', teammate=''):
+    """Return the WindowIndex for a player's games, building it if needed.
+
+    Indexes are reused until the player's dataset fingerprint changes; at
+    most WINDOW_INDEX_CACHE_SIZE are kept per process.
+    """
+    key = (str(geodash.app.config['DATABASE_FILENAME']), player_id, game_type, mode, teammate)
+    fingerprint = dataset_fingerprint(player_id)
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            _indexes.move_to_end(key)
+            return entry[1]
+
+    index = WindowIndex(db, player_id, game_type, mode, teammate)
+    with _indexes_lock:
+        _indexes[key] = (fingerprint, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > max(1, int(geodash.app.config['WINDOW_INDEX_CACHE_SIZE'])):
+            _indexes.popitem(last=False)
+    return index
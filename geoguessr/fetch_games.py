@@ -1,8 +1,11 @@
+import os
 import time
 import json
+from urllib.parse import urlsplit
 import requests
 import reverse_geocoder as rg
-from .utils import calculate_score, parse_time, save_json
+from .metrics import Counter, Histogram
+from .utils import calculate_score, geocoding, parse_time, save_json
 
 
 class AuthenticationError(Exception):
@@ -24,17 +27,73 @@ def get_country_from_coords(lat, lng):
     if lat is None or lng is None:
         return None
     try:
-        result = rg.search((lat, lng))[0]
+        with geocoding(1):
+            result = rg.search((lat, lng))[0]
         return result['cc']
     except Exception:
         return None
 
-BASE_FEED_URL = "https://www.geoguessr.com/api/v4/feed/private"
-BASE_DUEL_URL = "https://game-server.geoguessr.com/api/duels/"
+def played_at(game):
+    """Return when a raw game started (its first round's startTime), or None."""
+    rounds = game.get("rounds") or []
+    return rounds[0].get("startTime") if rounds else None
 
-def fetch_filtered_tokens(session, game_type="team", mode_filter="all", max_pages=100):
+
+def print_progress(done, total):
+    """Default fetch progress callback: one line per game on stdout."""
+    print(f"Processed game {done}/{total}")
+
+
+# API hosts, overridable to run the fetchers against a local stand-in server
+# (see tests/mock_geoguessr.py)
+API_URL = os.environ.get("GEOGUESSR_API_URL", "https://www.geoguessr.com")
+GAME_SERVER_URL = os.environ.get("GEOGUESSR_GAME_SERVER_URL", "https://game-server.geoguessr.com")
+
+BASE_FEED_URL = API_URL + "/api/v4/feed/private"
+BASE_DUEL_URL = GAME_SERVER_URL + "/api/duels/"
+BASE_USER_URL = API_URL + "/api/v3/users/"
+
+# Seconds to wait after a feed 429 that has no Retry-After header, and
+# attempts per request before 5xx responses (and, for games, 429s) give up
+RATE_LIMIT_WAIT = 30
+MAX_ATTEMPTS = 3
+
+FEED_PAGES = Counter(
+    'geoguessr_feed_pages_total', "Feed page responses by HTTP status.", ['status'])
+GAME_FETCHES = Counter(
+    'geoguessr_game_fetches_total', "Game detail responses by HTTP status.", ['status'])
+GAME_FETCH_SECONDS = Histogram(
+    'geoguessr_game_fetch_seconds', "Game detail request latency.")
+RATE_LIMITED = Counter(
+    'geoguessr_rate_limited_total', "429 responses from the GeoGuessr API.", ['api'])
+RETRY_WAIT_SECONDS = Histogram(
+    'geoguessr_retry_wait_seconds', "Waits before retrying a GeoGuessr request.", ['api'],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60))
+
+
+def new_session(ncfa):
+    """Return a requests session sending the _ncfa cookie to both API hosts."""
+    session = requests.Session()
+    for url in (BASE_FEED_URL, BASE_DUEL_URL):
+        session.cookies.set("_ncfa", ncfa, domain=urlsplit(url).hostname)
+    return session
+
+
+def retry_after(resp, default):
+    """Return the seconds a 429/503 response asks us to wait."""
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def fetch_filtered_tokens(session, game_type="team", mode_filter="all", max_pages=100, wait=None):
     """Fetch game IDs from feed.
 
+    Args:
+        wait: called before each page request to pace requests; defaults to
+            a fixed delay between pages
+
     Returns:
         dict: {game_id: is_competitive} mapping
     """
@@ -42,6 +101,7 @@ def fetch_filtered_tokens(session, game_type="team", mode_filter="all", max_page
     token = None
     page = 1
     empty_pages = 0  # Track consecutive pages with no matching games
+    server_errors = 0  # Consecutive 5xx responses for the current page
     max_empty_pages = 10  # Stop after this many pages with no new games
 
     while page <= max_pages:
@@ -50,6 +110,8 @@ def fetch_filtered_tokens(session, game_type="team", mode_filter="all", max_page
         if token:
             url += f"?paginationToken={token}"
 
+        if wait:
+            wait()
         try:
             resp = session.get(url, timeout=30)
         except requests.exceptions.RequestException as e:
@@ -63,12 +125,25 @@ def fetch_filtered_tokens(session, game_type="team", mode_filter="all", max_page
                 print(f"Returning {len(results)} games fetched so far.")
                 break
 
+        FEED_PAGES.inc(status=resp.status_code)
         if resp.status_code == 401 or resp.status_code == 403:
             raise AuthenticationError("Invalid _ncfa token. Please check your cookie and try again.")
         if resp.status_code == 429:
-            print("Rate limited. Waiting 30 seconds...")
-            time.sleep(30)
+            delay = retry_after(resp, RATE_LIMIT_WAIT)
+            print(f"Rate limited. Waiting {delay:g} seconds...")
+            RATE_LIMITED.inc(api='feed')
+            RETRY_WAIT_SECONDS.observe(delay, api='feed')
+            time.sleep(delay)
+            continue
+        if resp.status_code >= 500:
+            server_errors += 1
+            if server_errors >= MAX_ATTEMPTS:
+                resp.raise_for_status()
+            delay = retry_after(resp, 2 ** server_errors)
+            RETRY_WAIT_SECONDS.observe(delay, api='feed')
+            time.sleep(delay)
             continue
+        server_errors = 0
         if resp.status_code != 200:
             raise AuthenticationError(f"API request failed with status {resp.status_code}")
 
@@ -122,25 +197,51 @@ def fetch_filtered_tokens(session, game_type="team", mode_filter="all", max_page
         if not token:
             break
         page += 1
-        time.sleep(0.075)
+        if not wait:
+            time.sleep(0.075)
 
     print(f"Finished fetching. Found {len(results)} total games.")
     return results
 
-def fetch_single_team_duel(session, game_id, my_id, is_competitive=False, teammate_id=None):
+def fetch_game(session, game_id):
+    """Fetch the raw JSON of a duel or team duel game.
+
+    429 and 5xx responses are retried up to MAX_ATTEMPTS times, waiting
+    for Retry-After or an exponential backoff in between.
+
+    Returns:
+        dict: Game data from the game server, or None if the request failed
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        with GAME_FETCH_SECONDS.time():
+            resp = session.get(BASE_DUEL_URL + game_id, timeout=30)
+        GAME_FETCHES.inc(status=resp.status_code)
+        if resp.status_code == 200:
+            return resp.json()
+        if resp.status_code == 429:
+            RATE_LIMITED.inc(api='game')
+        elif resp.status_code < 500:
+            break
+        if attempt + 1 < MAX_ATTEMPTS:
+            delay = retry_after(resp, 2 ** attempt)
+            RETRY_WAIT_SECONDS.observe(delay, api='game')
+            time.sleep(delay)
+    print(f"Failed to fetch game {game_id}: {resp.status_code}")
+    return None
+
+
+def fetch_single_team_duel(session, game_id, my_id, is_competitive=False, teammate_id=None,
+                           fetch=fetch_game):
     """Fetch and process a single team duel game.
 
     Returns:
         dict: Processed game data, or None if game should be skipped
     """
     try:
-        resp = session.get(BASE_DUEL_URL + game_id)
-        if resp.status_code != 200:
-            print(f"Failed to fetch game {game_id}: {resp.status_code}")
+        game = fetch(session, game_id)
+        if game is None:
             return None
 
-        game = resp.json()
-
         # Validate this is a standard 2v2 team duel (exactly 2 teams, 2 players each)
         teams = game.get("teams", [])
         if len(teams) != 2:
@@ -245,6 +346,7 @@ def fetch_single_team_duel(session, game_id, my_id, is_competitive=False, teamma
         return {
             "gameId": game_id,
             "isCompetitive": is_competitive,
+            "playedAt": played_at(game),
             "teamId": my_team["id"],
             "teamStats": team_stats,
             "playerStats": player_stats,
@@ -257,11 +359,16 @@ def fetch_single_team_duel(session, game_id, my_id, is_competitive=False, teamma
         return None
 
 
-def fetch_team_duels(session, game_ids_with_mode, my_id, teammate_id=None):
+def fetch_team_duels(session, game_ids_with_mode, my_id, teammate_id=None, progress=print_progress,
+                     fetch=None, validator=None):
     """Fetch team duels game details.
 
     Args:
         game_ids_with_mode: dict {game_id: is_competitive} or list of game_ids
+        progress: called as progress(done, total) after each game, or None
+        fetch: fetch(session, game_id) returning the raw game and pacing its
+            own requests; defaults to fetch_game with a fixed delay per game
+        validator: a validate.GameValidator each game must pass to be returned
     """
     # Handle both dict and list for backwards compatibility
     if isinstance(game_ids_with_mode, dict):
@@ -275,29 +382,29 @@ def fetch_team_duels(session, game_ids_with_mode, my_id, teammate_id=None):
 
     total_games = len(game_ids)
     for i, game_id in enumerate(game_ids, 1):
-        print(f"Processing game {i}/{total_games} (ID: {game_id})...")
         is_competitive = mode_map.get(game_id, False)
-        result = fetch_single_team_duel(session, game_id, my_id, is_competitive, teammate_id)
-        if result:
+        result = fetch_single_team_duel(session, game_id, my_id, is_competitive, teammate_id,
+                                        fetch or fetch_game)
+        if result and (validator is None or validator.accept(result)):
             all_results.append(result)
-        time.sleep(0.075)
+        if progress:
+            progress(i, total_games)
+        if not fetch:
+            time.sleep(0.075)
 
     return all_results
 
-def fetch_single_duel(session, game_id, my_id, is_competitive=False):
+def fetch_single_duel(session, game_id, my_id, is_competitive=False, fetch=fetch_game):
     """Fetch and process a single solo duel game.
 
     Returns:
         dict: Processed game data, or None if game should be skipped
     """
     try:
-        resp = session.get(BASE_DUEL_URL + game_id)
-        if resp.status_code != 200:
-            print(f"Failed to fetch game {game_id}: {resp.status_code}")
+        game = fetch(session, game_id)
+        if game is None:
             return None
 
-        game = resp.json()
-
         # Validate this is a standard 1v1 duel (exactly 2 teams, 1 player each)
         teams = game.get("teams", [])
         if len(teams) != 2:
@@ -391,6 +498,7 @@ def fetch_single_duel(session, game_id, my_id, is_competitive=False):
         return {
             "gameId": game_id,
             "isCompetitive": is_competitive,
+            "playedAt": played_at(game),
             "playerStats": my_stats,
             "roundStats": round_stats
         }
@@ -401,11 +509,16 @@ def fetch_single_duel(session, game_id, my_id, is_competitive=False):
         return None
 
 
-def fetch_duels(session, game_ids_with_mode, my_id):
+def fetch_duels(session, game_ids_with_mode, my_id, progress=print_progress, fetch=None,
+                validator=None):
     """Fetch solo duels game details.
 
     Args:
         game_ids_with_mode: dict {game_id: is_competitive} or list of game_ids
+        progress: called as progress(done, total) after each game, or None
+        fetch: fetch(session, game_id) returning the raw game and pacing its
+            own requests; defaults to fetch_game with a fixed delay per game
+        validator: a validate.GameValidator each game must pass to be returned
     """
     # Handle both dict and list for backwards compatibility
     if isinstance(game_ids_with_mode, dict):
@@ -418,12 +531,14 @@ def fetch_duels(session, game_ids_with_mode, my_id):
 
     total_games = len(game_ids)
     for i, game_id in enumerate(game_ids, 1):
-        print(f"Processing game {i}/{total_games} (ID: {game_id})...")
         is_competitive = mode_map.get(game_id, False)
-        result = fetch_single_duel(session, game_id, my_id, is_competitive)
-        if result:
+        result = fetch_single_duel(session, game_id, my_id, is_competitive, fetch or fetch_game)
+        if result and (validator is None or validator.accept(result)):
             all_results.append(result)
-        time.sleep(0.075)
+        if progress:
+            progress(i, total_games)
+        if not fetch:
+            time.sleep(0.075)
 
     return all_results
 
@@ -439,9 +554,7 @@ if __name__ == "__main__":
     mode_filter = input("Mode filter ('all', 'competitive', 'casual', default 'all'): ") or "all"
 
     # Create a session
-    session = requests.Session()
-    session.cookies.set("_ncfa", ncfa, domain="www.geoguessr.com")
-    session.cookies.set("_ncfa", ncfa, domain="game-server.geoguessr.com")
+    session = new_session(ncfa)
 
 
     # Fetch game tokens using the API
@@ -0,0 +1,160 @@
+"""Spatial aggregation of guess and actual locations for heatmaps."""
+import bisect
+import math
+from collections import Counter
+
+ENCODINGS = ("points", "flat", "delta")
+
+
+def _cell(lat, lng, resolution):
+    """Return the (row, col) grid cell containing a coordinate."""
+    row = math.floor((lat + 90) / resolution)
+    col = math.floor((lng + 180) / resolution)
+    return row, col
+
+
+def bin_points(points, resolution):
+    """Count (lat, lng) points per grid cell of `resolution` degrees.
+
+    Returns:
+        dict: {(row, col): weight}
+    """
+    return Counter(_cell(lat, lng, resolution) for lat, lng in points)
+
+
+def auto_resolution(points, max_bins, start=0.01):
+    """Return the finest resolution (doubling from start) that fits max_bins."""
+    resolution = start
+    while resolution < 180 and len(bin_points(points, resolution)) > max_bins:
+        resolution *= 2
+    return resolution
+
+
+def cell_center(row, col, resolution):
+    """Return the (lat, lng) center of a grid cell."""
+    return (row + 0.5) * resolution - 90, (col + 0.5) * resolution - 180
+
+
+def encode_bins(bins, resolution, encoding="points"):
+    """Encode binned points for a JSON payload.
+
+    Encodings:
+        points: [{"lat", "lng", "weight"}, ...]
+        flat:   [lat, lng, weight, lat, lng, weight, ...]
+        delta:  [drow, dcol, weight, ...] integer cell indices, each row/col
+                relative to the previous cell in sorted order (starting
+                from 0, 0). Decode with lat = (row + 0.5) * resolution - 90.
+    """
+    cells = sorted(bins.items())
+    if encoding == "delta":
+        out = []
+        prev_row, prev_col = 0, 0
+        for (row, col), weight in cells:
+            out.extend((row - prev_row, col - prev_col, weight))
+            prev_row, prev_col = row, col
+        return out
+
+    centers = [(cell_center(row, col, resolution), weight) for (row, col), weight in cells]
+    if encoding == "flat":
+        out = []
+        for (lat, lng), weight in centers:
+            out.extend((round(lat, 5), round(lng, 5), weight))
+        return out
+    return [
+        {"lat": round(lat, 5), "lng": round(lng, 5), "weight": weight}
+        for (lat, lng), weight in centers
+    ]
+
+
+def decode_delta(values):
+    """Invert the delta encoding back to {(row, col): weight}."""
+    bins = {}
+    row, col = 0, 0
+    for i in range(0, len(values), 3):
+        row += values[i]
+        col += values[i + 1]
+        bins[(row, col)] = values[i + 2]
+    return bins
+
+
+# --- Slippy-map tiles -------------------------------------------------------
+
+MAX_TILE_ZOOM = 16
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_coords(lat, lng, zoom):
+    """Return the Web Mercator (x, y) tile containing a coordinate at zoom."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    n = 1 << zoom
+    x = int((lng + 180) / 360 * n)
+    lat_rad = math.radians(lat)
+    y = int((1 - math.asinh(math.tan(lat_rad)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_center(x, y, zoom):
+    """Return the (lat, lng) center of tile (x, y) at zoom."""
+    n = 1 << zoom
+    lng = (x + 0.5) / n * 360 - 180
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 0.5) / n))))
+    return lat, lng
+
+
+def _interleave(x, y):
+    """Return the Morton (Z-order) code of tile (x, y)."""
+    code = 0
+    for bit in range(MAX_TILE_ZOOM):
+        code |= ((x >> bit) & 1) << (2 * bit)
+        code |= ((y >> bit) & 1) << (2 * bit + 1)
+    return code
+
+
+def _deinterleave(code, bits):
+    """Invert _interleave for a code of `bits` levels."""
+    x = y = 0
+    for bit in range(bits):
+        x |= ((code >> (2 * bit)) & 1) << bit
+        y |= ((code >> (2 * bit + 1)) & 1) << bit
+    return x, y
+
+
+def build_tile_index(points):
+    """Aggregate points into a quadtree index at MAX_TILE_ZOOM.
+
+    Returns a list of (morton_code, weight) pairs sorted by code. Every tile
+    at any zoom covers one contiguous range of codes, so tiles are answered
+    with two binary searches instead of a scan over all points.
+    """
+    counts = Counter(
+        _interleave(*tile_coords(lat, lng, MAX_TILE_ZOOM)) for lat, lng in points
+    )
+    return sorted(counts.items())
+
+
+def query_tile(index, z, x, y, detail=5):
+    """Return weighted cells inside tile (z, x, y) from a tile index.
+
+    Cells are sub-tiles at zoom z + detail (capped at MAX_TILE_ZOOM), so a
+    tile never returns more than 4 ** detail cells.
+
+    Returns:
+        list: [(lat, lng, weight), ...] using each cell's center
+    """
+    cell_zoom = min(z + detail, MAX_TILE_ZOOM)
+    shift = 2 * (MAX_TILE_ZOOM - z)
+    prefix = _interleave(x, y) if z else 0
+    lo = bisect.bisect_left(index, (prefix << shift,))
+    hi = bisect.bisect_left(index, ((prefix + 1) << shift,))
+
+    cell_shift = 2 * (MAX_TILE_ZOOM - cell_zoom)
+    cells = Counter()
+    for code, weight in index[lo:hi]:
+        cells[code >> cell_shift] += weight
+
+    result = []
+    for code, weight in sorted(cells.items()):
+        cx, cy = _deinterleave(code, cell_zoom)
+        lat, lng = tile_center(cx, cy, cell_zoom)
+        result.append((round(lat, 5), round(lng, 5), weight))
+    return result
@@ -0,0 +1,122 @@
+"""In-process counters and histograms, rendered in Prometheus text format.
+
+Each module defines the metrics for its own hot paths (fetching,
+geocoding, stats computation, serving) at module level; the dashboard
+exposes all of them at /metrics.  Values are per process: with several
+worker processes, each worker's endpoint reports its own share.
+"""
+import contextlib
+import threading
+import time
+
+# Default histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, key, value):
+        return [f"{self.name}{self._label_text(key)} {value:g}"]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum."""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            buckets, total, count = self._values.get(key, ((0,) * len(self.buckets), 0.0, 0))
+            buckets = list(buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    buckets[i] += 1
+            self._values[key] = (buckets, total + value, count + 1)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        return self._values.get(self._key(labels), (None, 0.0, 0))[2]
+
+    def _samples(self, key, value):
+        buckets, total, count = value
+        lines = [f"{self.name}_bucket{self._label_text(key, [('le', f'{b:g}')])} {n}"
+                 for b, n in zip(self.buckets, buckets)]
+        lines.append(f"{self.name}_bucket{self._label_text(key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {total:g}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+def render():
+    """Return every metric in Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Clear every metric's values (for tests)."""
+    for metric in _registry:
+        metric.clear()
@@ -1,9 +1,10 @@
 from collections import defaultdict
-from .utils import load_data, save_json
+from .utils import geocoding, load_data, save_json
 import reverse_geocoder as rg
 
 def get_country(lat, lon):
-    result = rg.search((lat, lon))[0]
+    with geocoding(1):
+        result = rg.search((lat, lon))[0]
     return result['cc']  # country code
 
 def process_games(games, mapsize=14916.862 * 1000):  # mapsize in meters, default is world map diagonal
@@ -51,7 +52,8 @@ def process_games(games, mapsize=14916.862 * 1000):  # mapsize in meters, defaul
     })
 
     for game in games:
-        # Validate this is a standard 2-player team game
+        # Validate this is a standard 2-player team game; synced games are
+        # also checked at ingest (see validate.py), older stores are not
         players = list(game["playerStats"].keys())
         if len(players) != 2:
             print(f"Skipping game {game.get('gameId', 'unknown')}: expected 2 players, got {len(players)}")
@@ -180,7 +182,8 @@ def process_games(games, mapsize=14916.862 * 1000):  # mapsize in meters, defaul
     
     # unique coords
     unique_coords = list(set(all_guess_coords))
-    results = rg.search(unique_coords)  # batch search
+    with geocoding(len(unique_coords)):
+        results = rg.search(unique_coords)  # batch search
 
     # map results back
     for i, coord in enumerate(unique_coords):
@@ -382,7 +385,8 @@ def process_duels(games, mapsize=14916.862 * 1000):
     # Batch reverse geocode for hit rate
     if all_guess_coords:
         unique_coords = list(set(all_guess_coords))
-        geo_results = rg.search(unique_coords)
+        with geocoding(len(unique_coords)):
+            geo_results = rg.search(unique_coords)
 
         for i, coord in enumerate(unique_coords):
             guess_country = geo_results[i]['cc'].lower()
@@ -0,0 +1,24 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at least 1/rate seconds apart.
+
+    Every thread sharing a limiter draws from the same budget, so concurrent
+    workers together never exceed `rate` requests per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the caller may make its next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
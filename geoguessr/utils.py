@@ -1,18 +1,66 @@
+import contextlib
 import json
+import os
+import time
 from datetime import datetime
 
+from .metrics import Counter, Histogram
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+GEOCODER_CALLS = Counter('geoguessr_geocoder_calls_total', "rg.search calls.")
+GEOCODER_POINTS = Counter('geoguessr_geocoder_points_total', "Coordinates reverse geocoded.")
+GEOCODER_SECONDS = Histogram('geoguessr_geocoder_seconds', "rg.search call duration.")
+
+
+def json_dumps(data, sort_keys=False) -> bytes:
+    """Encode data as compact UTF-8 JSON, using orjson when installed."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(data, option=option)
+    return json.dumps(data, separators=(",", ":"), sort_keys=sort_keys,
+                      ensure_ascii=False).encode()
+
+
+def json_loads(data):
+    """Decode JSON from bytes or str, using orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def load_data(path):
-    with open(path, "r") as f:
-        return json.load(f)
-    
+    with open(path, "rb") as f:
+        return json_loads(f.read())
+
 
 def save_json(path: str, data):
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
-    
+    # Write beside the target and rename, so readers never see a partial file
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(json_dumps(data))
+    os.replace(tmp, path)
+
 def parse_time(ts):
     return datetime.fromisoformat(ts.replace("Z", "+00:00"))
 
 def calculate_score(distance, size=14916862):
     distance = max(distance, 0)
-    return round(5000 * (2.71828 ** (-10 * distance / size)))
\ No newline at end of file
+    return round(5000 * (2.71828 ** (-10 * distance / size)))
+
+
+@contextlib.contextmanager
+def geocoding(points):
+    """Count and time the rg.search call for `points` coordinates in the block."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        GEOCODER_SECONDS.observe(time.perf_counter() - started)
+        GEOCODER_CALLS.inc()
+        GEOCODER_POINTS.inc(points)
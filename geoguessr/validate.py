@@ -0,0 +1,80 @@
+"""Validation of processed games before they reach the game store.
+
+Games are checked one at a time as they are ingested, so a malformed game
+is quarantined once instead of being skipped by every stats run:
+
+    duplicate_game_id      the game ID was already ingested
+    player_count           a team duel without exactly 2 players on our team
+    zero_round_player      a team duel player who joined but never guessed
+    missing_round_stats    no roundStats (or, for team duels, no teamStats)
+    impossible_guess_time  a guess time below 0 or above MAX_GUESS_SECONDS
+"""
+
+RULES = ('duplicate_game_id', 'player_count', 'zero_round_player', 'missing_round_stats',
+         'impossible_guess_time')
+
+# Longest plausible time from round start to guess, in seconds
+MAX_GUESS_SECONDS = 15 * 60
+
+
+def _players(game, game_type):
+    """Return {player_id: stats} for a processed game of either type."""
+    if game_type == 'duels':
+        return {'me': game.get('playerStats') or {}}
+    return game.get('playerStats') or {}
+
+
+def check_game(game, game_type, seen_ids=()):
+    """Return the (rule, message) pairs a processed game breaks.
+
+    An empty list means the game is valid.
+    """
+    reasons = []
+    game_id = game.get('gameId')
+    if game_id in seen_ids:
+        reasons.append(('duplicate_game_id', f"Game {game_id} was already ingested"))
+
+    players = _players(game, game_type)
+    if game_type == 'team_duels':
+        if len(players) != 2:
+            reasons.append(('player_count', f"Game has {len(players)} players instead of 2"))
+        for pid, stats in players.items():
+            if not stats.get('rounds'):
+                reasons.append(('zero_round_player', f"Player {pid} has 0 rounds"))
+
+    if not game.get('roundStats') or (game_type == 'team_duels' and not game.get('teamStats')):
+        reasons.append(('missing_round_stats', "Game has no round stats"))
+
+    for pid, stats in players.items():
+        times = [r.get('time') for r in stats.get('rounds', []) if r.get('time') is not None]
+        bad = [t for t in times if not 0 <= t <= MAX_GUESS_SECONDS]
+        if bad:
+            reasons.append(('impossible_guess_time',
+                            f"Player {pid} has {len(bad)} guess times outside 0-{MAX_GUESS_SECONDS}s"))
+    return reasons
+
+
+class GameValidator:
+    """Accepts or rejects a stream of processed games of one type.
+
+    Accepted game IDs are remembered, so a game repeated later in the stream
+    (or already in seen_ids) is rejected as a duplicate.
+    """
+
+    def __init__(self, game_type, seen_ids=()):
+        self.game_type = game_type
+        self.seen = set(seen_ids)
+        self.rejected = []
+
+    def accept(self, game):
+        """Return True if the game is valid; otherwise record it in rejected."""
+        reasons = check_game(game, self.game_type, self.seen)
+        if reasons:
+            self.rejected.append((game, reasons))
+            return False
+        self.seen.add(game.get('gameId'))
+        return True
+
+    def filter(self, games):
+        """Return the valid games, in order."""
+        return [game for game in games if self.accept(game)]
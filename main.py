@@ -1,7 +1,7 @@
-from geoguessr.fetch_games import fetch_filtered_tokens, fetch_team_duels, fetch_duels
+from geoguessr.fetch_games import fetch_filtered_tokens, fetch_team_duels, fetch_duels, new_session
 from geoguessr.process_stats import process_games, process_duels
 from geoguessr.utils import load_data, save_json
-import requests
+from geoguessr.validate import GameValidator
 
 def main():
     ncfa = input("Enter your ncfa cookie: ")
@@ -11,22 +11,24 @@ def main():
     mode_filter = input("Mode filter ('all', 'competitive', 'casual', default 'all'): ") or "all"
 
     # Create a session
-    session = requests.Session()
-    session.cookies.set("_ncfa", ncfa, domain="www.geoguessr.com")
-    session.cookies.set("_ncfa", ncfa, domain="game-server.geoguessr.com")
+    session = new_session(ncfa)
 
 
     # Then call the functions with session
     game_tokens = fetch_filtered_tokens(session, game_type=game_type, mode_filter=mode_filter)
 
     if game_type == "duels":
-        games = fetch_duels(session, game_tokens, player_id)
+        validator = GameValidator("duels")
+        games = fetch_duels(session, game_tokens, player_id, validator=validator)
     else:
-        games = fetch_team_duels(session, game_tokens, player_id, teammate_id)
+        validator = GameValidator("team_duels")
+        games = fetch_team_duels(session, game_tokens, player_id, teammate_id, validator=validator)
 
     save_json("data/games.json", games)
 
     print(f"Saved {len(games)} games.")
+    for game, reasons in validator.rejected:
+        print(f"Skipped game {game.get('gameId')}: {'; '.join(message for _, message in reasons)}")
 
     input_file = "data/games.json"
     output_file = "data/processed_stats.json"
@@ -1,12 +1,27 @@
 PRAGMA foreign_keys = ON;
+PRAGMA journal_mode = WAL;
 
--- Track which games have been fetched to avoid re-fetching
+-- Track which games have been fetched for each player to avoid re-fetching
 CREATE TABLE fetched_games(
-    game_id VARCHAR(64) PRIMARY KEY,
     player_id VARCHAR(64) NOT NULL,
     game_type VARCHAR(20) NOT NULL,  -- 'duels' or 'team_duels'
-    fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
-);
+    game_id VARCHAR(64) NOT NULL,
+    fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (player_id, game_type, game_id)
+) WITHOUT ROWID;
+
+-- Games rejected by validation at ingest (see geoguessr/validate.py), kept
+-- with the rules they broke instead of being written to the game store
+CREATE TABLE quarantined_games(
+    player_id VARCHAR(64) NOT NULL,
+    game_type VARCHAR(20) NOT NULL,  -- 'duels' or 'team_duels'
+    game_id VARCHAR(64) NOT NULL,
+    rule VARCHAR(30) NOT NULL,  -- the first rule broken
+    reasons TEXT NOT NULL,  -- JSON list of every broken rule's message
+    game TEXT NOT NULL,  -- JSON game store record
+    quarantined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (player_id, game_type, game_id)
+) WITHOUT ROWID;
 
 -- Overall stats for a fetch session
 -- filter_type values: duels_all, duels_competitive, duels_casual, team_all, team_competitive, team_casual
@@ -60,3 +75,149 @@ CREATE TABLE country_stats(
     win_rate REAL NOT NULL,
     FOREIGN KEY (overall_stats_id) REFERENCES overall_stats(id) ON DELETE CASCADE
 );
+
+-- Round store: synced games flattened for SQL aggregation, partitioned by
+-- owner_id, the tracked player whose perspective a row is from
+CREATE TABLE games(
+    owner_id VARCHAR(64) NOT NULL,
+    game_id VARCHAR(64) NOT NULL,
+    game_type VARCHAR(20) NOT NULL,  -- 'duels' or 'team_duels'
+    is_competitive INTEGER NOT NULL DEFAULT 0,
+    won INTEGER NOT NULL,
+    multi_merchant INTEGER NOT NULL DEFAULT 0,  -- lost but outscored the enemy
+    reverse_merchant INTEGER NOT NULL DEFAULT 0,  -- won but was outscored
+    num_rounds INTEGER NOT NULL,
+    played_at DATETIME,  -- UTC start of the first round; NULL for games stored without it
+    PRIMARY KEY (owner_id, game_id)
+) WITHOUT ROWID;
+
+-- One row per round; team rounds use the better teammate's guess
+CREATE TABLE game_rounds(
+    owner_id VARCHAR(64) NOT NULL,
+    game_id VARCHAR(64) NOT NULL,
+    round_number INTEGER NOT NULL,
+    country_code VARCHAR(5),
+    team_score INTEGER NOT NULL,
+    team_distance REAL NOT NULL,
+    enemy_score INTEGER NOT NULL,
+    five_ks INTEGER NOT NULL,  -- 5000-point guesses in the round
+    guess_country VARCHAR(5),  -- reverse geocoded at ingest
+    PRIMARY KEY (owner_id, game_id, round_number),
+    FOREIGN KEY (owner_id, game_id) REFERENCES games(owner_id, game_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- One row per player per round; missed rounds score 0 at map-size distance
+CREATE TABLE player_rounds(
+    owner_id VARCHAR(64) NOT NULL,
+    game_id VARCHAR(64) NOT NULL,
+    round_number INTEGER NOT NULL,
+    player_id VARCHAR(64) NOT NULL,
+    score INTEGER NOT NULL,
+    distance REAL NOT NULL,
+    time REAL,
+    lat REAL,
+    lng REAL,
+    actual_lat REAL,
+    actual_lng REAL,
+    contributed INTEGER NOT NULL,  -- guessed closer than the teammate
+    PRIMARY KEY (owner_id, game_id, round_number, player_id),
+    FOREIGN KEY (owner_id, game_id) REFERENCES games(owner_id, game_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Trend rollups per day and per week (bucket is the day, or the Monday of
+-- the week) of games with a known start time, added to as games enter the
+-- round store
+CREATE TABLE trend_rollups(
+    owner_id VARCHAR(64) NOT NULL,
+    game_type VARCHAR(20) NOT NULL,
+    period VARCHAR(5) NOT NULL,  -- 'day' or 'week'
+    bucket DATE NOT NULL,
+    is_competitive INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,  -- team score summed over rounds
+    five_ks INTEGER NOT NULL,
+    PRIMARY KEY (owner_id, game_type, period, bucket, is_competitive)
+) WITHOUT ROWID;
+
+-- Per-country trend rollups, same buckets
+CREATE TABLE trend_country_rollups(
+    owner_id VARCHAR(64) NOT NULL,
+    game_type VARCHAR(20) NOT NULL,
+    period VARCHAR(5) NOT NULL,
+    country_code VARCHAR(5) NOT NULL,
+    bucket DATE NOT NULL,
+    is_competitive INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    score_diff INTEGER NOT NULL,  -- team minus enemy score, summed over rounds
+    PRIMARY KEY (owner_id, game_type, period, country_code, bucket, is_competitive)
+) WITHOUT ROWID;
+
+-- Current snapshot per player and filter type; swapped in the same
+-- transaction that writes a sync's snapshots so readers never see a
+-- partial set
+CREATE TABLE latest_stats(
+    player_id VARCHAR(64) NOT NULL,
+    filter_type VARCHAR(30) NOT NULL,
+    overall_stats_id INTEGER NOT NULL,
+    PRIMARY KEY (player_id, filter_type),
+    FOREIGN KEY (overall_stats_id) REFERENCES overall_stats(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Background sync jobs
+-- status values: queued, running, complete, error
+CREATE TABLE sync_jobs(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id VARCHAR(64) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+    result TEXT,  -- JSON payload of the final "complete" or "error" event
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP  -- heartbeat while active
+);
+
+-- Progress events of a sync job, replayed to subscribers in seq order
+CREATE TABLE sync_job_events(
+    job_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    event VARCHAR(20) NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq),
+    FOREIGN KEY (job_id) REFERENCES sync_jobs(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Outcome of each player's last successful sync, used to order
+-- multi-account syncs by staleness and activity
+CREATE TABLE sync_accounts(
+    player_id VARCHAR(64) PRIMARY KEY,
+    last_synced_at DATETIME NOT NULL,
+    games_per_hour REAL NOT NULL DEFAULT 0,  -- new games / hours since the previous sync
+    last_duration REAL  -- seconds
+) WITHOUT ROWID;
+
+-- At most one queued or running sync per player
+CREATE UNIQUE INDEX sync_jobs_active_idx ON sync_jobs(player_id)
+    WHERE status IN ('queued', 'running');
+
+-- Snapshot retention: newest snapshots per player and filter type
+CREATE INDEX overall_stats_player_idx ON overall_stats(player_id, filter_type, created_at);
+
+-- Snapshot children are always read (and cascade-deleted) by snapshot id
+CREATE INDEX player_contributions_snapshot_idx ON player_contributions(overall_stats_id);
+CREATE INDEX country_stats_snapshot_idx ON country_stats(overall_stats_id);
+
+-- Covering index for game-level filters and totals within a partition
+CREATE INDEX games_filter_idx ON games(owner_id, game_type, is_competitive, won, num_rounds,
+                                       multi_merchant, reverse_merchant);
+
+-- Games in a partition in the order they were played
+CREATE INDEX games_played_idx ON games(owner_id, game_type, played_at);
+
+-- Teammate filter: games in a partition a player took part in
+CREATE INDEX player_rounds_player_idx ON player_rounds(owner_id, player_id, game_id);
+
+-- Quarantine review by rule
+CREATE INDEX quarantined_games_rule_idx ON quarantined_games(player_id, rule);
+
+-- Pointer cleanup when snapshots are pruned
+CREATE INDEX latest_stats_snapshot_idx ON latest_stats(overall_stats_id);
@@ -0,0 +1,72 @@
+"""Shared pytest fixtures for the dashboard tests."""
+import sqlite3
+import threading
+import pytest
+
+import geodash
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Point the Flask app at a fresh database and game store in tmp_path."""
+    root = geodash.app.config['GEODASH_ROOT']
+    db_path = tmp_path / 'geodash.sqlite3'
+    db = sqlite3.connect(str(db_path))
+    db.executescript((root / 'sql' / 'schema.sql').read_text())
+    db.close()
+
+    overrides = {
+        'TESTING': True,
+        'DATABASE_FILENAME': db_path,
+        'PLAYER_DATA_DIR': tmp_path / 'players',
+        'CACHE_FILENAME': tmp_path / 'cache.sqlite3',
+        'GENERATION_DIR': tmp_path / 'generations',
+        'PROFILE_DIR': tmp_path / 'profiles',
+        'PROFILING_ENABLED': False,
+    }
+    saved = {key: geodash.app.config.get(key) for key in overrides}
+    geodash.app.config.update(overrides)
+    yield geodash.app
+    geodash.app.config.update(saved)
+
+
+@pytest.fixture
+def client(app):
+    """Return a test client for the configured app."""
+    return app.test_client()
+
+
+@pytest.fixture
+def fake_sync(app, monkeypatch):
+    """Replace the GeoGuessr pipeline with one that can be held or failed."""
+    monkeypatch.setitem(app.config, 'SYNC_POLL_INTERVAL', 0.01)
+    control = {'release': threading.Event(), 'error': None, 'calls': []}
+    control['release'].set()
+
+    def run_sync(player_id, ncfa, emit, **options):
+        control['calls'].append(player_id)
+        control['options'] = options
+        emit("phase", {"phase": 1, "status": "in_progress"})
+        control['release'].wait(5)
+        if control['error']:
+            raise control['error']
+        emit("phase", {"phase": 1, "status": "complete", "count": 3})
+        return {"success": True, "duels_fetched": 3}
+
+    monkeypatch.setattr(geodash.sync, 'run_sync', run_sync)
+    return control
+
+
+@pytest.fixture
+def mock_geoguessr(monkeypatch):
+    """Serve a small synthetic history for player 'me' and point the fetchers at it."""
+    from geoguessr import fetch_games
+    from .mock_geoguessr import MockGeoGuessr, synthetic_history
+
+    mock = MockGeoGuessr(synthetic_history('me', duels=6, team_duels=6, seed=1),
+                         ncfa='cookie', page_size=4)
+    with mock:
+        monkeypatch.setattr(fetch_games, 'BASE_FEED_URL', mock.url + '/api/v4/feed/private')
+        monkeypatch.setattr(fetch_games, 'BASE_DUEL_URL', mock.url + '/api/duels/')
+        monkeypatch.setattr(fetch_games, 'BASE_USER_URL', mock.url + '/api/v3/users/')
+        yield mock
@@ -0,0 +1,376 @@
+"""Local stand-in for the GeoGuessr API.
+
+Serves the three shapes the fetch pipeline reads:
+
+    GET /api/v4/feed/private[?paginationToken=T]   feed pages of game entries
+    GET /api/duels/<game_id>                       raw duel / team duel games
+    GET /api/v3/users/<player_id>                  {"nick": ...}
+
+from synthetic games (seeded, so every run sees the same history) or from a
+recorded data file, with optional latency, a requests/second limit that
+answers 429 with Retry-After, random 5xx responses and queued faults.  The
+feed and game server share one host; point the fetchers at it with
+
+    GEOGUESSR_API_URL=http://127.0.0.1:PORT
+    GEOGUESSR_GAME_SERVER_URL=http://127.0.0.1:PORT
+
+or, in tests, the mock_geoguessr fixture.  Run standalone for load runs:
+
+    python -m tests.mock_geoguessr --player-id me --duels 500 --team-duels 500
+
+A data file holds {"feed": [...], "games": {...}, "users": {...}}, where
+feed is newest-first [{"gameId", "gameMode", "competitive"}] and games maps
+each game ID to its game server response; MockGeoGuessr.save() writes one.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, urlsplit
+
+from geoguessr.utils import calculate_score
+
+# (country code, lat, lng) drawn for synthetic rounds
+COUNTRIES = [
+    ('us', 39.8, -98.6), ('br', -14.2, -51.9), ('ru', 61.5, 105.3), ('fr', 46.2, 2.2),
+    ('jp', 36.2, 138.3), ('au', -25.3, 133.8), ('ca', 56.1, -106.3), ('za', -30.6, 22.9),
+    ('in', 20.6, 79.0), ('mx', 23.6, -102.6), ('se', 60.1, 18.6), ('ar', -38.4, -63.6),
+]
+START_HEALTH = 6000
+
+
+def _guess(rng, round_number, start, country):
+    """A guess at a random distance from the round's location."""
+    _, lat, lng = country
+    distance = rng.choice([rng.uniform(0, 200), rng.uniform(200, 1500), rng.uniform(1500, 6000)])
+    distance *= 1000
+    return {
+        "roundNumber": round_number,
+        "distance": round(distance, 1),
+        "score": calculate_score(distance),
+        "lat": lat + rng.uniform(-5, 5),
+        "lng": lng + rng.uniform(-5, 5),
+        "created": (start + timedelta(seconds=rng.uniform(5, 90))).isoformat().replace('+00:00', 'Z'),
+    }
+
+
+def synthetic_game(game_id, teams, rng, played_at, blank_rate=0.0, missing_rate=0.0):
+    """Build a game server response for teams of player IDs.
+
+    Rounds are played until one team's health runs out, with the worse
+    team losing the score difference of its best guesses. With blank_rate,
+    that share of rounds has a blank country code, as coastal rounds do;
+    with missing_rate, that share of guesses is missing (the player ran out
+    of time).
+    """
+    health = [START_HEALTH, START_HEALTH]
+    rounds = []
+    guesses = {pid: [] for team in teams for pid in team}
+    results = [[], []]
+    while min(health) > 0 and len(rounds) < 20:
+        number = len(rounds) + 1
+        start = played_at + timedelta(minutes=2 * len(rounds))
+        country = rng.choice(COUNTRIES)
+        code = '' if rng.random() < blank_rate else country[0]
+        rounds.append({
+            "roundNumber": number,
+            "startTime": start.isoformat().replace('+00:00', 'Z'),
+            "panorama": {"countryCode": code, "lat": country[1], "lng": country[2]},
+        })
+        best = []
+        for team in teams:
+            scores = [0]
+            for pid in team:
+                if rng.random() < missing_rate:
+                    continue
+                guess = _guess(rng, number, start, country)
+                guesses[pid].append(guess)
+                scores.append(guess["score"])
+            best.append(max(scores))
+        damage = abs(best[0] - best[1]) * (1 + len(rounds) // 5)
+        loser = 0 if best[0] < best[1] else 1
+        for i in (0, 1):
+            after = max(0, health[i] - damage) if i == loser else health[i]
+            results[i].append({"roundNumber": number, "healthBefore": health[i], "healthAfter": after})
+            health[i] = after
+    return {
+        "gameId": game_id,
+        "rounds": rounds,
+        "teams": [
+            {
+                "id": color,
+                "players": [{"playerId": pid, "guesses": guesses[pid]} for pid in team],
+                "roundResults": results[i],
+            }
+            for i, (color, team) in enumerate(zip(("red", "blue"), teams))
+        ],
+    }
+
+
+def synthetic_games(player_id, duels=0, team_duels=0, seed=0, competitive_rate=0.5,
+                    blank_rate=0.0, missing_rate=0.0):
+    """Yield a player's game history, oldest first, one game at a time.
+
+    Opponents and teammates come from a small pool, so teammate filters
+    and username lookups see repeated players.
+
+    Yields:
+        tuple: (feed item {"gameId", "gameMode", "competitive"}, game server response)
+    """
+    rng = random.Random(seed)
+    pool = [f"player{n:03d}" for n in range(40)]
+    teammates = pool[:4]
+    played_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    kinds = ['Duels'] * duels + ['TeamDuels'] * team_duels
+    rng.shuffle(kinds)
+
+    for n, mode in enumerate(kinds):
+        game_id = f"{seed:04d}-{n:06d}"
+        played_at += timedelta(minutes=rng.randint(10, 600))
+        if mode == 'Duels':
+            teams = [[player_id], [rng.choice(pool[4:])]]
+        else:
+            teams = [[player_id, rng.choice(teammates)], rng.sample(pool[4:], 2)]
+        if rng.random() < 0.5:
+            teams.reverse()
+        game = synthetic_game(game_id, teams, rng, played_at, blank_rate, missing_rate)
+        yield {"gameId": game_id, "gameMode": mode,
+               "competitive": rng.random() < competitive_rate}, game
+
+
+def synthetic_history(player_id, duels=0, team_duels=0, seed=0, **options):
+    """Generate a player's game history as MockGeoGuessr data.
+
+    Options are passed to synthetic_games().
+
+    Returns:
+        dict: {"feed": [...], "games": {...}, "users": {...}}
+    """
+    feed, games = [], {}
+    for item, game in synthetic_games(player_id, duels, team_duels, seed, **options):
+        feed.append(item)
+        games[item["gameId"]] = game
+    feed.reverse()
+
+    users = {f"player{n:03d}": f"Player {n:03d}" for n in range(40)}
+    users[player_id] = player_id.title()
+    return {"feed": feed, "games": games, "users": users}
+
+
+class MockGeoGuessr:
+    """A threaded HTTP server answering like the GeoGuessr API.
+
+    Args:
+        data: {"feed", "games", "users"} as from synthetic_history()
+        ncfa: _ncfa cookie value required on every request (None: any)
+        page_size: games per feed page
+        latency: seconds added to every response
+        rate_limit: requests per second allowed before answering 429
+        retry_after: Retry-After seconds sent with 429 and 503 responses
+        error_rate: share of requests answered 503, drawn from `seed`
+    """
+
+    def __init__(self, data, ncfa=None, page_size=10, latency=0.0, rate_limit=None,
+                 retry_after=0, error_rate=0.0, seed=0):
+        self.feed = data.get("feed", [])
+        self.games = data.get("games", {})
+        self.users = data.get("users", {})
+        self.ncfa = ncfa
+        self.page_size = page_size
+        self.latency = latency
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.log = []
+        self._rng = random.Random(seed)
+        self._faults = []
+        self._lock = threading.Lock()
+        self._server = None
+        self.rate_limit = rate_limit
+
+    @property
+    def rate_limit(self):
+        return self._rate_limit
+
+    @rate_limit.setter
+    def rate_limit(self, rate):
+        """Change the allowed requests per second, starting with a full bucket."""
+        with self._lock:
+            self._rate_limit = rate
+            self._tokens = float(rate or 0)
+            self._refilled = time.monotonic()
+
+    @classmethod
+    def load(cls, path, **options):
+        """Serve a recorded data file."""
+        with open(path) as f:
+            return cls(json.load(f), **options)
+
+    def save(self, path):
+        """Write the served data in the format load() reads."""
+        with open(path, 'w') as f:
+            json.dump({"feed": self.feed, "games": self.games, "users": self.users}, f)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, status, count=1, path=''):
+        """Answer the next `count` requests whose path starts with `path` with `status`."""
+        with self._lock:
+            self._faults.extend([(path, status)] * count)
+
+    def requests_to(self, path):
+        """Return the statuses answered for requests whose path starts with `path`."""
+        return [status for p, status in self.log if p.startswith(path)]
+
+    def start(self, port=0):
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _fault(self, path):
+        """Return the injected status for a request, or None to serve it."""
+        with self._lock:
+            for i, (prefix, status) in enumerate(self._faults):
+                if path.startswith(prefix):
+                    del self._faults[i]
+                    return status
+            if self._rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self._rate_limit,
+                                   self._tokens + (now - self._refilled) * self._rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    return 429
+                self._tokens -= 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return 503
+        return None
+
+    def respond(self, path, query, cookie):
+        """Return (status, body) for a GET request."""
+        if self.latency:
+            time.sleep(self.latency)
+        status = self._fault(path)
+        if status:
+            return status, {"message": "injected"}
+        if self.ncfa is not None and cookie != self.ncfa:
+            return 401, {"message": "Unauthorized"}
+
+        if path == '/api/v4/feed/private':
+            return 200, self._feed_page(int((query.get('paginationToken') or ['0'])[0]))
+        if path.startswith('/api/duels/'):
+            game = self.games.get(path[len('/api/duels/'):])
+            return (200, game) if game else (404, {"message": "Game not found"})
+        if path.startswith('/api/v3/users/'):
+            nick = self.users.get(path[len('/api/v3/users/'):])
+            return (200, {"nick": nick}) if nick else (404, {"message": "User not found"})
+        return 404, {"message": "Not found"}
+
+    def _feed_page(self, start):
+        """A feed page; team duels are grouped in pairs like the real feed."""
+        games = self.feed[start:start + self.page_size]
+        entries = []
+        for game in games:
+            item = {
+                "gameMode": game["gameMode"],
+                "gameId": game["gameId"],
+                "payload": {"competitiveGameMode": "StandardDuels" if game["competitive"] else "None"},
+            }
+            last = entries[-1] if entries else None
+            if (game["gameMode"] == "TeamDuels" and last and len(last) == 1
+                    and last[0]["gameMode"] == "TeamDuels"):
+                last.append(item)
+            else:
+                entries.append([item])
+        entries = [{"payload": json.dumps(group if len(group) > 1 else group[0])}
+                   for group in entries]
+
+        page = {"entries": entries}
+        if start + self.page_size < len(self.feed):
+            page["paginationToken"] = str(start + self.page_size)
+        return page
+
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            cookie = SimpleCookie(self.headers.get('Cookie', '')).get('_ncfa')
+            status, body = mock.respond(url.path, parse_qs(url.query),
+                                        cookie.value if cookie else None)
+            with mock._lock:
+                mock.log.append((url.path, status))
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            if status in (429, 503):
+                self.send_header('Retry-After', str(mock.retry_after))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--data', help="recorded data file (default: synthetic games)")
+    parser.add_argument('--save', help="write the served data to this file")
+    parser.add_argument('--player-id', default='me')
+    parser.add_argument('--duels', type=int, default=200)
+    parser.add_argument('--team-duels', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ncfa', help="cookie value to require")
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    options = dict(ncfa=args.ncfa, page_size=args.page_size, latency=args.latency,
+                   rate_limit=args.rate_limit, retry_after=args.retry_after,
+                   error_rate=args.error_rate, seed=args.seed)
+    if args.data:
+        mock = MockGeoGuessr.load(args.data, **options)
+    else:
+        mock = MockGeoGuessr(synthetic_history(args.player_id, args.duels, args.team_duels,
+                                               args.seed), **options)
+    if args.save:
+        mock.save(args.save)
+
+    mock.start(args.port)
+    print(f"export GEOGUESSR_API_URL={mock.url} GEOGUESSR_GAME_SERVER_URL={mock.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
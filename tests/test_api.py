@@ -0,0 +1,415 @@
+"""Tests for the geodash read API."""
+import geodash
+from geodash.cache import bump_generation
+from geodash.store import games_path
+from geoguessr.utils import save_json
+
+
+def _write_store(app, game_type, games, player_id='me'):
+    """Write a player's game store for one game type."""
+    with app.app_context():
+        path = games_path(game_type, player_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_json(path, games)
+
+
+class TestConditionalRequests:
+    """Tests for ETag / Last-Modified handling on read endpoints."""
+
+    def test_etag_and_cache_headers(self, client):
+        resp = client.get('/api/v1/teammates/')
+        assert resp.status_code == 200
+        assert resp.headers['ETag']
+        assert 'Last-Modified' in resp.headers
+        assert 'no-cache' in resp.headers['Cache-Control']
+
+    def test_if_none_match_returns_304(self, client):
+        etag = client.get('/api/v1/teammates/').headers['ETag']
+        resp = client.get('/api/v1/teammates/', headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.data == b''
+        assert resp.headers['ETag'] == etag
+
+    def test_etag_differs_per_query(self, client):
+        a = client.get('/api/v1/teammates/').headers['ETag']
+        b = client.get('/api/v1/teammates/?x=1').headers['ETag']
+        assert a != b
+
+    def test_sync_invalidates_etag(self, app, client):
+        _write_store(app, 'duels', [])
+        etag = client.get('/api/v1/teammates/').headers['ETag']
+        with app.app_context():
+            bump_generation('me')
+        resp = client.get('/api/v1/teammates/', headers={'If-None-Match': etag})
+        assert resp.status_code == 200
+
+    def test_if_modified_since_without_dataset_is_not_304(self, client):
+        resp = client.get('/api/v1/stats/',
+                          headers={'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'})
+        assert resp.status_code == 404
+
+    def test_if_modified_since_returns_304(self, app, client):
+        _write_store(app, 'duels', [])
+        last_modified = client.get('/api/v1/teammates/').headers['Last-Modified']
+        resp = client.get('/api/v1/teammates/', headers={'If-Modified-Since': last_modified})
+        assert resp.status_code == 304
+
+    def test_errors_carry_no_validators(self, app, client):
+        _write_store(app, 'duels', [])
+        resp = client.get('/api/v1/stats/')
+        assert resp.status_code == 404
+        assert 'ETag' not in resp.headers
+
+
+def _write_duels(app, n, lat=48.85, lng=2.35, player_id='me'):
+    """Write n identical French duel rounds to a player's game store."""
+    game = {
+        "gameId": "g",
+        "isCompetitive": False,
+        "playerStats": {"totalScore": 4500, "rounds": [{
+            "roundNumber": 1, "score": 4500, "distance": 100, "time": 10.0,
+            "country": "fr", "lat": lat, "lng": lng,
+            "actualLat": lat, "actualLng": lng,
+        }]},
+        "roundStats": [{"roundNumber": 1, "enemyScore": 4000, "totalHealthChange": 0, "country": "fr"}],
+    }
+    _write_store(app, 'duels', [game] * n, player_id)
+
+
+class TestCountryHeatmap:
+    """Tests for heatmap binning and compression on the details endpoint."""
+
+    def test_raw_points_by_default(self, app, client):
+        _write_duels(app, 3)
+        data = client.get('/api/v1/countries/fr/details/?game_type=duels').get_json()['data']
+        assert data['heatmap_data']['actual'] == [{'lat': 48.85, 'lng': 2.35}] * 3
+
+    def test_binned_flat_encoding(self, app, client):
+        _write_duels(app, 3)
+        url = '/api/v1/countries/fr/details/?game_type=duels&resolution=1&encoding=flat'
+        heatmap = client.get(url).get_json()['data']['heatmap_data']
+        assert heatmap['resolution'] == 1.0
+        assert heatmap['actual'] == [48.5, 2.5, 3]
+
+    def test_too_many_points_are_binned(self, app, client):
+        saved = app.config['HEATMAP_MAX_BINS']
+        app.config['HEATMAP_MAX_BINS'] = 2
+        try:
+            _write_duels(app, 10)
+            heatmap = client.get('/api/v1/countries/fr/details/?game_type=duels').get_json()['data']['heatmap_data']
+        finally:
+            app.config['HEATMAP_MAX_BINS'] = saved
+        assert sum(cell['weight'] for cell in heatmap['guess']) == 10
+
+    def test_invalid_resolution(self, app, client):
+        _write_duels(app, 1)
+        resp = client.get('/api/v1/countries/fr/details/?game_type=duels&resolution=abc')
+        assert resp.status_code == 400
+
+    def test_gzip_compression(self, app, client):
+        _write_duels(app, 50)
+        resp = client.get('/api/v1/countries/fr/details/?game_type=duels',
+                          headers={'Accept-Encoding': 'gzip'})
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in resp.headers['Vary']
+        etag = resp.headers['ETag']
+        assert etag.endswith('-gzip"')
+        again = client.get('/api/v1/countries/fr/details/?game_type=duels',
+                           headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert again.status_code == 304
+
+
+class TestHeatmapTiles:
+    """Tests for the z/x/y heatmap tile endpoint."""
+
+    def test_world_tile(self, app, client):
+        _write_duels(app, 4)
+        data = client.get('/api/v1/tiles/0/0/0/?detail=0').get_json()['data']
+        assert data['cells'][0]['weight'] == 4
+
+    def test_empty_tile(self, app, client):
+        _write_duels(app, 4)
+        data = client.get('/api/v1/tiles/1/0/1/').get_json()['data']
+        assert data['cells'] == []
+
+    def test_country_filter(self, app, client):
+        _write_duels(app, 4)
+        data = client.get('/api/v1/tiles/0/0/0/?country=us').get_json()['data']
+        assert data['cells'] == []
+
+    def test_out_of_range(self, app, client):
+        _write_duels(app, 1)
+        assert client.get('/api/v1/tiles/1/2/0/').status_code == 400
+        assert client.get('/api/v1/tiles/0/0/0/?layer=bogus').status_code == 400
+
+
+class TestBundle:
+    """Tests for the single-roundtrip bundle endpoint and page embedding."""
+
+    def test_stats_bundle_matches_endpoints(self, app, client):
+        _write_duels(app, 3)
+        with app.app_context():
+            geodash.sync.compute_and_store_all_variations('me')
+
+        bundle = client.get('/api/v1/bundle/?page=stats&game_type=duels').get_json()['data']
+        assert bundle['stats'] == client.get('/api/v1/stats/?game_type=duels').get_json()
+        assert bundle['countries'] == client.get('/api/v1/countries/?game_type=duels').get_json()
+        assert 'teammates' not in bundle
+
+    def test_country_bundle_includes_details(self, app, client):
+        _write_duels(app, 3)
+        with app.app_context():
+            geodash.sync.compute_and_store_all_variations('me')
+
+        bundle = client.get('/api/v1/bundle/?page=country&country=FR&game_type=duels').get_json()['data']
+        assert bundle['details']['success']
+        assert bundle['details']['data']['heatmap_data']['encoding'] == 'flat'
+
+    def test_team_bundle_includes_teammates(self, client):
+        bundle = client.get('/api/v1/bundle/?game_type=team_duels').get_json()['data']
+        assert bundle['teammates'] == []
+        assert not bundle['stats']['success']
+
+    def test_invalid_page(self, client):
+        assert client.get('/api/v1/bundle/?page=nope').status_code == 400
+        assert client.get('/api/v1/bundle/?page=country').status_code == 400
+        assert client.get('/api/v1/bundle/?page=country&country=fr&resolution=90').status_code == 400
+        assert client.get('/api/v1/bundle/?page=country&country=fr&encoding=png').status_code == 400
+
+    def test_country_page_embeds_only_cached_details(self, app, client):
+        _write_duels(app, 3)
+        html = client.get('/countries/FR/?game_type=duels').get_data(as_text=True)
+        assert 'id="bundle-data"' not in html
+        client.get('/api/v1/bundle/?page=country&country=fr&game_type=duels')
+        html = client.get('/countries/FR/?game_type=duels').get_data(as_text=True)
+        assert 'id="bundle-data"' in html
+
+    def test_page_embeds_bundle(self, client):
+        html = client.get('/stats/').get_data(as_text=True)
+        assert 'id="bundle-data"' in html
+
+    def test_embedding_can_be_disabled(self, app, client):
+        app.config['EMBED_BUNDLE'] = False
+        try:
+            html = client.get('/stats/').get_data(as_text=True)
+        finally:
+            app.config['EMBED_BUNDLE'] = True
+        assert 'id="bundle-data"' not in html
+
+
+def _insert_team_snapshot(db, created_at, teammates):
+    """Insert a team_duels_all snapshot owned by 'me' with the given teammates."""
+    cur = db.execute(
+        """INSERT INTO overall_stats
+           (player_id, game_type, filter_type, total_games, win_percentage,
+            avg_rounds_per_game, multi_merchant, reverse_merchant, created_at)
+           VALUES ('me', 'team_duels', 'team_duels_all', 1, 0, 1, 0, 0, ?)""",
+        (created_at,)
+    )
+    for pid in ['me'] + teammates:
+        db.execute(
+            """INSERT INTO player_contributions
+               (overall_stats_id, player_id, contribution_percent, games_played)
+               VALUES (?, ?, 50, 1)""",
+            (cur.lastrowid, pid)
+        )
+    db.execute(
+        """INSERT INTO country_stats
+           (overall_stats_id, country_code, rounds, avg_score, avg_distance_km,
+            five_k_rate, avg_score_diff, hit_rate, win_rate)
+           VALUES (?, 'fr', 1, 0, 0, 0, 0, 0, 0)""",
+        (cur.lastrowid,)
+    )
+    db.execute(
+        """INSERT OR REPLACE INTO latest_stats (player_id, filter_type, overall_stats_id)
+           VALUES ('me', 'team_duels_all', ?)""",
+        (cur.lastrowid,)
+    )
+    db.commit()
+    return cur.lastrowid
+
+
+class TestSnapshots:
+    """Tests for snapshot retention and latest-snapshot reads."""
+
+    def test_teammates_from_latest_snapshot_only(self, app, client):
+        from geodash.model import get_db
+        with app.app_context():
+            db = get_db()
+            _insert_team_snapshot(db, '2024-01-01 00:00:00', ['old'])
+            _insert_team_snapshot(db, '2024-01-02 00:00:00', ['new'])
+        teammates = client.get('/api/v1/teammates/?player=me').get_json()['teammates']
+        assert [t['player_id'] for t in teammates] == ['new']
+
+    def test_prune_keeps_newest_and_cascades(self, app):
+        from geodash.sync import _prune_snapshots
+        from geodash.model import get_db
+        app.config['SNAPSHOT_RETENTION'] = 2
+        try:
+            with app.app_context():
+                db = get_db()
+                ids = [
+                    _insert_team_snapshot(db, f'2024-01-0{day} 00:00:00', ['mate'])
+                    for day in (1, 2, 3)
+                ]
+                _prune_snapshots('me')
+                kept = [r['id'] for r in db.execute("SELECT id FROM overall_stats ORDER BY id")]
+                orphans = db.execute(
+                    """SELECT COUNT(*) FROM country_stats
+                       WHERE overall_stats_id NOT IN (SELECT id FROM overall_stats)"""
+                ).fetchone()[0]
+                contribs = db.execute("SELECT COUNT(*) FROM player_contributions").fetchone()[0]
+        finally:
+            app.config['SNAPSHOT_RETENTION'] = 3
+        assert kept == ids[1:]
+        assert orphans == 0
+        assert contribs == 4
+
+    def test_prune_lookup_uses_index(self, app):
+        from geodash.model import get_db
+        with app.app_context():
+            plan = get_db(readonly=True).execute(
+                """EXPLAIN QUERY PLAN SELECT id FROM overall_stats
+                   WHERE player_id = ? AND filter_type = ?
+                   ORDER BY created_at DESC, id DESC LIMIT 1""",
+                ('me', 'duels_all')
+            ).fetchall()
+        detail = " ".join(row['detail'] for row in plan)
+        assert 'overall_stats_player_idx' in detail
+        assert 'TEMP B-TREE' not in detail
+
+    def test_sync_swaps_pointers_atomically(self, app, client):
+        import sqlite3
+        from geodash.model import get_db
+        _write_duels(app, 3)
+        with app.app_context():
+            geodash.sync.compute_and_store_all_variations('me')
+
+        # A reader mid-transaction keeps seeing the previous sync's snapshots
+        reader = sqlite3.connect(f"file:{app.config['DATABASE_FILENAME']}?mode=ro", uri=True)
+        reader.execute("BEGIN")
+        before = reader.execute("SELECT filter_type, overall_stats_id FROM latest_stats").fetchall()
+        with app.app_context():
+            geodash.sync.compute_and_store_all_variations('me')
+            current = [tuple(row) for row in get_db().execute(
+                "SELECT filter_type, overall_stats_id FROM latest_stats"
+            )]
+        assert reader.execute("SELECT filter_type, overall_stats_id FROM latest_stats").fetchall() == before
+        reader.close()
+
+        assert sorted(f for f, _ in before) == ['duels_all', 'duels_casual']
+        assert all(new > old for (_, old), (_, new) in zip(sorted(before), sorted(current)))
+        overall = client.get('/api/v1/stats/?game_type=duels').get_json()['data']['overall']
+        assert overall['id'] == dict(current)['duels_all']
+
+    def test_failed_sync_writes_nothing(self, app, monkeypatch):
+        import pytest
+        from geodash.model import get_db
+        _write_duels(app, 3)
+        real_save = geodash.sync._save_stats_to_db
+        calls = []
+
+        def flaky_save(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("disk full")
+            return real_save(*args)
+
+        monkeypatch.setattr(geodash.sync, '_save_stats_to_db', flaky_save)
+        with app.app_context():
+            with pytest.raises(RuntimeError):
+                geodash.sync.compute_and_store_all_variations('me')
+            db = get_db()
+            assert db.execute("SELECT COUNT(*) FROM overall_stats").fetchone()[0] == 0
+            assert db.execute("SELECT COUNT(*) FROM latest_stats").fetchone()[0] == 0
+
+
+class TestTeammateFilter:
+    """Teammate-filtered requests are answered from the round store."""
+
+    def test_stats_and_countries_for_teammate(self, app, client):
+        from .test_rounds import _team_games
+        _write_store(app, 'team_duels', _team_games())
+        with app.app_context():
+            geodash.sync.compute_and_store_all_variations('me')
+
+        stats = client.get('/api/v1/stats/?game_type=team_duels&teammate=mate1').get_json()['data']
+        assert stats['overall']['total_games'] == 2
+        assert stats['overall']['filter_type'] == 'team_duels_all_teammate'
+        assert {p['player_id'] for p in stats['player_contributions']} == {'me', 'mate1'}
+
+        countries = client.get('/api/v1/countries/?game_type=team_duels&teammate=mate1').get_json()
+        assert {c['country_code'] for c in countries['data']['all_countries']} == {'fr', 'de'}
+
+    def test_unknown_teammate(self, client):
+        resp = client.get('/api/v1/stats/?game_type=team_duels&teammate=nobody')
+        assert resp.status_code == 404
+
+
+class TestJsonProvider:
+    """Tests for the fast JSON provider."""
+
+    def test_responses_are_compact_json(self, client):
+        resp = client.get('/api/v1/teammates/')
+        assert resp.mimetype == 'application/json'
+        assert resp.data == b'{"success":true,"teammates":[]}\n'
+
+    def test_falls_back_for_unsupported_types(self, app):
+        from decimal import Decimal
+        with app.app_context():
+            assert app.json.loads(app.json.dumps({"n": Decimal("1.5")})) == {"n": "1.5"}
+
+
+class TestPlayerPartitions:
+    """Reads, snapshots and caches are partitioned by player."""
+
+    def _sync(self, app, player_id, n):
+        _write_duels(app, n, player_id=player_id)
+        with app.app_context():
+            geodash.sync.compute_and_store_all_variations(player_id)
+
+    def test_each_player_reads_own_stats(self, app, client):
+        self._sync(app, 'alice', 2)
+        self._sync(app, 'bob', 5)
+        for player_id, games in (('alice', 2), ('bob', 5)):
+            overall = client.get(f'/api/v1/stats/?game_type=duels&player={player_id}').get_json()
+            assert overall['data']['overall']['total_games'] == games
+            assert overall['data']['overall']['player_id'] == player_id
+        assert client.get('/api/v1/stats/?game_type=duels&player=carol').status_code == 404
+
+    def test_player_required_when_several_tracked(self, app, client, monkeypatch):
+        self._sync(app, 'alice', 1)
+        assert client.get('/api/v1/stats/?game_type=duels').status_code == 200
+        self._sync(app, 'bob', 1)
+        resp = client.get('/api/v1/stats/?game_type=duels')
+        assert resp.status_code == 400
+        assert 'ETag' not in resp.headers
+        monkeypatch.setitem(app.config, 'DEFAULT_PLAYER_ID', 'bob')
+        assert client.get('/api/v1/stats/?game_type=duels').status_code == 200
+        assert client.get('/api/v1/stats/?player=../etc').status_code == 400
+
+    def test_other_players_sync_keeps_validators(self, app, client):
+        self._sync(app, 'alice', 1)
+        self._sync(app, 'bob', 1)
+        url = '/api/v1/countries/fr/details/?game_type=duels&player=alice'
+        etag = client.get(url).headers['ETag']
+        self._sync(app, 'bob', 3)
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+        self._sync(app, 'alice', 3)
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+    def test_players_endpoint(self, app, client):
+        self._sync(app, 'bob', 1)
+        self._sync(app, 'alice', 1)
+        players = client.get('/api/v1/players/').get_json()['players']
+        assert [p['player_id'] for p in players] == ['alice', 'bob']
+
+    def test_shared_game_is_fetched_for_each_player(self, app):
+        from geodash.model import get_db
+        from geodash.sync import _mark_fetched
+        with app.app_context():
+            db = get_db()
+            _mark_fetched(db, 'alice', 'team_duels', ['g1'])
+            _mark_fetched(db, 'bob', 'team_duels', ['g1'])
+            rows = db.execute("SELECT player_id FROM fetched_games ORDER BY player_id").fetchall()
+        assert [r['player_id'] for r in rows] == ['alice', 'bob']
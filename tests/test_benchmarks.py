@@ -0,0 +1,55 @@
+"""Smoke tests for the benchmark harness."""
+import json
+
+from benchmarks import load, stats
+from benchmarks.history import processed_history
+
+
+class TestBenchmarks:
+    """Tests for the synthetic history and the stats benchmark."""
+
+    def test_history_is_deterministic(self):
+        first = processed_history('me', 5, 5, seed=3, missing_rate=0.2)
+        assert first == processed_history('me', 5, 5, seed=3, missing_rate=0.2)
+        assert [len(games) for games in first] == [5, 5]
+        assert first != processed_history('me', 5, 5, seed=4, missing_rate=0.2)
+
+    def test_run_saves_and_compares_results(self, tmp_path):
+        out = tmp_path / 'results.json'
+        assert stats.main(['--sizes', '3', '--repeat', '1', '--out', str(out)]) == 0
+        report = json.loads(out.read_text())
+        assert list(report['results']['3']) == list(stats.STAGES)
+        assert all('peak_mb' in stage for stage in report['results']['3'].values())
+
+        for stage in report['results']['3'].values():
+            stage['seconds'] /= 100
+        baseline = tmp_path / 'baseline.json'
+        baseline.write_text(json.dumps(report))
+        assert stats.main(['--sizes', '3', '--repeat', '1', '--no-memory', '--out', str(out),
+                           '--compare', str(baseline)]) == 1
+
+    def test_compare_ignores_noise(self):
+        baseline = {'1': {'a': {'seconds': 0.001}, 'b': {'seconds': 1.0}}}
+        results = {'1': {'a': {'seconds': 0.003}, 'b': {'seconds': 1.3}, 'c': {'seconds': 9}}}
+        assert stats.compare(baseline, results, 1.25) == [('1', 'b', 1.0, 1.3)]
+
+
+class TestLoad:
+    """Tests for the API load-test harness."""
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert [load.percentile(values, p) for p in (50, 95, 99)] == [50, 95, 99]
+        assert load.percentile([7], 99) == 7
+
+    def test_seeded_run_reports_every_endpoint(self, tmp_path, capsys):
+        out = tmp_path / 'load.json'
+        assert load.main(['--games', '3', '--clients', '3', '--requests', '60', '--seed', '1',
+                          '--revalidate', '--out', str(out)]) == 0
+        report = json.loads(out.read_text())
+        endpoints = report['endpoints']
+        assert endpoints['all']['requests'] == 60
+        assert sum(e['requests'] for name, e in endpoints.items() if name != 'all') == 60
+        assert {name.split('?')[0] for name in endpoints} <= {
+            'all', 'stats', 'countries', 'teammates', 'details'}
+        assert endpoints['all']['p50_ms'] <= endpoints['all']['p99_ms']
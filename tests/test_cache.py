@@ -0,0 +1,119 @@
+"""Tests for geodash.cache module."""
+import sqlite3
+
+import flask
+from geodash.cache import (
+    SCHEMA_VERSION, bump_generation, cache_get, cache_set, cached, dataset_fingerprint,
+    get_cache_db, make_key
+)
+from geodash.store import games_path
+from geoguessr.utils import save_json
+
+
+class TestDatasetFingerprint:
+    """Tests for dataset_fingerprint and bump_generation."""
+
+    def test_stable_without_changes(self, app):
+        with app.app_context():
+            assert dataset_fingerprint("me") == dataset_fingerprint("me")
+
+    def test_changes_when_game_store_written(self, app):
+        with app.app_context():
+            before = dataset_fingerprint("me")
+            path = games_path("team_duels", "me")
+            path.parent.mkdir(parents=True)
+            save_json(path, [{"gameId": "g1"}])
+            assert dataset_fingerprint("me") != before
+
+    def test_changes_on_bump(self, app):
+        with app.app_context():
+            before = dataset_fingerprint("me")
+            bump_generation("me")
+            assert dataset_fingerprint("me") != before
+
+
+class TestResultCache:
+    """Tests for cache_get, cache_set and cached."""
+
+    def test_make_key_ignores_param_order(self):
+        assert make_key("me", "ns", {"a": 1, "b": 2}) == make_key("me", "ns", {"b": 2, "a": 1})
+        assert make_key("me", "ns", {"a": 1}) != make_key("me", "other", {"a": 1})
+        assert make_key("me", "ns", {"a": 1}) != make_key("you", "ns", {"a": 1})
+
+    def test_roundtrip(self, app):
+        with app.app_context():
+            cache_set("me", "k", "gen1", {"value": [1, 2]})
+            assert cache_get("k", "gen1") == {"value": [1, 2]}
+
+    def test_other_generation_misses(self, app):
+        with app.app_context():
+            cache_set("me", "k", "gen1", {"value": 1})
+            assert cache_get("k", "gen2") is None
+
+    def test_size_bound_evicts_oldest(self, app):
+        saved = app.config['CACHE_MAX_BYTES']
+        app.config['CACHE_MAX_BYTES'] = 100
+        try:
+            with app.app_context():
+                cache_set("me", "old", "gen", "x" * 60)
+                cache_set("me", "new", "gen", "y" * 60)
+                assert cache_get("old", "gen") is None
+                assert cache_get("new", "gen") == "y" * 60
+        finally:
+            app.config['CACHE_MAX_BYTES'] = saved
+
+    def test_cached_computes_once_per_generation(self, app):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"count": len(calls)}
+
+        with app.app_context():
+            assert cached("me", "ns", {"p": 1}, compute) == {"count": 1}
+            assert cached("me", "ns", {"p": 1}, compute) == {"count": 1}
+            bump_generation("me")
+            assert cached("me", "ns", {"p": 1}, compute) == {"count": 2}
+
+    def test_sync_keeps_other_players_entries(self, app):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"count": len(calls)}
+
+        with app.app_context():
+            assert cached("you", "ns", {}, compute) == {"count": 1}
+            assert cached("me", "ns", {}, compute) == {"count": 2}
+            bump_generation("me")
+            assert cached("me", "ns", {}, compute) == {"count": 3}
+            assert cached("you", "ns", {}, compute) == {"count": 1}
+
+    def test_hits_refresh_lru_timestamp_rarely(self, app, monkeypatch):
+        def accessed_at():
+            return get_cache_db().execute(
+                "SELECT accessed_at FROM cache_entries WHERE key = 'k'").fetchone()[0]
+
+        with app.app_context():
+            cache_set("me", "k", "gen", 1)
+            stored = accessed_at()
+            assert cache_get("k", "gen") == 1
+            assert accessed_at() == stored
+            monkeypatch.setitem(app.config, 'CACHE_TOUCH_SECONDS', 0)
+            assert cache_get("k", "gen") == 1
+            assert accessed_at() > stored
+
+    def test_old_schema_is_rebuilt_once(self, app):
+        path = app.config['CACHE_FILENAME']
+        path.parent.mkdir(parents=True, exist_ok=True)
+        old = sqlite3.connect(str(path))
+        old.execute("CREATE TABLE cache_entries(key TEXT)")
+        old.execute("PRAGMA user_version = 1")
+        old.commit()
+        old.close()
+
+        with app.app_context():
+            cache_set("me", "k", "gen", 1)
+        with app.app_context():
+            assert cache_get("k", "gen") == 1
+            assert flask.g.cache_db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
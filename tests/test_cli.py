@@ -0,0 +1,60 @@
+"""Tests for the headless `geodash sync` command."""
+import json
+
+from geodash import cli
+from geodash.model import get_db
+from geoguessr.fetch_games import AuthenticationError
+
+
+def _run(capsys, *argv):
+    code = cli.main(['sync', *argv])
+    out, err = capsys.readouterr()
+    return code, json.loads(out) if out else None, err
+
+
+class TestSyncCommand:
+    """Tests for exit codes and the JSON summary."""
+
+    def test_success_prints_timing_summary(self, app, fake_sync, capsys):
+        code, summary, err = _run(capsys, '--player-id', 'me', '--ncfa', 'cookie')
+        assert code == cli.EXIT_OK
+        assert summary['status'] == 'complete'
+        assert summary['duels_fetched'] == 3
+        assert list(summary['phases']) == ['phase 1']
+        assert '[1/6]' in err
+        assert summary['elapsed_seconds'] >= 0
+        assert fake_sync['calls'] == ['me']
+
+    def test_credentials_from_environment(self, app, fake_sync, capsys, monkeypatch):
+        monkeypatch.setenv('GEODASH_PLAYER_ID', 'env-player')
+        monkeypatch.setenv('GEODASH_NCFA', 'cookie')
+        code, summary, _ = _run(capsys, '--quiet')
+        assert code == cli.EXIT_OK
+        assert summary['player_id'] == 'env-player'
+
+    def test_missing_credentials(self, app, capsys, monkeypatch):
+        monkeypatch.delenv('GEODASH_NCFA', raising=False)
+        code, summary, err = _run(capsys, '--player-id', 'me')
+        assert code == cli.EXIT_USAGE
+        assert summary is None and 'required' in err
+
+    def test_rejected_cookie(self, app, fake_sync, capsys):
+        fake_sync['error'] = AuthenticationError("401 Unauthorized")
+        code, summary, err = _run(capsys, '--player-id', 'me', '--ncfa', 'bad')
+        assert code == cli.EXIT_AUTH
+        assert summary['status'] == 'error' and summary['field'] == 'ncfa'
+
+    def test_busy_when_sync_already_running(self, app, fake_sync, capsys):
+        with app.app_context():
+            db = get_db()
+            db.execute("INSERT INTO sync_jobs (player_id, status) VALUES ('me', 'running')")
+            db.commit()
+        code, summary, _ = _run(capsys, '--player-id', 'me', '--ncfa', 'cookie')
+        assert code == cli.EXIT_BUSY
+        assert summary['status'] == 'busy'
+        assert fake_sync['calls'] == []
+
+    def test_missing_database(self, app, capsys, monkeypatch, tmp_path):
+        monkeypatch.setitem(app.config, 'DATABASE_FILENAME', tmp_path / 'missing.sqlite3')
+        code, _, err = _run(capsys, '--player-id', 'me', '--ncfa', 'cookie')
+        assert code == cli.EXIT_NO_DATABASE
@@ -0,0 +1,106 @@
+"""Tests for the fetch pipeline against the local GeoGuessr stand-in."""
+import pytest
+import requests
+
+import geodash
+from geodash.model import get_db
+from geoguessr import fetch_games
+from geoguessr.ratelimit import RateLimiter
+
+
+def _session(ncfa='cookie'):
+    return fetch_games.new_session(ncfa)
+
+
+def _feed_ids(mock, mode):
+    return {g['gameId']: g['competitive'] for g in mock.feed if g['gameMode'] == mode}
+
+
+class TestFeed:
+    """Tests for feed pagination, auth and retries."""
+
+    def test_pages_through_feed(self, mock_geoguessr):
+        duels = fetch_games.fetch_filtered_tokens(_session(), 'duels', wait=lambda: None)
+        team = fetch_games.fetch_filtered_tokens(_session(), 'team', wait=lambda: None)
+        assert duels == _feed_ids(mock_geoguessr, 'Duels')
+        assert team == _feed_ids(mock_geoguessr, 'TeamDuels')
+        assert len(mock_geoguessr.requests_to('/api/v4/feed')) == 2 * 3
+
+    def test_mode_filter(self, mock_geoguessr):
+        competitive = fetch_games.fetch_filtered_tokens(_session(), 'duels', 'competitive',
+                                                        wait=lambda: None)
+        assert set(competitive) == {gid for gid, c in _feed_ids(mock_geoguessr, 'Duels').items() if c}
+
+    def test_rejected_cookie(self, mock_geoguessr):
+        with pytest.raises(fetch_games.AuthenticationError):
+            fetch_games.fetch_filtered_tokens(_session('stale'), 'duels', wait=lambda: None)
+
+    def test_rate_limited_page_is_retried(self, mock_geoguessr):
+        mock_geoguessr.fail_next(429, count=2, path='/api/v4/feed')
+        duels = fetch_games.fetch_filtered_tokens(_session(), 'duels', wait=lambda: None)
+        assert duels == _feed_ids(mock_geoguessr, 'Duels')
+        assert mock_geoguessr.requests_to('/api/v4/feed')[:3] == [429, 429, 200]
+
+    def test_server_errors_retry_then_give_up(self, mock_geoguessr):
+        mock_geoguessr.fail_next(503, count=fetch_games.MAX_ATTEMPTS - 1, path='/api/v4/feed')
+        assert fetch_games.fetch_filtered_tokens(_session(), 'duels', wait=lambda: None)
+
+        mock_geoguessr.fail_next(503, count=fetch_games.MAX_ATTEMPTS, path='/api/v4/feed')
+        with pytest.raises(requests.exceptions.HTTPError):
+            fetch_games.fetch_filtered_tokens(_session(), 'duels', wait=lambda: None)
+
+
+class TestGames:
+    """Tests for game detail fetches."""
+
+    def test_fetches_duels_and_team_duels(self, mock_geoguessr):
+        duels = fetch_games.fetch_duels(_session(), _feed_ids(mock_geoguessr, 'Duels'), 'me',
+                                        progress=None, fetch=fetch_games.fetch_game)
+        team = fetch_games.fetch_team_duels(_session(), _feed_ids(mock_geoguessr, 'TeamDuels'), 'me',
+                                            progress=None, fetch=fetch_games.fetch_game)
+        assert len(duels) == len(team) == 6
+        assert all('me' in g['playerStats'] for g in team)
+        assert all(r['country'] for g in duels for r in g['roundStats'])
+
+    def test_transient_errors_are_retried(self, mock_geoguessr):
+        game_id = next(iter(mock_geoguessr.games))
+        mock_geoguessr.fail_next(503, path='/api/duels')
+        mock_geoguessr.fail_next(429, path='/api/duels')
+        assert fetch_games.fetch_game(_session(), game_id)['gameId'] == game_id
+        assert mock_geoguessr.requests_to('/api/duels') == [503, 429, 200]
+
+    def test_missing_game_is_not_retried(self, mock_geoguessr):
+        assert fetch_games.fetch_game(_session(), 'nope') is None
+        assert mock_geoguessr.requests_to('/api/duels') == [404]
+
+    def test_paced_requests_stay_under_server_limit(self, mock_geoguessr):
+        mock_geoguessr.rate_limit = 40
+        limiter = RateLimiter(30)
+
+        def fetch(session, game_id):
+            limiter.wait()
+            return fetch_games.fetch_game(session, game_id)
+
+        games = fetch_games.fetch_duels(_session(), _feed_ids(mock_geoguessr, 'Duels'), 'me',
+                                        progress=None, fetch=fetch)
+        assert len(games) == 6
+        assert 429 not in mock_geoguessr.requests_to('/api/duels')
+
+
+class TestSyncAgainstMock:
+    """Tests for a full sync run offline."""
+
+    def test_sync_then_resync_fetches_nothing_new(self, app, mock_geoguessr, monkeypatch):
+        monkeypatch.setattr(geodash.sync, '_limiter', RateLimiter(1000))
+        with app.app_context():
+            first = geodash.sync.run_sync('me', 'cookie', lambda event, data: None)
+            games_requested = len(mock_geoguessr.requests_to('/api/duels'))
+            second = geodash.sync.run_sync('me', 'cookie', lambda event, data: None)
+            names = {row['player_id']: row['username']
+                     for row in get_db().execute("SELECT * FROM player_names")}
+
+        assert (first['duels_fetched'], first['team_duels_fetched']) == (6, 6)
+        assert (second['duels_fetched'], second['duels_total']) == (0, 6)
+        assert games_requested == 12
+        assert len(mock_geoguessr.requests_to('/api/duels')) == 12
+        assert names['me'] == 'Me'
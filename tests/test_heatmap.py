@@ -0,0 +1,79 @@
+"""Tests for geoguessr.heatmap module."""
+from geoguessr.heatmap import (
+    auto_resolution, bin_points, build_tile_index, cell_center, decode_delta,
+    encode_bins, query_tile, tile_coords
+)
+
+
+class TestBinPoints:
+    """Tests for bin_points and auto_resolution."""
+
+    def test_nearby_points_share_a_cell(self):
+        bins = bin_points([(48.81, 2.31), (48.82, 2.32), (10.0, 10.0)], 1.0)
+        assert sorted(bins.values()) == [1, 2]
+
+    def test_weights_sum_to_point_count(self):
+        points = [(i * 0.37 % 80, i * 1.3 % 170) for i in range(500)]
+        assert sum(bin_points(points, 5.0).values()) == 500
+
+    def test_auto_resolution_bounds_bins(self):
+        points = [(i * 0.01, i * 0.02) for i in range(5000)]
+        resolution = auto_resolution(points, 100)
+        assert len(bin_points(points, resolution)) <= 100
+
+    def test_cell_center_inside_cell(self):
+        lat, lng = cell_center(*next(iter(bin_points([(48.8, 2.3)], 0.5))), 0.5)
+        assert abs(lat - 48.8) <= 0.25
+        assert abs(lng - 2.3) <= 0.25
+
+
+class TestEncodeBins:
+    """Tests for encode_bins."""
+
+    def test_points_encoding(self):
+        bins = bin_points([(0.1, 0.1), (0.2, 0.2)], 1.0)
+        assert encode_bins(bins, 1.0) == [{"lat": 0.5, "lng": 0.5, "weight": 2}]
+
+    def test_flat_encoding(self):
+        bins = bin_points([(0.1, 0.1), (1.1, 1.1)], 1.0)
+        assert encode_bins(bins, 1.0, "flat") == [0.5, 0.5, 1, 1.5, 1.5, 1]
+
+    def test_delta_roundtrip(self):
+        points = [(i * 0.7 % 60, -i * 1.1 % 120) for i in range(300)]
+        bins = bin_points(points, 2.0)
+        encoded = encode_bins(bins, 2.0, "delta")
+        assert all(isinstance(v, int) for v in encoded)
+        assert decode_delta(encoded) == dict(bins)
+
+
+class TestTiles:
+    """Tests for the quadtree tile index."""
+
+    POINTS = [(48.85, 2.35), (48.86, 2.34), (40.71, -74.0), (-33.87, 151.21)]
+
+    def test_tile_coords_at_zoom_zero(self):
+        assert tile_coords(48.85, 2.35, 0) == (0, 0)
+
+    def test_tile_coords_quadrants(self):
+        assert tile_coords(48.85, 2.35, 1) == (1, 0)
+        assert tile_coords(-33.87, 151.21, 1) == (1, 1)
+        assert tile_coords(40.71, -74.0, 1) == (0, 0)
+
+    def test_world_tile_contains_everything(self):
+        index = build_tile_index(self.POINTS)
+        cells = query_tile(index, 0, 0, 0, detail=0)
+        assert cells[0][2] == 4
+
+    def test_tile_only_returns_its_points(self):
+        index = build_tile_index(self.POINTS)
+        x, y = tile_coords(48.85, 2.35, 8)
+        cells = query_tile(index, 8, x, y, detail=3)
+        assert sum(w for _, _, w in cells) == 2
+        for lat, lng, _ in cells:
+            assert tile_coords(lat, lng, 8) == (x, y)
+
+    def test_detail_bounds_cell_count(self):
+        points = [(i * 0.13 % 80, i * 0.71 % 170) for i in range(2000)]
+        cells = query_tile(build_tile_index(points), 0, 0, 0, detail=2)
+        assert len(cells) <= 16
+        assert sum(w for _, _, w in cells) == 2000
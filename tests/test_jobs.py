@@ -0,0 +1,128 @@
+"""Tests for background sync jobs and the sync API."""
+import time
+
+from geodash.jobs import get_job
+from geodash.model import get_db
+from geoguessr.fetch_games import InvalidPlayerIdError
+
+
+def _wait(client, job_id):
+    """Poll a job until it finishes and return it."""
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = client.get(f'/api/v1/sync/{job_id}/').get_json()['job']
+        if job['status'] in ('complete', 'error'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("sync job did not finish")
+
+
+def _start(client, player_id='me'):
+    return client.post('/api/v1/sync/', json={'playerId': player_id, 'ncfa': 'cookie'})
+
+
+class TestSyncJobs:
+    """Tests for job lifecycle, de-duplication and event streams."""
+
+    def test_job_runs_in_background(self, client, fake_sync):
+        resp = _start(client)
+        assert resp.status_code == 202
+        job = resp.get_json()['job']
+        assert job['status'] in ('queued', 'running')
+
+        done = _wait(client, job['id'])
+        assert done['status'] == 'complete'
+        assert done['result'] == {"success": True, "duels_fetched": 3}
+
+    def test_concurrent_requests_join_active_job(self, client, fake_sync):
+        fake_sync['release'].clear()
+        first = _start(client).get_json()['job']
+        second = _start(client)
+        assert second.status_code == 200
+        assert second.get_json()['job']['id'] == first['id']
+
+        other = _start(client, 'someone-else')
+        assert other.status_code == 202
+
+        fake_sync['release'].set()
+        _wait(client, first['id'])
+        _wait(client, other.get_json()['job']['id'])
+        assert sorted(fake_sync['calls']) == ['me', 'someone-else']
+        assert _start(client).status_code == 202
+
+    def test_event_stream_replays_and_resumes(self, client, fake_sync):
+        job_id = _start(client).get_json()['job']['id']
+        _wait(client, job_id)
+
+        body = client.get(f'/api/v1/sync/{job_id}/events/').get_data(as_text=True)
+        assert body.count('event: phase') == 2
+        assert body.endswith('id: 3\nevent: complete\ndata: {"success":true,"duels_fetched":3}\n\n')
+
+        resumed = client.get(f'/api/v1/sync/{job_id}/events/', headers={'Last-Event-ID': '2'})
+        assert resumed.get_data(as_text=True).startswith('id: 3\nevent: complete')
+
+    def test_failure_reports_user_facing_error(self, client, fake_sync):
+        fake_sync['error'] = InvalidPlayerIdError("mismatch")
+        job = _wait(client, _start(client).get_json()['job']['id'])
+        assert job['status'] == 'error'
+        assert job['result']['field'] == 'playerId'
+
+    def test_stale_job_is_expired(self, app, client, fake_sync):
+        with app.app_context():
+            db = get_db()
+            db.execute(
+                """INSERT INTO sync_jobs (player_id, status, updated_at)
+                   VALUES ('me', 'running', datetime('now', '-1 hour'))"""
+            )
+            db.commit()
+        resp = _start(client)
+        assert resp.status_code == 202
+        stale = client.get('/api/v1/sync/1/').get_json()['job']
+        assert stale['status'] == 'error'
+        _wait(client, resp.get_json()['job']['id'])
+
+    def test_heartbeat_keeps_quiet_job_alive(self, app, client, fake_sync, monkeypatch):
+        monkeypatch.setitem(app.config, 'SYNC_JOB_HEARTBEAT_SECONDS', 0.01)
+        fake_sync['release'].clear()
+        job_id = _start(client).get_json()['job']['id']
+        with app.app_context():
+            db = get_db()
+            deadline = time.monotonic() + 5
+            while get_job(db, job_id)['status'] != 'running' and time.monotonic() < deadline:
+                time.sleep(0.01)
+            with db:
+                db.execute("UPDATE sync_jobs SET updated_at = datetime('now', '-1 hour')")
+            time.sleep(0.2)
+            stale = db.execute(
+                "SELECT COUNT(*) FROM sync_jobs WHERE updated_at < datetime('now', '-300 seconds')"
+            ).fetchone()[0]
+        fake_sync['release'].set()
+        assert stale == 0
+        assert _wait(client, job_id)['status'] == 'complete'
+
+    def test_finished_jobs_are_pruned(self, app, client, fake_sync, monkeypatch):
+        monkeypatch.setitem(app.config, 'SYNC_JOB_RETENTION', 1)
+        first = _start(client).get_json()['job']['id']
+        _wait(client, first)
+        second = _start(client).get_json()['job']['id']
+        _wait(client, second)
+        assert client.get(f'/api/v1/sync/{first}/').status_code == 404
+        assert client.get(f'/api/v1/sync/{first}/events/').status_code == 404
+
+    def test_validation(self, client):
+        assert client.post('/api/v1/sync/', json={'ncfa': 'x'}).status_code == 400
+        assert client.post('/api/v1/sync/', json={'playerId': 'x'}).status_code == 400
+        assert client.post('/api/v1/sync/', json={'playerId': '../x', 'ncfa': 'x'}).status_code == 400
+        assert client.get('/api/v1/sync/99/').status_code == 404
+
+
+class TestLegacySyncEndpoints:
+    """The original fetch endpoints now run through the job runner."""
+
+    def test_fetch_all_waits_for_job(self, client, fake_sync):
+        resp = client.post('/api/v1/fetch-all/', json={'playerId': 'me', 'ncfa': 'cookie'})
+        assert resp.get_json() == {"success": True, "duels_fetched": 3}
+
+    def test_fetch_all_stream_follows_job(self, client, fake_sync):
+        body = client.get('/api/v1/fetch-all-stream/?playerId=me&ncfa=cookie').get_data(as_text=True)
+        assert 'event: complete' in body
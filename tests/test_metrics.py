@@ -0,0 +1,89 @@
+"""Tests for the metrics registry and the /metrics endpoint."""
+from geoguessr import fetch_games, metrics
+from geoguessr.utils import GEOCODER_CALLS, GEOCODER_POINTS, geocoding
+from geodash.api.metrics import REQUEST_SECONDS, RESPONSES
+from geodash.cache import CACHE_LOOKUPS, cached
+
+
+class TestRegistry:
+    """Tests for counters, histograms and the text format."""
+
+    def test_counter_and_histogram_render(self):
+        counter = metrics.Counter('test_things_total', "Things.", ['kind'])
+        histogram = metrics.Histogram('test_wait_seconds', "Waits.", buckets=(0.1, 1))
+        try:
+            counter.inc(kind='a')
+            counter.inc(2, kind='a "quoted"')
+            for value in (0.05, 0.5, 5):
+                histogram.observe(value)
+            text = metrics.render()
+        finally:
+            metrics._registry.remove(counter)
+            metrics._registry.remove(histogram)
+
+        assert '# TYPE test_things_total counter' in text
+        assert 'test_things_total{kind="a"} 1' in text
+        assert 'test_things_total{kind="a \\"quoted\\""} 2' in text
+        assert 'test_wait_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_wait_seconds_bucket{le="1"} 2' in text
+        assert 'test_wait_seconds_bucket{le="+Inf"} 3' in text
+        assert 'test_wait_seconds_sum 5.55' in text
+        assert 'test_wait_seconds_count 3' in text
+
+    def test_geocoding_counts_calls_and_points(self):
+        calls, points = GEOCODER_CALLS.value(), GEOCODER_POINTS.value()
+        with geocoding(7):
+            pass
+        assert (GEOCODER_CALLS.value() - calls, GEOCODER_POINTS.value() - points) == (1, 7)
+
+
+class TestEndpoint:
+    """Tests for serving metrics and request instrumentation."""
+
+    def test_requests_are_recorded(self, client):
+        before = RESPONSES.value(endpoint='/api/v1/players/', status=200)
+        count = REQUEST_SECONDS.count(endpoint='/api/v1/players/', method='GET')
+        client.get('/api/v1/players/')
+        resp = client.get('/metrics')
+        assert resp.status_code == 200
+        assert resp.mimetype == 'text/plain'
+        assert RESPONSES.value(endpoint='/api/v1/players/', status=200) == before + 1
+        assert REQUEST_SECONDS.count(endpoint='/api/v1/players/', method='GET') == count + 1
+        assert 'geodash_http_request_seconds_bucket{endpoint="/api/v1/players/"' in resp.get_data(True)
+
+    def test_remote_clients_and_disabled(self, app, client, monkeypatch):
+        assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 404
+        monkeypatch.setitem(app.config, 'METRICS_ENABLED', False)
+        assert client.get('/metrics').status_code == 404
+
+    def test_cache_hits_and_misses(self, app):
+        with app.app_context():
+            misses = CACHE_LOOKUPS.value(namespace='test', result='miss')
+            hits = CACHE_LOOKUPS.value(namespace='test', result='hit')
+            for _ in range(3):
+                cached('me', 'test', {}, lambda: {'value': 1})
+        assert CACHE_LOOKUPS.value(namespace='test', result='miss') == misses + 1
+        assert CACHE_LOOKUPS.value(namespace='test', result='hit') == hits + 2
+
+
+class TestFetchMetrics:
+    """Tests for fetch instrumentation against the GeoGuessr stand-in."""
+
+    def test_feed_pages_and_rate_limits(self, mock_geoguessr):
+        pages = fetch_games.FEED_PAGES.value(status=200)
+        limited = fetch_games.RATE_LIMITED.value(api='feed')
+        mock_geoguessr.fail_next(429, path='/api/v4/feed')
+        fetch_games.fetch_filtered_tokens(fetch_games.new_session('cookie'), 'duels',
+                                          wait=lambda: None)
+        assert fetch_games.FEED_PAGES.value(status=200) == pages + 3
+        assert fetch_games.RATE_LIMITED.value(api='feed') == limited + 1
+
+    def test_game_fetches(self, mock_geoguessr):
+        ok = fetch_games.GAME_FETCHES.value(status=200)
+        failed = fetch_games.GAME_FETCHES.value(status=503)
+        waits = fetch_games.RETRY_WAIT_SECONDS.count(api='game')
+        mock_geoguessr.fail_next(503, path='/api/duels')
+        fetch_games.fetch_game(fetch_games.new_session('cookie'), next(iter(mock_geoguessr.games)))
+        assert fetch_games.GAME_FETCHES.value(status=200) == ok + 1
+        assert fetch_games.GAME_FETCHES.value(status=503) == failed + 1
+        assert fetch_games.RETRY_WAIT_SECONDS.count(api='game') == waits + 1
@@ -0,0 +1,44 @@
+"""Tests for geodash.model module."""
+import sqlite3
+import pytest
+
+from geodash.model import get_db
+
+
+class TestGetDb:
+    """Tests for connection setup and pooling."""
+
+    def test_write_connection_uses_wal(self, app):
+        with app.app_context():
+            mode = get_db().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == 'wal'
+
+    def test_rows_support_key_access(self, app):
+        with app.app_context():
+            row = get_db(readonly=True).execute("SELECT 1 AS one").fetchone()
+        assert row['one'] == 1
+        assert dict(row) == {'one': 1}
+
+    def test_readonly_connection_rejects_writes(self, app):
+        with app.app_context():
+            db = get_db(readonly=True)
+            with pytest.raises(sqlite3.OperationalError):
+                db.execute("INSERT INTO player_names (player_id, username) VALUES ('a', 'b')")
+
+    def test_connection_reused_across_requests(self, app):
+        with app.app_context():
+            first = get_db(readonly=True)
+        with app.app_context():
+            second = get_db(readonly=True)
+        assert first is second
+
+    def test_reader_not_blocked_by_open_write(self, app):
+        with app.app_context():
+            writer = get_db()
+            writer.execute("INSERT INTO player_names (player_id, username) VALUES ('a', 'b')")
+            reader = sqlite3.connect(f"file:{app.config['DATABASE_FILENAME']}?mode=ro", uri=True)
+            assert reader.execute("SELECT COUNT(*) FROM player_names").fetchone()[0] == 0
+            reader.close()
+        with app.app_context():
+            count = get_db(readonly=True).execute("SELECT COUNT(*) FROM player_names").fetchone()[0]
+        assert count == 1
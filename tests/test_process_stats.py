@@ -187,8 +187,11 @@ class TestProcessGames:
         # Create game with 3 players (invalid)
         game = make_team_game()
         game["playerStats"]["player3"] = {"rounds": []}
+        # And one with a single player
+        solo = make_team_game()
+        del solo["playerStats"]["player2"]
 
-        result = process_games([game])
+        result = process_games([game, solo])
 
         assert result["overall"]["total_games"] == 0
 
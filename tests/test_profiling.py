@@ -0,0 +1,88 @@
+"""Tests for on-demand request, sync and stats profiling."""
+import json
+
+import pytest
+
+from benchmarks.history import processed_history, write_store
+from geodash import cli, profiling
+
+
+@pytest.fixture
+def profiled(app, monkeypatch):
+    """Enable profiling and return the directory profiles are saved in."""
+    monkeypatch.setitem(app.config, 'PROFILING_ENABLED', True)
+    return app.config['PROFILE_DIR']
+
+
+def _summary(path):
+    return json.loads(path.with_name(path.name + '.json').read_text())
+
+
+class TestRequestProfiling:
+    """Tests for ?profile=1 on API requests."""
+
+    def test_profiled_request(self, profiled, client):
+        resp = client.get('/api/v1/teammates/?profile=1')
+        name = resp.headers['X-Geodash-Profile']
+        assert 'sql;desc=' in resp.headers['Server-Timing']
+        assert 'app;dur=' in resp.headers['Server-Timing']
+        assert (profiled / f"{name}.prof").exists()
+
+        summary = _summary(profiled / name)
+        assert summary['label'] == 'GET-api-v1-teammates'
+        assert summary['top_functions']
+        assert summary['sql']['statements'] >= 1
+
+    def test_header_requests_profile(self, profiled, client):
+        resp = client.get('/api/v1/teammates/', headers={'X-Geodash-Profile': '1'})
+        assert 'X-Geodash-Profile' in resp.headers
+
+    def test_not_profiled_unless_asked(self, profiled, client):
+        resp = client.get('/api/v1/teammates/')
+        assert 'Server-Timing' not in resp.headers
+        assert not profiled.exists()
+
+    def test_disabled(self, app, client):
+        resp = client.get('/api/v1/teammates/?profile=1')
+        assert 'X-Geodash-Profile' not in resp.headers
+        assert not app.config['PROFILE_DIR'].exists()
+
+    def test_remote_client_not_profiled(self, profiled, client):
+        resp = client.get('/api/v1/teammates/?profile=1',
+                          environ_base={'REMOTE_ADDR': '203.0.113.9'})
+        assert resp.status_code == 200
+        assert 'X-Geodash-Profile' not in resp.headers
+
+    def test_one_profile_at_a_time(self, profiled, app):
+        with app.app_context(), profiling.Profile('outer'):
+            with pytest.raises(RuntimeError):
+                profiling.Profile('inner').__enter__()
+        assert profiling.active() is None
+
+
+class TestCommandProfiling:
+    """Tests for `geodash sync --profile` and `geodash profile`."""
+
+    def test_sync_profiles_each_phase(self, app, fake_sync, capsys):
+        code = cli.main(['sync', '--player-id', 'me', '--ncfa', 'cookie', '--quiet', '--profile'])
+        summary = json.loads(capsys.readouterr().out)
+        assert code == cli.EXIT_OK
+        assert len(summary['profiles']) == 1
+        assert summary['profiles'][0].endswith('sync-me-phase1')
+        assert _summary(app.config['PROFILE_DIR'] / summary['profiles'][0])['seconds'] >= 0
+
+    def test_profile_stored_games(self, app, capsys):
+        duels, team_duels = processed_history('me', 4, 4, seed=2)
+        with app.app_context():
+            write_store('me', duels, team_duels)
+        code = cli.main(['profile', '--player-id', 'me', '--game-type', 'duels'])
+        summary = json.loads(capsys.readouterr().out.splitlines()[-1])
+        assert code == cli.EXIT_OK
+        assert summary['games'] == 4
+        functions = _summary(app.config['PROFILE_DIR'] / summary['profile'])['top_functions']
+        assert any('process_duels' in f['function'] for f in functions)
+
+    def test_profile_without_store(self, app, capsys):
+        code = cli.main(['profile', '--player-id', 'me'])
+        assert code == cli.EXIT_FAILED
+        assert 'no stored team_duels games' in capsys.readouterr().err
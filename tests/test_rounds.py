@@ -0,0 +1,205 @@
+"""Tests for geodash.rounds module."""
+import pytest
+
+from geodash.model import get_db
+from geodash.rounds import (
+    aggregate_countries, aggregate_overall, aggregate_players,
+    insert_round_rows, new_round_rows
+)
+from geoguessr.process_stats import process_duels, process_games
+from geoguessr.utils import GEOCODER_CALLS, GEOCODER_POINTS
+from .test_process_stats import make_duel_game, make_team_game
+
+PARIS = {"lat": 48.85, "lng": 2.35}
+BERLIN = {"lat": 52.52, "lng": 13.40}
+
+
+def _team_games():
+    """Three team games across two teammates, two countries and both modes.
+
+    The last game ends with a 5k in a round with no country.
+    """
+    games = []
+    specs = [
+        ("mate1", True, -3000, 500, [
+            ("fr", 5000, 10, PARIS, 4000, 300, BERLIN, 4200),
+            ("de", 3000, 900, PARIS, 4800, 50, BERLIN, 4900),
+        ]),
+        ("mate1", False, -6000, 200, [
+            ("fr", 2000, 2000, BERLIN, 2500, 1500, PARIS, 3000),
+        ]),
+        ("mate2", False, -1000, -100, [
+            ("de", 5000, 0, BERLIN, 5000, 0, BERLIN, 4000),
+            ("fr", 100, 8000, BERLIN, 4400, 200, PARIS, 4500),
+            (None, 5000, 0, PARIS, 3000, 900, BERLIN, 2000),
+        ]),
+    ]
+    for i, (mate, competitive, health, diff, rounds) in enumerate(specs):
+        rounds_data = [
+            {
+                "roundNumber": rn,
+                "country": country,
+                "p1": {"score": s1, "distance": d1, "time": 10.0 + rn, **g1},
+                "p2": {"score": s2, "distance": d2, "time": None, **g2},
+                "enemyBestScore": enemy,
+            }
+            for rn, (country, s1, d1, g1, s2, d2, g2, enemy) in enumerate(rounds, 1)
+        ]
+        game = make_team_game("me", mate, rounds_data, health, diff)
+        game["gameId"] = f"team-{i}"
+        game["isCompetitive"] = competitive
+        games.append(game)
+    return games
+
+
+def _duel_games():
+    """Two duels, one with a missed round."""
+    first = make_duel_game([
+        {"roundNumber": 1, "score": 5000, "distance": 5, "time": 8.0, "country": "fr",
+         "enemyScore": 4000, "totalHealthChange": 0, **PARIS},
+        {"roundNumber": 2, "score": 1000, "distance": 3000, "time": 30.0, "country": "de",
+         "enemyScore": 4500, "totalHealthChange": -3500, **PARIS},
+    ], total_score=6000)
+    first["gameId"] = "duel-0"
+    second = make_duel_game([
+        {"roundNumber": 1, "score": 4000, "distance": 200, "time": 12.0, "country": "de",
+         "enemyScore": 4100, "totalHealthChange": -100, **BERLIN},
+    ], total_score=4000)
+    second["gameId"] = "duel-1"
+    second["isCompetitive"] = True
+    # Round 2 was never guessed
+    second["roundStats"].append(
+        {"roundNumber": 2, "enemyScore": 3000, "totalHealthChange": -6000, "country": "FR"})
+    return [first, second]
+
+
+def _ingest(db, game_type, games):
+    with db:
+        insert_round_rows(db, new_round_rows(db, game_type, games, "me"))
+
+
+def _by_country(rows):
+    return {row["country_code"]: row for row in rows}
+
+
+class TestIngest:
+    """Tests for flattening games into the round store."""
+
+    def test_ingest_is_incremental(self, app):
+        with app.app_context():
+            db = get_db()
+            _ingest(db, "team_duels", _team_games())
+            again = new_round_rows(db, "team_duels", _team_games(), "me")
+            assert again["games"] == []
+            assert db.execute("SELECT COUNT(*) FROM player_rounds").fetchone()[0] == 12
+
+    def test_guess_geocoding_is_measured(self, app):
+        calls, points = GEOCODER_CALLS.value(), GEOCODER_POINTS.value()
+        with app.app_context():
+            new_round_rows(get_db(), "team_duels", _team_games(), "me")
+        assert GEOCODER_CALLS.value() - calls == 1
+        assert GEOCODER_POINTS.value() - points == 2
+
+    def test_skips_non_two_player_games(self, app):
+        game = make_team_game()
+        game["playerStats"]["third"] = {"rounds": []}
+        with app.app_context():
+            rows = new_round_rows(get_db(), "team_duels", [game], "me")
+        assert rows["games"] == []
+
+    def test_missed_duel_round_has_no_guess(self, app):
+        with app.app_context():
+            db = get_db()
+            _ingest(db, "duels", _duel_games())
+            row = db.execute(
+                """SELECT score, country_code, guess_country FROM game_rounds gr
+                   JOIN player_rounds pr USING (owner_id, game_id, round_number)
+                   WHERE game_id = 'duel-1' AND round_number = 2"""
+            ).fetchone()
+        assert tuple(row) == (0, "fr", None)
+
+
+class TestAggregation:
+    """SQL aggregates must match the Python stats pipeline."""
+
+    @pytest.mark.parametrize("mode", ["all", "competitive", "casual"])
+    def test_team_matches_process_games(self, app, mode):
+        games = _team_games()
+        if mode != "all":
+            games = [g for g in games if g["isCompetitive"] == (mode == "competitive")]
+        expected = process_games(games)
+
+        with app.app_context():
+            db = get_db()
+            _ingest(db, "team_duels", _team_games())
+            overall = aggregate_overall(db, "me", "team_duels", mode)
+            players = {p["player_id"]: p for p in aggregate_players(db, "me", "team_duels", mode)}
+            countries = aggregate_countries(db, "me", "team_duels", mode)
+
+        exp = expected["overall"]
+        assert overall["total_games"] == exp["total_games"]
+        assert overall["win_percentage"] == pytest.approx(exp["win_percentage"])
+        assert overall["avg_rounds_per_game"] == pytest.approx(exp["avg_rounds_per_game"])
+        assert overall["multi_merchant"] == exp["merchant_stats"]["multi_merchant"]
+        assert overall["reverse_merchant"] == exp["merchant_stats"]["reverse_merchant"]
+        for pid, contrib in exp["player_contribution_percent"].items():
+            assert players[pid]["contribution_percent"] == pytest.approx(contrib)
+        for pid, score in exp["avg_individual_score"].items():
+            assert players[pid]["avg_individual_score"] == pytest.approx(score)
+            assert players[pid]["games_played"] == exp["games_per_player"][pid]
+            assert players[pid]["total_5ks"] == exp["player_total_5ks"].get(pid, 0)
+
+        assert [c["country_code"] for c in countries] == [c for c, _ in expected["countries"]]
+        got = _by_country(countries)
+        for code, cstats in expected["countries"]:
+            assert got[code]["rounds"] == cstats["rounds"]
+            assert got[code]["avg_score"] == pytest.approx(cstats["avg_team_score"])
+            assert got[code]["avg_distance_km"] == pytest.approx(cstats["avg_team_distance_km"])
+            assert got[code]["five_k_rate"] == pytest.approx(cstats["5k_rate"])
+            assert got[code]["avg_score_diff"] == pytest.approx(cstats["avg_score_diff"])
+            assert got[code]["hit_rate"] == pytest.approx(cstats["hit_rate"])
+            assert got[code]["win_rate"] == pytest.approx(cstats["win_rate"])
+
+    def test_duels_match_process_duels(self, app):
+        expected = process_duels(_duel_games())
+        with app.app_context():
+            db = get_db()
+            _ingest(db, "duels", _duel_games())
+            overall = aggregate_overall(db, "me", "duels")
+            (player,) = aggregate_players(db, "me", "duels")
+            got = _by_country(aggregate_countries(db, "me", "duels"))
+
+        exp = expected["overall"]
+        assert overall["total_games"] == exp["total_games"]
+        assert overall["win_percentage"] == pytest.approx(exp["win_percentage"])
+        assert player["avg_individual_score"] == pytest.approx(exp["avg_score"])
+        assert player["total_5ks"] == exp["total_5ks"]
+        assert player["avg_guess_time"] == pytest.approx(exp["avg_guess_time"])
+        for code, cstats in expected["countries"]:
+            assert got[code]["rounds"] == cstats["rounds"]
+            assert got[code]["avg_score"] == pytest.approx(cstats["avg_score"])
+            assert got[code]["avg_distance_km"] == pytest.approx(cstats["avg_distance_km"])
+            assert got[code]["hit_rate"] == pytest.approx(cstats["hit_rate"])
+            assert got[code]["win_rate"] == pytest.approx(cstats["win_rate"])
+
+    def test_teammate_filter(self, app):
+        expected = process_games([g for g in _team_games() if "mate2" in g["playerStats"]])
+        with app.app_context():
+            db = get_db()
+            _ingest(db, "team_duels", _team_games())
+            overall = aggregate_overall(db, "me", "team_duels", teammate="mate2")
+            countries = aggregate_countries(db, "me", "team_duels", teammate="mate2")
+        assert overall["total_games"] == expected["overall"]["total_games"] == 1
+        assert sorted(c["country_code"] for c in countries) == ["de", "fr"]
+
+    def test_overall_uses_covering_index(self, app):
+        with app.app_context():
+            plan = get_db(readonly=True).execute(
+                """EXPLAIN QUERY PLAN SELECT COUNT(*), AVG(won), AVG(num_rounds),
+                          SUM(multi_merchant), SUM(reverse_merchant)
+                   FROM games g
+                   WHERE g.owner_id = ? AND g.game_type = ? AND g.is_competitive = 1""",
+                ("me", "team_duels")
+            ).fetchall()
+        detail = " ".join(row["detail"] for row in plan)
+        assert "COVERING INDEX games_filter_idx" in detail
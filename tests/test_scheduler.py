@@ -0,0 +1,172 @@
+"""Tests for the multi-account sync scheduler."""
+import json
+import threading
+import time
+import pytest
+
+from geodash import cli, scheduler
+from geodash.model import get_db
+from geodash.sync import _game_fetcher, _record_sync
+from geoguessr.fetch_games import fetch_team_duels
+
+
+def _raw_team_game(game_id):
+    """A minimal 2v2 game server response with one round."""
+    def player(pid, score):
+        return {"playerId": pid, "guesses": [{
+            "roundNumber": 1, "distance": 1000.0, "score": score, "lat": 1.0, "lng": 2.0,
+            "created": "2024-01-01T00:00:30Z"
+        }]}
+    return {
+        "gameId": game_id,
+        "rounds": [{"startTime": "2024-01-01T00:00:00Z",
+                    "panorama": {"countryCode": "fr", "lat": 1.5, "lng": 2.5}}],
+        "teams": [
+            {"id": "red", "players": [player("alice", 4000), player("bob", 3000)],
+             "roundResults": [{"roundNumber": 1, "healthBefore": 6000, "healthAfter": 6000}]},
+            {"id": "blue", "players": [player("carol", 2000), player("dave", 1000)],
+             "roundResults": [{"roundNumber": 1, "healthBefore": 6000, "healthAfter": 5000}]},
+        ],
+    }
+
+
+class _GameServer:
+    """Fake session serving raw games and counting requests."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def get(self, url, timeout=None):
+        self.requests += 1
+        game_id = url.rsplit('/', 1)[-1]
+        return type('Response', (), {'status_code': 200, 'json': lambda self: _raw_team_game(game_id)})()
+
+
+def _accounts(*player_ids):
+    return [{'playerId': pid, 'ncfa': 'cookie'} for pid in player_ids]
+
+
+class TestGameCache:
+    """Tests for single-flight sharing of raw games."""
+
+    def test_concurrent_requests_load_once(self):
+        cache = scheduler.GameCache()
+        loads = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.05)
+            return {'gameId': 'g'}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get('g', load)))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(loads) == 1
+        assert results == [{'gameId': 'g'}] * 5
+        assert (cache.misses, cache.hits) == (1, 4)
+
+    def test_load_errors_reach_every_caller(self):
+        cache = scheduler.GameCache()
+        with pytest.raises(ConnectionError):
+            cache.get('g', lambda: (_ for _ in ()).throw(ConnectionError()))
+        with pytest.raises(ConnectionError):
+            cache.get('g', lambda: {'gameId': 'g'})
+
+    def test_tracked_opponents_share_one_request(self, app):
+        server = _GameServer()
+        cache = scheduler.GameCache(tracked={'alice', 'carol'})
+        with app.app_context():
+            fetch = _game_fetcher(cache)
+            alice = fetch_team_duels(server, ['g1'], 'alice', progress=None, fetch=fetch)
+            carol = fetch_team_duels(server, ['g1'], 'carol', progress=None, fetch=fetch)
+        assert server.requests == 1
+        assert alice[0]['teamId'] == 'red' and carol[0]['teamId'] == 'blue'
+        assert alice[0]['teamStats']['scoreDiff'] == -carol[0]['teamStats']['scoreDiff']
+        assert len(cache) == 0
+
+    def test_games_are_dropped_after_last_tracked_use(self):
+        cache = scheduler.GameCache(tracked={'alice', 'bob', 'zed'})
+        cache.get('g', lambda: _raw_team_game('g'))
+        assert len(cache) == 1
+        cache.get('g', lambda: _raw_team_game('g'))
+        assert len(cache) == 0
+        cache.get('g', lambda: _raw_team_game('g'))
+        assert (cache.misses, cache.hits) == (2, 1)
+
+    def test_size_bound_evicts_least_recently_used(self):
+        cache = scheduler.GameCache(max_size=2)
+        for game_id in ('a', 'b', 'a', 'c'):
+            cache.get(game_id, lambda: {'gameId': game_id})
+        assert len(cache) == 2
+        cache.get('a', lambda: {'gameId': 'a'})
+        assert (cache.misses, cache.hits) == (3, 2)
+
+
+class TestPriority:
+    """Tests for staleness and activity ordering."""
+
+    def _history(self, app, rows):
+        with app.app_context():
+            db = get_db()
+            db.executemany(
+                """INSERT INTO sync_accounts (player_id, last_synced_at, games_per_hour, last_duration)
+                   VALUES (?, datetime('now', ?), ?, ?)""",
+                rows
+            )
+            db.commit()
+
+    def test_never_synced_then_expected_backlog(self, app):
+        self._history(app, [
+            ('idle-old', '-48 hours', 0, 10),     # 48 h * 0.1 floor = 4.8
+            ('busy-recent', '-2 hours', 5, 30),   # 2 h * 5 = 10
+            ('busy-old', '-10 hours', 5, 60),     # 50
+        ])
+        accounts = _accounts('idle-old', 'busy-recent', 'new', 'busy-old')
+        with app.app_context():
+            queue = scheduler.prioritise(get_db(), accounts)
+        assert [a['playerId'] for a, _ in queue] == ['new', 'busy-old', 'busy-recent', 'idle-old']
+        assert [d for _, d in queue] == [None, 60, 30, 10]
+
+    def test_record_sync_measures_activity(self, app):
+        self._history(app, [('me', '-2 hours', 0, 5)])
+        with app.app_context():
+            db = get_db()
+            _record_sync(db, 'me', 10, 1.5)
+            row = db.execute("SELECT * FROM sync_accounts WHERE player_id = 'me'").fetchone()
+        assert row['games_per_hour'] == pytest.approx(5, rel=0.01)
+        assert row['last_duration'] == 1.5
+
+    def test_estimate(self):
+        assert scheduler.estimate_seconds([None, None], 2) is None
+        assert scheduler.estimate_seconds([10, 30, None, 20], 2) == 45
+        assert scheduler.estimate_seconds([100, 1], 4) == 100
+
+
+class TestRunSchedule:
+    """Tests for running a schedule through the job runner."""
+
+    def test_syncs_every_account_with_shared_cache(self, app, fake_sync):
+        summary = scheduler.run_schedule(_accounts('a', 'b', 'c'), workers=2)
+        assert sorted(fake_sync['calls']) == ['a', 'b', 'c']
+        assert isinstance(fake_sync['options']['game_cache'], scheduler.GameCache)
+        assert [o['status'] for o in summary['accounts']] == ['complete'] * 3
+        assert summary['accounts'][0]['duels_fetched'] == 3
+
+    def test_deadline_defers_remaining_accounts(self, app, fake_sync):
+        summary = scheduler.run_schedule(_accounts('a', 'b'), deadline=0)
+        assert fake_sync['calls'] == []
+        assert [o['status'] for o in summary['accounts']] == ['deferred', 'deferred']
+
+    def test_cli(self, app, fake_sync, tmp_path, capsys):
+        path = tmp_path / 'accounts.json'
+        path.write_text(json.dumps(_accounts('a', 'b')))
+        assert cli.main(['schedule', '--accounts', str(path), '-q']) == cli.EXIT_OK
+        summary = json.loads(capsys.readouterr().out)
+        assert len(summary['accounts']) == 2
+
+        path.write_text('[{"playerId": "a"}]')
+        assert cli.main(['schedule', '--accounts', str(path)]) == cli.EXIT_USAGE
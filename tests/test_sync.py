@@ -0,0 +1,190 @@
+"""Tests for the geodash.sync pipeline helpers."""
+import pytest
+
+import geodash
+from geodash.model import get_db
+from geodash.store import games_path, load_games
+from geodash.sync import _upsert_games, coalesced_progress, compute_and_store_all_variations
+from geoguessr import fetch_games
+from geoguessr.ratelimit import RateLimiter
+from geoguessr.utils import save_json
+from .test_trends import _duel
+
+
+def _collect(app, interval, calls):
+    """Run progress callbacks for `calls` and return the emitted events."""
+    events = []
+    app.config['SYNC_PROGRESS_INTERVAL'] = interval
+    try:
+        with app.app_context():
+            progress = coalesced_progress(lambda event, data: events.append((event, data)), 2)
+        for done, total in calls:
+            progress(done, total)
+    finally:
+        app.config['SYNC_PROGRESS_INTERVAL'] = 0.25
+    return events
+
+
+class TestCoalescedProgress:
+    """Tests for time-coalesced progress events."""
+
+    def test_only_final_event_within_interval(self, app):
+        events = _collect(app, 60, [(i, 100) for i in range(1, 101)])
+        assert len(events) == 1
+        event, data = events[0]
+        assert event == 'progress'
+        assert (data['phase'], data['current'], data['total'], data['eta']) == (2, 100, 100, 0)
+
+    def test_events_carry_rate_and_eta(self, app):
+        events = _collect(app, 0, [(1, 4), (2, 4)])
+        assert [data['current'] for _, data in events] == [1, 2]
+        assert events[-1][1]['rate'] > 0
+        assert events[-1][1]['eta'] == pytest.approx(2 / events[-1][1]['rate'], abs=0.1)
+
+
+class TestFetcherProgress:
+    """Fetchers report progress through the callback instead of stdout."""
+
+    def test_fetch_duels_calls_progress(self, monkeypatch, capsys):
+        monkeypatch.setattr(fetch_games, 'fetch_single_duel', lambda *args: {'gameId': args[1]})
+        monkeypatch.setattr(fetch_games.time, 'sleep', lambda seconds: None)
+        calls = []
+        games = fetch_games.fetch_duels(None, {'a': False, 'b': True}, 'me',
+                                        progress=lambda done, total: calls.append((done, total)))
+        assert [g['gameId'] for g in games] == ['a', 'b']
+        assert calls == [(1, 2), (2, 2)]
+        assert capsys.readouterr().out == ''
+
+
+class _FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _FakeSession:
+    """Answers user lookups from a dict; unknown IDs get a 404."""
+
+    def __init__(self, names):
+        self.names = names
+        self.requested = []
+
+    def get(self, url, timeout=None):
+        player_id = url.rsplit('/', 1)[-1]
+        self.requested.append(player_id)
+        if player_id in self.names:
+            return _FakeResponse(200, {'nick': self.names[player_id]})
+        return _FakeResponse(404)
+
+
+class TestResolveUsernames:
+    """Tests for bulk, concurrent username resolution."""
+
+    def _names(self, db):
+        return {row['player_id']: row['username'] for row in db.execute("SELECT * FROM player_names")}
+
+    def test_only_missing_and_stale_ids_are_fetched(self, app):
+        from geodash.model import get_db
+        from geodash.sync import resolve_usernames
+        with app.app_context():
+            db = get_db()
+            db.executemany(
+                "INSERT INTO player_names (player_id, username, fetched_at) VALUES (?, ?, ?)",
+                [('fresh', 'Fresh', '2999-01-01 00:00:00'),
+                 ('stale', 'OldName', '2000-01-01 00:00:00')]
+            )
+            db.commit()
+            session = _FakeSession({'new': 'Newbie', 'stale': 'Renamed', 'fresh': 'X'})
+            assert resolve_usernames(session, {'fresh', 'new'}) == 2
+            assert sorted(session.requested) == ['new', 'stale']
+            assert self._names(db) == {'fresh': 'Fresh', 'new': 'Newbie', 'stale': 'Renamed'}
+
+    def test_failed_lookup_keeps_name_or_falls_back_to_id(self, app):
+        from geodash.model import get_db
+        from geodash.sync import resolve_usernames
+        with app.app_context():
+            db = get_db()
+            db.execute(
+                "INSERT INTO player_names (player_id, username, fetched_at) VALUES ('gone', 'Known', '2000-01-01')"
+            )
+            db.commit()
+            resolve_usernames(_FakeSession({}), {'unknown'})
+            assert self._names(db) == {'gone': 'Known', 'unknown': 'unknown'}
+
+
+class TestRateLimiter:
+    """Tests for the shared request limiter."""
+
+    def test_threads_share_one_budget(self):
+        import threading
+        import time
+        from geoguessr.ratelimit import RateLimiter
+
+        limiter = RateLimiter(50)
+        started = time.monotonic()
+        threads = [threading.Thread(target=limiter.wait) for _ in range(11)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 11 calls at 50/s need at least 10 intervals of 20 ms
+        assert time.monotonic() - started >= 0.19
+
+
+class TestUpsertGames:
+    """Tests for idempotent game store upserts."""
+
+    def test_upsert_replaces_by_game_id(self, app):
+        with app.app_context():
+            assert _upsert_games('duels', 'me', [{'gameId': 'a', 'v': 1}]) == (1, True, [])
+            assert _upsert_games('duels', 'me', [{'gameId': 'b'}, {'gameId': 'a', 'v': 2}]) == (2, True, ['a'])
+            assert load_games('me', 'duels') == [{'gameId': 'a', 'v': 2}, {'gameId': 'b'}]
+
+    def test_reingest_writes_nothing(self, app):
+        with app.app_context():
+            _upsert_games('duels', 'me', [{'gameId': 'a'}, {'gameId': 'b'}])
+            path = games_path('duels', 'me')
+            path.write_text(path.read_text() + ' ')
+            assert _upsert_games('duels', 'me', [{'gameId': 'b'}]) == (2, False, [])
+            assert path.read_text().endswith(' ')
+
+    def test_existing_duplicates_collapse(self, app):
+        with app.app_context():
+            path = games_path('duels', 'me')
+            path.parent.mkdir(parents=True)
+            save_json(path, [{'gameId': 'a'}, {'gameId': 'b'}, {'gameId': 'a'}])
+            assert _upsert_games('duels', 'me', []) == (2, True, [])
+            assert load_games('me', 'duels') == [{'gameId': 'a'}, {'gameId': 'b'}]
+
+    def test_replaced_games_refresh_the_round_store(self, app):
+        with app.app_context():
+            _upsert_games('duels', 'me', [_duel('a', '2024-01-01T09:00:00Z', 3000)])
+            compute_and_store_all_variations('me')
+            _, _, replaced = _upsert_games('duels', 'me', [_duel('a', '2024-01-01T09:00:00Z', 5000)])
+            compute_and_store_all_variations('me', {'duels': replaced})
+            db = get_db()
+            scores = db.execute("SELECT team_score, five_ks FROM game_rounds").fetchall()
+            rollups = db.execute(
+                "SELECT period, games, total_score FROM trend_rollups ORDER BY period").fetchall()
+        assert [tuple(row) for row in scores] == [(5000, 1)]
+        assert [tuple(row) for row in rollups] == [('day', 1, 5000), ('week', 1, 5000)]
+
+    def test_resync_after_fetched_games_drift(self, app, mock_geoguessr, monkeypatch):
+        monkeypatch.setattr(geodash.sync, '_limiter', RateLimiter(1000))
+        events = []
+        with app.app_context():
+            geodash.sync.run_sync('me', 'cookie', lambda event, data: None)
+            db = get_db()
+            with db:
+                db.execute("DELETE FROM fetched_games")
+            second = geodash.sync.run_sync('me', 'cookie', lambda *event: events.append(event))
+            games = db.execute("SELECT COUNT(*) FROM games WHERE owner_id = 'me'").fetchone()[0]
+
+        assert (second['duels_fetched'], second['duels_total']) == (6, 6)
+        assert (second['team_duels_fetched'], second['team_duels_total']) == (6, 6)
+        assert games == 12
+        assert ('phase', {'phase': 6, 'name': 'Computing statistics', 'status': 'complete',
+                          'skipped': True}) in events
@@ -0,0 +1,102 @@
+"""Tests for game start times and the trend rollups."""
+import geodash
+from geodash.model import get_db
+from geodash.rounds import add_to_rollups, insert_round_rows, new_round_rows, rebuild_rollups
+from geodash.store import load_games
+from geoguessr.ratelimit import RateLimiter
+from .test_process_stats import make_duel_game
+
+
+def _duel(game_id, played_at, score, won=True, competitive=False):
+    game = make_duel_game(rounds_data=[{
+        "roundNumber": 1, "score": score, "distance": 100, "lat": 48.8, "lng": 2.3,
+        "time": 10.0, "country": "fr", "enemyScore": 3000,
+        "totalHealthChange": 0 if won else -6000,
+    }], total_score=score)
+    game.update(gameId=game_id, playedAt=played_at, isCompetitive=competitive)
+    return game
+
+
+GAMES = [
+    _duel('a', '2024-01-01T09:00:00.000Z', 5000),                  # Monday
+    _duel('b', '2024-01-03T23:30:00+00:00', 4000, won=False),      # Wednesday
+    _duel('c', '2024-01-08T10:00:00Z', 2000, competitive=True),    # next Monday
+    _duel('d', None, 1000),                                        # synced without a start time
+]
+
+
+def _ingest(db, games):
+    with db:
+        rows = new_round_rows(db, 'duels', games, 'me')
+        insert_round_rows(db, rows)
+        add_to_rollups(db, 'me', [row[1] for row in rows['games']])
+
+
+def _rollups(db):
+    return [tuple(row) for row in db.execute(
+        "SELECT * FROM trend_rollups ORDER BY period, bucket, is_competitive")]
+
+
+class TestRollups:
+    """Tests for maintaining the rollups as games are ingested."""
+
+    def test_played_at_is_stored_in_utc(self, app):
+        with app.app_context():
+            db = get_db()
+            _ingest(db, GAMES)
+            played = dict(db.execute("SELECT game_id, played_at FROM games").fetchall())
+        assert played == {'a': '2024-01-01 09:00:00', 'b': '2024-01-03 23:30:00',
+                          'c': '2024-01-08 10:00:00', 'd': None}
+
+    def test_weekly_buckets_start_on_monday(self, app):
+        with app.app_context():
+            db = get_db()
+            _ingest(db, GAMES)
+            weeks = db.execute(
+                """SELECT bucket, SUM(games), SUM(wins), SUM(total_score), SUM(five_ks)
+                   FROM trend_rollups WHERE period = 'week' GROUP BY bucket""").fetchall()
+        assert [tuple(row) for row in weeks] == [('2024-01-01', 2, 1, 9000, 1),
+                                                 ('2024-01-08', 1, 1, 2000, 0)]
+
+    def test_incremental_matches_rebuild(self, app):
+        with app.app_context():
+            db = get_db()
+            _ingest(db, GAMES[:1])
+            _ingest(db, GAMES[1:])
+            incremental = _rollups(db)
+            with db:
+                rebuild_rollups(db, 'me')
+            assert _rollups(db) == incremental
+            assert len(incremental) == 5
+
+
+class TestTrendsApi:
+    """Tests for /api/v1/trends/."""
+
+    def test_daily_series_with_country(self, app, client):
+        with app.app_context():
+            _ingest(get_db(), GAMES)
+        body = client.get('/api/v1/trends/?player=me&period=day&country=FR').get_json()
+        assert [b['bucket'] for b in body['buckets']] == ['2024-01-01', '2024-01-03', '2024-01-08']
+        assert body['buckets'][1]['win_rate'] == 0
+        assert body['buckets'][0]['avg_score'] == 5000
+        assert [b['avg_score_diff'] for b in body['country']['buckets']] == [2000, 1000, -1000]
+
+    def test_mode_filter(self, app, client):
+        with app.app_context():
+            _ingest(get_db(), GAMES)
+        body = client.get('/api/v1/trends/?player=me&mode=competitive').get_json()
+        assert [(b['bucket'], b['games']) for b in body['buckets']] == [('2024-01-08', 1)]
+
+    def test_bad_period(self, client):
+        assert client.get('/api/v1/trends/?player=me&period=month').status_code == 400
+
+    def test_sync_records_start_times(self, app, mock_geoguessr, monkeypatch):
+        monkeypatch.setattr(geodash.sync, '_limiter', RateLimiter(1000))
+        with app.app_context():
+            geodash.sync.run_sync('me', 'cookie', lambda event, data: None)
+            duels = load_games('me', 'duels')
+            totals = get_db().execute(
+                "SELECT period, SUM(games) FROM trend_rollups GROUP BY period").fetchall()
+        assert all(game['playedAt'] for game in duels)
+        assert dict(totals) == {"day": 12, "week": 12}
@@ -2,7 +2,8 @@
 import pytest
 from datetime import datetime, timezone
 
-from geoguessr.utils import parse_time, calculate_score
+from geoguessr import utils
+from geoguessr.utils import parse_time, calculate_score, load_data, save_json
 
 
 class TestParseTime:
@@ -63,3 +64,33 @@ class TestCalculateScore:
     def test_score_never_exceeds_5000(self):
         assert calculate_score(0) == 5000
         assert calculate_score(-1000) == 5000
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def codec(request, monkeypatch):
+    """Run a test against both the fast and the fallback JSON codec."""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(utils, "orjson", None)
+    return request.param
+
+
+class TestJsonCodec:
+    """Tests for json_dumps / json_loads and the file helpers."""
+
+    def test_compact_output(self, codec):
+        assert utils.json_dumps({"a": [1, 2], "b": "é"}) == '{"a":[1,2],"b":"é"}'.encode()
+
+    def test_sort_keys_and_int_keys(self, codec):
+        assert utils.json_dumps({2: "x", 1: "y"}, sort_keys=True) == b'{"1":"y","2":"x"}'
+
+    def test_loads_bytes_and_str(self, codec):
+        assert utils.json_loads(b'{"a":1}') == utils.json_loads('{"a":1}') == {"a": 1}
+
+    def test_save_and_load_round_trip(self, codec, tmp_path):
+        path = tmp_path / "games.json"
+        data = [{"gameId": "g", "rounds": [{"lat": 48.85, "lng": 2.35}]}]
+        save_json(str(path), data)
+        assert b"\n" not in path.read_bytes()
+        assert load_data(str(path)) == data
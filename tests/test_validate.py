@@ -0,0 +1,94 @@
+"""Tests for game validation and quarantine at ingest."""
+import json
+
+import geodash
+from geodash import cli
+from geodash.model import get_db
+from geodash.store import load_games
+from geoguessr.ratelimit import RateLimiter
+from geoguessr.validate import MAX_GUESS_SECONDS, GameValidator, check_game
+from .test_api import _write_store
+from .test_process_stats import make_duel_game, make_team_game
+
+
+def _rules(game, game_type='team_duels', seen_ids=()):
+    return [rule for rule, _ in check_game(game, game_type, seen_ids)]
+
+
+class TestCheckGame:
+    """Tests for each validation rule."""
+
+    def test_valid_games(self):
+        assert _rules(make_team_game()) == []
+        assert _rules(make_duel_game(), 'duels') == []
+
+    def test_player_count(self):
+        game = make_team_game()
+        game['playerStats']['player3'] = {'rounds': []}
+        assert _rules(game) == ['player_count', 'zero_round_player']
+
+    def test_zero_round_player(self):
+        game = make_team_game()
+        game['playerStats']['player2']['rounds'] = []
+        assert _rules(game) == ['zero_round_player']
+
+    def test_missing_round_stats(self):
+        game = make_team_game()
+        del game['teamStats']
+        assert _rules(game) == ['missing_round_stats']
+        duel = make_duel_game()
+        duel['roundStats'] = []
+        assert _rules(duel, 'duels') == ['missing_round_stats']
+
+    def test_impossible_guess_time(self):
+        game = make_duel_game()
+        game['playerStats']['rounds'][0]['time'] = -2.0
+        assert _rules(game, 'duels') == ['impossible_guess_time']
+        game['playerStats']['rounds'][0]['time'] = MAX_GUESS_SECONDS + 1
+        assert _rules(game, 'duels') == ['impossible_guess_time']
+        game['playerStats']['rounds'][0]['time'] = None
+        assert _rules(game, 'duels') == []
+
+    def test_duplicates_within_a_stream(self):
+        validator = GameValidator('team_duels', seen_ids={'old'})
+        old = dict(make_team_game(), gameId='old')
+        assert validator.filter([make_team_game(), make_team_game(), old]) == [make_team_game()]
+        assert [reasons[0][0] for _, reasons in validator.rejected] == ['duplicate_game_id'] * 2
+
+
+class TestQuarantine:
+    """Tests for quarantining at sync and in existing game stores."""
+
+    def test_sync_quarantines_invalid_games(self, app, mock_geoguessr, monkeypatch):
+        monkeypatch.setattr(geodash.sync, '_limiter', RateLimiter(1000))
+        team_game = next(g for g in mock_geoguessr.games.values() if len(g['teams'][0]['players']) == 2)
+        my_team = next(t for t in team_game['teams'] if any(p['playerId'] == 'me' for p in t['players']))
+        next(p for p in my_team['players'] if p['playerId'] != 'me')['guesses'] = []
+
+        with app.app_context():
+            first = geodash.sync.run_sync('me', 'cookie', lambda event, data: None)
+            second = geodash.sync.run_sync('me', 'cookie', lambda event, data: None)
+            rows = get_db().execute("SELECT * FROM quarantined_games").fetchall()
+            stored = load_games('me', 'team_duels')
+
+        assert (first['team_duels_fetched'], first['team_duels_quarantined']) == (5, 1)
+        assert (second['team_duels_fetched'], second['team_duels_quarantined']) == (0, 0)
+        assert [(r['game_type'], r['game_id'], r['rule']) for r in rows] == [
+            ('team_duels', team_game['gameId'], 'zero_round_player')]
+        assert json.loads(rows[0]['game'])['gameId'] == team_game['gameId']
+        assert team_game['gameId'] not in {g['gameId'] for g in stored}
+
+    def test_validate_command_cleans_existing_store(self, app, capsys):
+        bad = dict(make_team_game(), gameId='bad')
+        bad['playerStats']['player2']['rounds'] = []
+        _write_store(app, 'team_duels', [make_team_game(), bad, make_team_game()])
+
+        assert cli.main(['validate', '--player-id', 'me']) == cli.EXIT_OK
+        summary = json.loads(capsys.readouterr().out.splitlines()[-1])
+        assert summary['team_duels'] == {
+            'games': 1, 'quarantined': {'zero_round_player': 1, 'duplicate_game_id': 1}}
+        with app.app_context():
+            assert [g['gameId'] for g in load_games('me', 'team_duels')] == ['test-game-id']
+            db = get_db()
+            assert db.execute("SELECT COUNT(*) FROM quarantined_games").fetchone()[0] == 2
+            assert db.execute("SELECT game_id FROM games").fetchall()[0][0] == 'test-game-id'
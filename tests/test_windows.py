@@ -0,0 +1,165 @@
+"""Tests for last_n and since/until windows answered from prefix sums."""
+import pytest
+
+from benchmarks.history import processed_history, write_store
+from geodash.cache import bump_generation
+from geodash.model import get_db
+from geodash.rounds import (
+    aggregate_countries, aggregate_overall, aggregate_players, insert_round_rows, new_round_rows
+)
+from geodash.windows import WindowIndex, parse_window
+from geoguessr.process_stats import process_games
+from .test_rounds import _team_games
+from .test_trends import _duel
+
+
+@pytest.fixture(scope='module')
+def history():
+    duels, team_duels = processed_history('me', 30, 30, seed=5, missing_rate=0.1)
+    return {'duels': duels, 'team_duels': team_duels}
+
+
+def _chronological(games):
+    return sorted(games, key=lambda g: (g['playedAt'], g['gameId']))
+
+
+def _ingest(db, owner_id, game_type, games):
+    with db:
+        insert_round_rows(db, new_round_rows(db, game_type, games, owner_id))
+
+
+def _approx(rows):
+    return [{k: pytest.approx(v) if isinstance(v, float) else v for k, v in row.items()}
+            for row in rows]
+
+
+class TestParseWindow:
+    """Tests for window parameter parsing."""
+
+    def test_no_window(self):
+        assert parse_window({}) == (None, None)
+
+    def test_bounds(self):
+        window, error = parse_window({'last_n': '20', 'since': '2024-01-02',
+                                      'until': '2024-01-05'})
+        assert error is None
+        assert window == {'last_n': 20, 'since': '2024-01-02 00:00:00',
+                          'until': '2024-01-06 00:00:00'}
+        window, _ = parse_window({'until': '2024-01-05T10:00:00+02:00'})
+        assert window['until'] == '2024-01-05 08:00:00'
+
+    @pytest.mark.parametrize('args', [{'last_n': '0'}, {'last_n': 'ten'}, {'since': 'May'}])
+    def test_invalid(self, args):
+        window, error = parse_window(args)
+        assert window is None and error
+
+
+class TestWindowIndex:
+    """Windowed totals must match aggregating just the window's games."""
+
+    @pytest.mark.parametrize('game_type', ['duels', 'team_duels'])
+    @pytest.mark.parametrize('window', [
+        {'last_n': 7},
+        {'last_n': 100},
+        {'since': '2024-01-03 00:00:00'},
+        {'since': '2024-01-02 00:00:00', 'until': '2024-01-04 00:00:00', 'last_n': 5},
+    ])
+    def test_matches_aggregating_the_window(self, app, history, game_type, window):
+        games = _chronological(history[game_type])
+        with app.app_context():
+            db = get_db()
+            _ingest(db, 'me', game_type, games)
+            index = WindowIndex(db, 'me', game_type)
+            lo, hi = index.bounds(window)
+            assert index.game_ids_in(window) == [g['gameId'] for g in games[lo:hi]]
+            _ingest(db, 'window', game_type, games[lo:hi])
+
+            overall = index.overall(window)
+            expected = aggregate_overall(db, 'window', game_type)
+            assert {k: overall[k] for k in expected} == pytest.approx(expected)
+            assert index.countries_in(window) == _approx(aggregate_countries(db, 'window', game_type))
+            players = aggregate_players(db, 'window', game_type)
+            for p in players:
+                p.pop('username')
+                if game_type == 'duels':
+                    p['player_id'] = 'me'
+            assert index.players_in(window) == _approx(players)
+
+    def test_player_5ks_match_process_games(self, app):
+        games = _team_games()
+        with app.app_context():
+            db = get_db()
+            _ingest(db, 'me', 'team_duels', games)
+            players = WindowIndex(db, 'me', 'team_duels').players_in({'last_n': 2})
+        five_ks = {p['player_id']: p['total_5ks'] for p in players if p['total_5ks']}
+        assert five_ks == process_games(games[1:])['overall']['player_total_5ks']
+
+    def test_untimed_games(self, app):
+        games = [_duel('timed', '2024-01-02T10:00:00Z', 4000), _duel('old', None, 1000),
+                 _duel('older', None, 2000)]
+        with app.app_context():
+            db = get_db()
+            _ingest(db, 'me', 'duels', games)
+            index = WindowIndex(db, 'me', 'duels')
+        assert index.game_ids_in({'until': '2024-01-03 00:00:00'}) == ['timed']
+        assert index.game_ids_in({'since': '2024-01-01 00:00:00'}) == ['timed']
+        assert index.game_ids_in({'until': '2024-01-02 00:00:00'}) == []
+        # last_n counts them as the oldest games, in game ID order
+        assert index.game_ids_in({'last_n': 2}) == ['older', 'timed']
+        assert index.game_ids_in({'last_n': 5}) == ['old', 'older', 'timed']
+
+    def test_mode_and_empty_window(self, app, history):
+        with app.app_context():
+            db = get_db()
+            _ingest(db, 'me', 'duels', history['duels'])
+            competitive = WindowIndex(db, 'me', 'duels', 'competitive')
+            expected = sum(g['isCompetitive'] for g in history['duels'])
+            assert competitive.overall({'last_n': 1000})['total_games'] == expected
+            assert competitive.overall({'since': '2030-01-01 00:00:00'})['total_games'] == 0
+            assert competitive.countries_in({'since': '2030-01-01 00:00:00'}) == []
+
+
+class TestWindowedEndpoints:
+    """Tests for last_n/since/until on the read API."""
+
+    @pytest.fixture
+    def synced(self, app, history):
+        with app.app_context():
+            write_store('me', history['duels'], history['team_duels'])
+            db = get_db()
+            _ingest(db, 'me', 'duels', history['duels'])
+            _ingest(db, 'me', 'team_duels', history['team_duels'])
+            bump_generation('me')
+
+    def test_stats_last_n(self, client, synced):
+        body = client.get('/api/v1/stats/?game_type=duels&last_n=10').get_json()
+        overall = body['data']['overall']
+        assert overall['total_games'] == 10
+        assert overall['filter_type'] == 'duels_all_window'
+        assert overall['window'] == {'last_n': 10, 'since': None, 'until': None}
+        assert 'avg_guess_time' in overall
+
+    def test_team_stats_window_has_contributions(self, client, synced):
+        body = client.get('/api/v1/stats/?game_type=team_duels&since=2024-01-02').get_json()
+        players = body['data']['player_contributions']
+        assert players and all(p['username'] for p in players)
+        assert 'avg_score' not in body['data']['overall']
+
+    def test_countries_window(self, client, synced):
+        body = client.get('/api/v1/countries/?game_type=team_duels&last_n=5&sort=win_rate')
+        countries = body.get_json()['data']['all_countries']
+        assert sum(c['rounds'] for c in countries) > 0
+        assert countries == sorted(countries, key=lambda c: c['win_rate'], reverse=True)
+
+    def test_details_window(self, client, synced, history):
+        code = history['team_duels'][0]['playerStats']['me']['rounds'][0]['country']
+        everything = client.get(f'/api/v1/countries/{code}/details/').get_json()
+        window = client.get(f'/api/v1/countries/{code}/details/?until=2000-01-01')
+        assert everything['success']
+        assert window.status_code == 404
+
+    def test_empty_window_and_bad_params(self, client, synced):
+        assert client.get('/api/v1/stats/?since=2030-01-01').status_code == 404
+        assert client.get('/api/v1/stats/?last_n=-3').status_code == 400
+        assert client.get('/api/v1/countries/?until=soon').status_code == 400
+        assert client.get('/api/v1/bundle/?last_n=x').status_code == 400